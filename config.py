@@ -24,7 +24,13 @@ class PPTConfig:
         'temp': BASE_DIR / "downloads" / "temp",
         'assets': BASE_DIR / "assets",
         'fonts': BASE_DIR / "fonts",
-        'templates': BASE_DIR / "templates"
+        'templates': BASE_DIR / "templates",
+        'themes': BASE_DIR / "downloads" / "cache" / "themes",
+        'images': BASE_DIR / "downloads" / "cache" / "images",
+        'diagrams': BASE_DIR / "downloads" / "cache" / "diagrams",
+        'outlines': BASE_DIR / "downloads" / "cache" / "outlines",
+        'plans': BASE_DIR / "downloads" / "cache" / "plans",
+        'library': BASE_DIR / "assets" / "library"
     }
     
     # --- Presentation Standards ---
@@ -35,12 +41,225 @@ class PPTConfig:
         'max_file_size_mb': 5
     }
     
+    # --- Local Image Scoring ---
+    IMAGE_SCORING = {
+        'candidates': 8,                  # Pexels results scored per background search (per_page)
+        'supporting_candidates': 3,       # Top results, in Pexels order, scored per supporting image search
+        'supporting_min_resolution': (1000, 750),
+        'sharpness_knee': 0.002,          # Laplacian variance that scores 0.5
+        'weights': {
+            'resolution': 2.0,
+            'sharpness': 1.5,
+            'exposure': 1.0,
+            'contrast': 1.0,
+            'colorfulness': 0.5,
+            'aspect': 1.5
+        },
+        'close_call_margin': 0.02,        # Ask Gemini Vision only when the top two are this close
+        'vision_tiebreak': True
+    }
+    
+    # --- Background Legibility ---
+    BACKGROUND_LEGIBILITY = {
+        'target_contrast': 4.5,     # WCAG AA contrast between text and background
+        'min_alpha': 0.1,           # Scrim opacity range for light text
+        'max_alpha': 0.7,
+        'scrim_levels': (0.0, 0.1, 0.2, 0.35, 0.5, 0.7),  # Photo layouts generated per theme
+        'adapt_text_color': True    # Allow dark text without a scrim on bright images
+    }
+    
+    # --- Output Size Budget ---
+    OUTPUT_BUDGET = {
+        'enabled': True,      # Recompress embedded media before saving each deck
+        'target_mb': 20,      # Budget for all embedded media in a deck
+        'photo_dpi': 150,     # Effective DPI kept for photos at their placed size
+        'diagram_dpi': 200,   # Diagrams and other PNGs keep more detail for line art
+        'min_dpi': 96,
+        'jpeg_quality': 85
+    }
+    
+    # --- Diagram Rendering ---
+    DIAGRAMS = {
+        'size': (4, 3),   # Inches; the box _draw_photo_slide places diagrams in
+        'dpi': 200        # Rendered once at this resolution, matching OUTPUT_BUDGET['diagram_dpi']
+    }
+    
+    # --- Native Charts ---
+    # Numeric series in slide bodies are drawn as editable PowerPoint charts
+    CHARTS = {
+        'enabled': True,
+        'min_points': 2,             # Values of one kind needed for a chart
+        'max_points': 8,
+        'pie_total_tolerance': 5     # Percentages adding up to 100 +/- this become a pie
+    }
+    
+    # --- Deck Assembly ---
+    ASSEMBLY = {
+        'shard_threshold': 40,    # Content slides above which slides are built in worker processes
+        'slides_per_shard': 10,   # Smallest shard worth a process
+        'max_workers': None       # None = one per CPU
+    }
+    
+    # --- Memory Budget ---
+    MEMORY = {
+        'low_memory': None,       # True = spill all media to disk, False = never, None = when over budget
+        'media_budget_mb': 64,    # Image bytes one deck may hold in memory before it spills
+        'rss_budget_mb': 1024,    # Process-wide guard: past this private RSS (all decks together) every deck spills
+        'spill_dir': None         # Where spilled media goes (system temp dir if None)
+    }
+    
+    # --- Image Prefetch ---
+    PREFETCH = {
+        'enabled': True,       # Fetch images while the outline is still streaming in
+        'max_workers': 4,
+        'max_searches': 40,    # Pexels searches a deck may spend speculatively
+        'wait_timeout': 60     # Seconds to wait for a prefetch already in flight
+    }
+    
+    # --- Deck Deadline ---
+    DEADLINE = {
+        'seconds': 180,           # Time budget per deck; None for no deadline
+        'render_reserve': 15,     # Seconds always kept for drawing and saving the deck
+        'request_timeout': 45,    # Cap on any single Pexels/Gemini call
+        # Share of the budget that must be left for optional work to start;
+        # scoring search results is given up first, backgrounds last
+        'min_remaining': {'image_scoring': 0.6, 'supporting_images': 0.5, 'diagrams': 0.3, 'backgrounds': 0.15}
+    }
+    
+    # --- Dependency Circuit Breakers ---
+    CIRCUIT_BREAKERS = {
+        'default': {
+            'window_seconds': 60,      # Rolling window of recent calls
+            'min_calls': 5,            # Calls needed in the window before it can trip
+            'failure_rate': 0.5,
+            'slow_call_seconds': 10,
+            'slow_call_rate': 0.8,
+            'open_seconds': 30,        # Fail fast this long before probing again
+            'half_open_probes': 1
+        },
+        'gemini': {'slow_call_seconds': 30},
+        'pexels': {},                  # Search API
+        'pexels_cdn': {'min_calls': 8} # Photo and preview downloads
+    }
+    
+    # --- Outline Cache ---
+    OUTLINE_CACHE = {
+        'enabled': True,
+        'similarity_threshold': 0.85,  # TF-IDF cosine similarity of the topics
+        'max_entries': 500,            # Least recently used beyond this are evicted
+        'ttl_days': 30
+    }
+    
+    # --- Run Workspaces ---
+    # Each run's scratch files live in a private directory under 'root'; the
+    # shared caches in 'cache_dirs' are trimmed by a background collector
+    WORKSPACE = {
+        'root': PATHS['temp'] / "runs",
+        'gc_interval_seconds': 900,    # None disables the background collector
+        'run_max_age_hours': 6,        # Run directories older than this are removed even if their process lives
+        'cache_dirs': ['images', 'diagrams'],
+        'cache_max_mb': 2048,
+        'cache_max_age_days': 30,
+        'cache_grace_minutes': 60      # Files used this recently are never evicted
+    }
+    
+    # --- Local Image Library ---
+    # Licensed stock under PATHS['library'] (keywords from <image>.json sidecars
+    # or file names) and the image cache are searched before Pexels
+    IMAGE_LIBRARY = {
+        'enabled': True,
+        'dirs': [PATHS['library']],
+        'include_cache': True,
+        'index_path': PATHS['cache'] / "image_library.json",
+        'min_score': 0.75,          # Share of the keyword a local image must match to skip Pexels
+        'fallback_min_score': 0.34, # Weaker match accepted when Pexels gives nothing
+        'min_size': {'background': (1920, 1080), 'supporting': (800, 450)}  # Pixels
+    }
+    
+    # --- Pexels Quota ---
+    # Extra keys can be pooled with PEXELS_API_KEYS=key1,key2,...
+    PEXELS_QUOTA = {
+        'per_deck_searches': 60,       # Searches one deck may make
+        'supporting_share': 0.7,       # Most of a deck's budget supporting images may take
+        'low_quota_fraction': 0.25     # Below this share of the pool, only backgrounds are searched
+    }
+    
+    # --- Metrics ---
+    # Prometheus text format: scraped from /metrics, or dumped to a file for node-exporter
+    METRICS = {
+        'host': '127.0.0.1',
+        'port': None,                  # Serve /metrics on this port; None serves nothing
+        'dump_path': BASE_DIR / "output" / "pptgen.prom"
+    }
+    
+    # --- Profiling (main.py --profile) ---
+    PROFILING = {
+        'top_n': 25,               # Rows per table in the report
+        'traceback_frames': 1      # Frames tracemalloc keeps per allocation; more is slower
+    }
+    
+    # --- Load Test (loadtest.py) ---
+    # Offline Gemini and Pexels fakes; latencies are (median seconds, lognormal sigma)
+    LOAD_TEST = {
+        'latency': {
+            'gemini_outline': (9.0, 0.35),   # Whole outline, streamed
+            'gemini_chat': (1.5, 0.5),
+            'gemini_vision': (2.5, 0.4),
+            'pexels_search': (0.4, 0.5),
+            'pexels_cdn': (0.3, 0.6)
+        },
+        'error_rate': {'gemini': 0.01, 'pexels': 0.01, 'pexels_cdn': 0.005},
+        'pexels_keys': 10,       # Fake keys in the pool; each gets RATE_LIMITS['pexels'] an hour
+        'time_scale': 1.0        # Multiplies every fake latency
+    }
+
+    # --- Generation Service (server.py) ---
+    SERVER = {
+        'host': '127.0.0.1',           # Set a token before listening on other interfaces
+        'port': 8000,                  # The PORT environment variable wins
+        'token': os.getenv("SERVER_TOKEN"),  # Clients send 'Authorization: Bearer <token>'; None = no check
+        'max_concurrent': 2,           # Decks generated at once
+        'max_queued': 8,               # Further requests wait; beyond this they get 429
+        'max_body_bytes': 16 * 1024,
+        'max_topic_length': 200,
+        'slides_range': (3, 15),
+        'result_ttl_seconds': 3600,    # Finished decks can be downloaded for this long
+        'drain_seconds': 120,          # On SIGTERM, time running jobs get before they are cancelled
+        'jobs_dir': PATHS['temp'] / "jobs"
+    }
+
+    # --- Cache Warming (warm_cache.py) ---
+    # Warming shares the Gemini and Pexels keys with live traffic, so it runs on a budget
+    WARMING = {
+        'slides': 10,                  # Outline length warmed; shorter requests reuse it
+        'style': 'dark',               # For listed topics; logged requests keep their own style
+        'max_calls_per_hour': {'gemini': 150, 'pexels': 100},  # Pexels searches, not downloads
+        'pexels_reserve': 5000,        # Stop once the key pool has fewer searches left this month
+        'hours': None,                 # (start, end) local hours to run in, e.g. (1, 6); None = any time
+        'pause_seconds': 5,            # Between topics
+        'busy_url': None,              # Generation service /health; wait while it has jobs in progress
+        'request_log': PATHS['cache'] / "requests.jsonl",  # Every generate_presentation request; None logs nothing
+        'request_log_max_mb': 10       # Then it is moved to requests.jsonl.1
+    }
+
     # --- API Rate Limits ---
     RATE_LIMITS = {
-        'pexels': 200,  # requests/hour
+        'pexels': 200,  # requests/hour per key, until Pexels reports its own limit
         'gemini': 60    # requests/minute
     }
     
+    # --- Theme Templates ---
+    THEME_TEMPLATES = {
+        'enabled': True,  # Build slides on a cached per-theme master instead of blank slides
+        'base': BASE_DIR / "assets" / "templates" / "template.pptx",
+        'scrim_alpha': 0.2
+    }
+    
+    # --- Layout Selection ---
+    LAYOUT_RULES = {
+        'confidence_threshold': 0.35  # Below this the LLM is asked to decide
+    }
+    
     @classmethod
     def validate(cls) -> Tuple[bool, str]:
         """Validate critical configurations"""
@@ -0,0 +1,215 @@
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# The fakes answer every call, so no real keys are needed
+os.environ.setdefault('GEMINI_API_KEY', 'offline')
+os.environ.setdefault('PEXELS_API_KEY', 'offline')
+
+import config
+from orchestration.fakes import FakeServices, offline_services
+from orchestration.memory_budget import private_rss
+from orchestration.metrics import DEGRADED_STAGES, EXTERNAL_CALLS
+from orchestration.pipeline import generate_presentation
+from orchestration.workspace import Workspace
+
+SUBJECTS = ['Renewable Energy', 'Remote Work', 'Supply Chains', 'Quantum Computing', 'Urban Farming',
+            'Cybersecurity', 'Electric Vehicles', 'Telemedicine', 'Space Tourism', 'Microfinance',
+            'Ocean Plastics', 'Edge Computing', 'Gene Therapy', 'Smart Cities', 'Online Learning']
+ANGLES = ['for Beginners', 'in 2030', 'for Small Businesses', 'in Emerging Markets', 'and Public Policy']
+
+# How often peak RSS is sampled
+RSS_SAMPLE_SECONDS = 0.2
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def isolate_caches(root: Path):
+    """Point every shared cache at an empty directory so each load test starts cold."""
+    for name in ('images', 'diagrams', 'outlines', 'plans', 'themes'):
+        config.PPTConfig.PATHS[name] = root / name
+        (root / name).mkdir(parents=True, exist_ok=True)
+    config.PPTConfig.IMAGE_LIBRARY['dirs'] = []
+    config.PPTConfig.IMAGE_LIBRARY['index_path'] = root / "image_library.json"
+    config.PPTConfig.WORKSPACE['root'] = root / "runs"
+    config.PPTConfig.WARMING['request_log'] = root / "requests.jsonl"
+
+
+class RssSampler(threading.Thread):
+    """Tracks the highest private RSS of this process while the test runs."""
+
+    def __init__(self):
+        super().__init__(name='rss-sampler', daemon=True)
+        self.peak = private_rss() or 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, private_rss() or 0)
+
+
+class LoadTest:
+    """
+    Drives generate_presentation the way the Streamlit app does (one run
+    workspace per deck) at a Poisson arrival rate, with at most `concurrency`
+    decks in progress. Decks arriving while all slots are busy wait in line,
+    and the wait counts towards their latency. rate=None runs closed-loop:
+    each slot starts its next deck as soon as the last one finishes.
+    """
+
+    def __init__(self, decks: int, concurrency: int, rate=None, slides: int = 6, style: str = 'dark',
+                 output_dir: Path = None, seed: int = None, verbose: bool = False):
+        self.decks = decks
+        self.concurrency = concurrency
+        self.rate = rate
+        self.slides = slides
+        self.style = style
+        self.output_dir = output_dir
+        self.random = random.Random(seed)
+        self.verbose = verbose
+        self.results = []
+        self._lock = threading.Lock()
+
+    def topics(self):
+        combos = [f"{subject} {angle}" for subject, angle in itertools.product(SUBJECTS, ANGLES)]
+        self.random.shuffle(combos)
+        return itertools.islice(itertools.cycle(combos), self.decks)
+
+    def run_deck(self, index: int, topic: str, arrived=None):
+        started = time.monotonic()
+        # Closed loop: a deck arrives when its slot frees up, so it never queues
+        arrived = started if arrived is None else arrived
+        outcome, error = 'ok', None
+        try:
+            with Workspace(output_dir=self.output_dir / f"deck-{index}"):
+                if not generate_presentation(topic, self.slides, self.style):
+                    outcome, error = 'failed', 'no outline'
+        except Exception as e:
+            outcome, error = 'failed', f"{type(e).__name__}: {e}"
+        finished = time.monotonic()
+        result = {'index': index, 'topic': topic, 'outcome': outcome, 'error': error,
+                  'queued': started - arrived, 'service': finished - started, 'latency': finished - arrived}
+        with self._lock:
+            self.results.append(result)
+            done = len(self.results)
+        status = 'ok' if outcome == 'ok' else f"FAILED ({error})"
+        print(f"   ... [{done}/{self.decks}] {topic}: {result['latency']:.1f}s {status}", file=sys.__stdout__)
+
+    def run(self) -> float:
+        """Submit every deck on schedule and wait for all of them. Returns the wall time."""
+        started = time.monotonic()
+        quiet = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+        with quiet, ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='deck') as executor:
+            next_arrival = started
+            for index, topic in enumerate(self.topics()):
+                if self.rate:
+                    delay = next_arrival - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_arrival += self.random.expovariate(self.rate / 60)
+                executor.submit(self.run_deck, index, topic, time.monotonic() if self.rate else None)
+        return time.monotonic() - started
+
+    def report(self, wall: float, peak_rss: int, services: FakeServices) -> dict:
+        ok = [result for result in self.results if result['outcome'] == 'ok']
+        latencies = [result['latency'] for result in ok]
+        external = {}
+        for _, (dependency, operation, outcome), _, value in EXTERNAL_CALLS._samples():
+            calls = external.setdefault(f"{dependency} {operation}", {'ok': 0, 'error': 0, 'rejected': 0})
+            calls[outcome] += int(value)
+        return {
+            'decks': len(self.results),
+            'ok': len(ok),
+            'error_rate': round(1 - len(ok) / len(self.results), 4) if self.results else 0.0,
+            'wall_seconds': round(wall, 1),
+            'throughput_per_minute': round(len(ok) / wall * 60, 2) if wall else 0.0,
+            'latency_seconds': {name: round(percentile(latencies, fraction), 2)
+                                for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p95', 0.95), ('p99', 0.99))},
+            'max_latency_seconds': round(max(latencies, default=0.0), 2),
+            'queue_p95_seconds': round(percentile([result['queued'] for result in self.results], 0.95), 2),
+            'service_p50_seconds': round(percentile([result['service'] for result in ok], 0.5), 2),
+            'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'degraded_stages': {stage: int(value) for _, (stage,), _, value in DEGRADED_STAGES._samples()},
+            'external_calls': external,
+            'fake_errors': dict(services.errors),
+            'errors': sorted({result['error'] for result in self.results if result['error']}),
+        }
+
+
+def print_report(report: dict, args):
+    mode = f"{args.rate}/min arrivals" if args.rate else "closed loop"
+    print(f"\n--- Load test: {report['decks']} decks, concurrency {args.concurrency}, {mode} ---")
+    print(f"-> Completed {report['ok']}/{report['decks']} (error rate {report['error_rate']:.1%}) "
+          f"in {report['wall_seconds']}s: {report['throughput_per_minute']} decks/min")
+    latency = report['latency_seconds']
+    print(f"-> Latency p50 {latency['p50']}s, p90 {latency['p90']}s, p95 {latency['p95']}s, "
+          f"p99 {latency['p99']}s, max {report['max_latency_seconds']}s")
+    print(f"   ... queue wait p95 {report['queue_p95_seconds']}s, service time p50 {report['service_p50_seconds']}s")
+    print(f"-> Peak private RSS {report['peak_rss_mb']} MB (max RSS {report['max_rss_mb']} MB)")
+    for name, calls in sorted(report['external_calls'].items()):
+        print(f"   ... {name}: {calls['ok']} ok, {calls['error']} errors, {calls['rejected']} rejected")
+    if report['degraded_stages']:
+        skipped = ', '.join(f"{stage} x{count}" for stage, count in sorted(report['degraded_stages'].items()))
+        print(f"-> Stages skipped to meet deadlines: {skipped}")
+    for error in report['errors']:
+        print(f"Warning: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test deck generation offline against fake Gemini and Pexels services')
+    parser.add_argument('--decks', type=int, default=20, help='Decks to generate (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Most decks in progress at once (default: 4)')
+    parser.add_argument('--rate', type=float, help='Arrivals per minute (Poisson); closed loop if omitted')
+    parser.add_argument('--slides', type=int, default=6, help='Slides per deck (default: 6)')
+    parser.add_argument('--style', default='dark', choices=['dark', 'light'])
+    parser.add_argument('--time-scale', type=float, help="Multiply the fakes' latencies (default: LOAD_TEST['time_scale'])")
+    parser.add_argument('--pexels-keys', type=int, help="Fake Pexels keys in the pool (default: LOAD_TEST['pexels_keys'])")
+    parser.add_argument('--seed', type=int, help='Seed topics, arrivals and fake latencies for a repeatable run')
+    parser.add_argument('--warm-caches', action='store_true', help='Use the real shared caches instead of empty ones')
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline log of every deck')
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix='pptgen-loadtest-'))
+    if not args.warm_caches:
+        isolate_caches(scratch / "cache")
+    services = FakeServices(time_scale=args.time_scale, seed=args.seed)
+    test = LoadTest(args.decks, args.concurrency, args.rate, args.slides, args.style,
+                    output_dir=scratch / "output", seed=args.seed, verbose=args.verbose)
+    sampler = RssSampler()
+    try:
+        with offline_services(services, pexels_keys=args.pexels_keys):
+            sampler.start()
+            wall = test.run()
+            sampler.stopped.set()
+        report = test.report(wall, sampler.peak, services)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print_report(report, args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"-> Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
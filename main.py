@@ -1,35 +1,11 @@
 import argparse
+import json
 import os
-import shutil
-from pathlib import Path
 from dotenv import load_dotenv
-from orchestration.content_engine import generate_slide_outline, decide_slide_layout, generate_visual_keyword
-from orchestration.visual_engine import create_presentation
-from orchestration.image_engine import search_and_download_photo, get_supporting_images
-
-def cleanup_output_directories():
-    """Clean up all generated images and diagrams from output directories."""
-    try:
-        # Clean up images directory
-        images_dir = Path("output/images")
-        if images_dir.exists():
-            shutil.rmtree(images_dir)
-            print("-> Cleaned up images directory")
-            
-        # Clean up diagrams directory
-        diagrams_dir = Path("output/diagrams")
-        if diagrams_dir.exists():
-            shutil.rmtree(diagrams_dir)
-            print("-> Cleaned up diagrams directory")
-            
-        # Clean up cache directory
-        cache_dir = Path("output/cache")
-        if cache_dir.exists():
-            shutil.rmtree(cache_dir)
-            print("-> Cleaned up cache directory")
-            
-    except Exception as e:
-        print(f"Warning: Error during cleanup: {str(e)}")
+import config
+from orchestration.deck_manifest import manifest_path_for
+from orchestration.metrics import dump_metrics, start_metrics_server
+from orchestration.pipeline import generate_presentation, regenerate_presentation
 
 def main():
     # Load environment variables
@@ -45,57 +21,52 @@ def main():
     
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Generate a professional PowerPoint presentation')
-    parser.add_argument('topic', type=str, help='The topic of the presentation')
+    parser.add_argument('topic', type=str, nargs='?', help='The topic of the presentation')
     parser.add_argument('--slides', type=int, default=6, help='Number of slides (default: 6)')
-    parser.add_argument('--style', type=str, default='dark', choices=['dark', 'light'], help='Presentation style (default: dark)')
+    parser.add_argument('--style', type=str, default=None, choices=['dark', 'light'], help='Presentation style (default: dark)')
+    parser.add_argument('--regenerate', type=str, metavar='MANIFEST', help='Rebuild a deck from its .manifest.json, re-rendering only edited slides')
+    parser.add_argument('--edits', type=str, metavar='JSON_FILE', help='With --regenerate: JSON object mapping 0-based slide index to changed fields')
+    parser.add_argument('--no-outline-cache', action='store_true', help='Always generate a fresh outline instead of reusing one for a similar topic')
+    parser.add_argument('--metrics-file', type=str, metavar='PATH', help='Write Prometheus metrics for this run to PATH when it ends')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT', help='Serve Prometheus metrics on PORT while the run is going')
+    parser.add_argument('--profile', action='store_true', help='Profile CPU time and memory and write <deck>.profile.txt next to the deck')
     args = parser.parse_args()
     
+    metrics_port = args.metrics_port or config.PPTConfig.METRICS['port']
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    try:
+        run(parser, args)
+    finally:
+        if args.metrics_file:
+            print(f"-> Metrics written to {dump_metrics(args.metrics_file)}")
+
+def run(parser, args):
+    if args.regenerate:
+        edits = {}
+        if args.edits:
+            with open(args.edits) as f:
+                edits = {int(index): fields for index, fields in json.load(f).items()}
+        print("\n--- Regenerating the Majestic Presentation ---")
+        output_file = regenerate_presentation(args.regenerate, edits, style=args.style)
+        print(f"\n-> Presentation regenerated successfully: {output_file}")
+        return
+    
+    if not args.topic:
+        parser.error("topic is required unless --regenerate is given")
+    args.style = args.style or 'dark'
+    
     print("\n--- Generating the Majestic Presentation ---")
     print(f"Topic: '{args.topic}', Slides: {args.slides}, Style: '{args.style}'")
     
-    try:
-        # Generate slide outline
-        print("-> AI generating text outline...")
-        slides = generate_slide_outline(args.topic, args.slides)
-        if not slides:
-            print("ERROR: Failed to generate slide outline")
-            return
-        
-        # Enrich slides with images and layouts
-        enriched_slides = []
-        for i, slide_data in enumerate(slides):
-            print(f"\n-> Processing slide {i+1}: {slide_data['slide_title']}")
-            
-            # Set layout
-            if i == 0:
-                slide_data['layout'] = "Title Layout"
-            else:
-                slide_data['layout'] = decide_slide_layout(slide_data)
-            
-            # Generate and download background image
-            visual_keyword = generate_visual_keyword(slide_data['slide_title'], slide_data['slide_body'])
-            if visual_keyword:
-                print(f"-> Searching for background image: {visual_keyword}")
-                image_path = search_and_download_photo(visual_keyword, is_background=True)
-                if image_path:
-                    slide_data['image_path'] = image_path
-            
-            # Get supporting images for non-title slides
-            if i > 0:
-                supporting_images = get_supporting_images(slide_data)
-                if supporting_images:
-                    slide_data['supporting_images'] = supporting_images
-            
-            enriched_slides.append(slide_data)
-        
-        # Create the presentation
-        output_file = create_presentation(enriched_slides, args.topic, args.style, args.slides)
-        print(f"\n-> Presentation generated successfully: {output_file}")
-        
-    finally:
-        # Clean up temporary files
-        print("\n-> Cleaning up temporary files...")
-        cleanup_output_directories()
+    # Scratch files live in a private per-run workspace that is removed when the run ends
+    output_file = generate_presentation(args.topic, args.slides, args.style,
+                                        use_outline_cache=not args.no_outline_cache,
+                                        profile=args.profile)
+    if not output_file:
+        return
+    print(f"\n-> Presentation generated successfully: {output_file}")
+    print(f"-> Deck manifest (for --regenerate): {manifest_path_for(output_file)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
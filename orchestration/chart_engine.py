@@ -0,0 +1,252 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+from pptx.chart.data import CategoryChartData
+from pptx.dml.color import RGBColor
+from pptx.enum.chart import XL_CHART_TYPE, XL_LABEL_POSITION, XL_LEGEND_POSITION, XL_MARKER_STYLE
+from pptx.util import Pt
+import config
+from .text_analysis import NumberToken, analyze_slide, plain_text
+
+_SENTENCE_RE = re.compile(r"[^\n]+?(?:(?<=[.!?])(?=\s)|$)", re.MULTILINE)
+# A label is looked for only within the clause around its number
+_CLAUSE_BREAK_RE = re.compile(r"[,;:()]|\s(?:and|while|but|whereas|versus|vs\.?|compared with)\s", re.IGNORECASE)
+_LABEL_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'&-]*")
+
+# Words around a number that say how it changed, not what it measures
+_FILLER = {
+    'a', 'an', 'the', 'of', 'in', 'on', 'at', 'by', 'to', 'for', 'from', 'with', 'than', 'as', 'per',
+    'is', 'are', 'was', 'were', 'be', 'been', 'has', 'have', 'had', 'will', 'would', 'could',
+    'reached', 'reach', 'reaches', 'hit', 'hits', 'grew', 'grow', 'grows', 'rose', 'rise', 'rises',
+    'fell', 'fall', 'falls', 'increased', 'decreased', 'jumped', 'dropped', 'stood', 'accounted',
+    'accounts', 'account', 'hold', 'holds', 'held', 'made', 'makes', 'totaled', 'totalled', 'generated',
+    'up', 'down',
+    'about', 'around', 'nearly', 'almost', 'roughly', 'approximately', 'over', 'under', 'more', 'less',
+    'only', 'just', 'some', 'its', 'their', 'our', 'we', 'it', 'this', 'that', 'these', 'those',
+    'which', 'first', 'second', 'next', 'then', 'finally', 'now', 'today', 'share', 'percent',
+}
+
+BAR, LINE, PIE = 'bar', 'line', 'pie'
+
+_CHART_TYPES = {BAR: XL_CHART_TYPE.COLUMN_CLUSTERED, LINE: XL_CHART_TYPE.LINE_MARKERS, PIE: XL_CHART_TYPE.PIE}
+
+# Preferred series when a slide has as many numbers of two kinds
+_UNIT_ORDER = ('%', '$', 'x', '')
+
+# Words before a number that make it a position or a name, not a measurement
+_ORDINAL_WORDS = {
+    'step', 'steps', 'phase', 'stage', 'version', 'v', 'chapter', 'part', 'level', 'tier', 'round',
+    'day', 'week', 'month', 'quarter', 'q', 'no', 'number', 'item', 'option', 'rule', 'lesson',
+    'module', 'grade', 'class', 'type', 'gen', 'generation', 'release', 'top',
+}
+_SCALE_WORDS = {'million', 'billion', 'trillion', 'k', 'm', 'bn'}
+_NEXT_WORD_RE = re.compile(r"\s*([A-Za-z][A-Za-z'-]*)")
+_PREVIOUS_WORD_RE = re.compile(r"([A-Za-z]+)\s*$")
+
+
+class ChartSpec(NamedTuple):
+    kind: str                       # BAR, LINE or PIE
+    categories: Tuple[str, ...]
+    values: Tuple[float, ...]       # Already divided by the display scale
+    number_format: str              # Excel format for data labels, e.g. '$#,##0.0"B"'
+    series_name: str
+
+
+def _is_year(token: NumberToken) -> bool:
+    return token.unit == '' and token.text.isdigit() and len(token.text) == 4 and 1900 <= token.value <= 2100
+
+
+def _is_ordinal(plain: str, token: NumberToken) -> bool:
+    """A step, version or code ("Step 2", "version 3", "5G", "v2") rather than a quantity."""
+    before, after = plain[:token.start], plain[token.start + len(token.text):]
+    if before[-1:].isalpha() or before[-1:] in ('-', '#') or (token.unit == '' and after[:1].isalpha()):
+        return True
+    previous = _PREVIOUS_WORD_RE.search(before)
+    return bool(previous) and previous.group(1).lower() in _ORDINAL_WORDS
+
+
+def _measured_noun(plain: str, token: NumberToken) -> Optional[str]:
+    """The word right after a plain count, e.g. 'employee' in "1,200 employees"."""
+    following = plain[token.start + len(token.text):]
+    words = []
+    for _ in range(2):
+        match = _NEXT_WORD_RE.match(following)
+        if not match:
+            break
+        words.append(match.group(1).lower())
+        following = following[match.end():]
+    words = [word for word in words if word not in _SCALE_WORDS][:1]
+    return words[0].rstrip('s') if words and words[0] not in _FILLER else None
+
+
+def _span(spans: List[Tuple[int, int]], offset: int) -> Tuple[int, int]:
+    return next(((start, end) for start, end in spans if start <= offset < end), (0, 0))
+
+
+def _label(plain: str, token: NumberToken, sentence: Tuple[int, int]) -> str:
+    """What a number measures: the last words before it in its clause, else the first words after it."""
+    start, end = sentence
+    breaks = [match for match in _CLAUSE_BREAK_RE.finditer(plain[start:token.start])]
+    # "Retail: $40M" is labelled by the words before the colon
+    if breaks and breaks[-1].group() == ':' and not plain[start + breaks[-1].end():token.start].strip():
+        breaks.pop()
+    clause_start = max([start] + [match.end() + start for match in breaks])
+    following = plain[token.start + len(token.text):end]
+    clause_end = token.start + len(token.text) + next((match.start() for match in _CLAUSE_BREAK_RE.finditer(following)),
+                                                      len(following))
+    before = [word for word in _LABEL_WORD_RE.findall(plain[clause_start:token.start])
+              if word.lower() not in _FILLER]
+    after = [word for word in _LABEL_WORD_RE.findall(plain[token.start + len(token.text):clause_end])
+             if word.lower() not in _FILLER and word.lower() not in ('million', 'billion', 'trillion', 'x', 'k', 'm', 'bn')]
+    words = before[-3:] or after[:3]
+    label = ' '.join(words)
+    return label[:1].upper() + label[1:]
+
+
+def _display_scale(values: List[float], unit: str) -> Tuple[float, str, str]:
+    """(divisor, suffix, Excel number format) that keeps data labels short without hiding small values."""
+    smallest = min((abs(value) for value in values if value), default=0)
+    divisor, suffix = next(((scale, suffix) for scale, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K'))
+                            if smallest >= scale and unit not in ('%', 'x')), (1, ''))
+    whole = all(float(value / divisor).is_integer() for value in values)
+    digits = '#,##0' if whole else '#,##0.0'
+    if unit == '%':
+        return 1, '', f'{digits}"%"'
+    if unit == 'x':
+        return 1, '', f'{digits}"x"'
+    prefix = '"$"' if unit == '$' else ''
+    return divisor, suffix, f'{prefix}{digits}' + (f'"{suffix}"' if suffix else '')
+
+
+def extract_chart(slide_data: dict) -> Optional[ChartSpec]:
+    """
+    A chart for the numeric series in a slide body, or None if it has none.
+
+    Numbers are grouped by unit (%, currency, multiples, plain counts) and the
+    largest group is charted if it has at least CHARTS['min_points'] values.
+    Steps, versions and codes ("Step 2", "v3", "5G") are not values, and plain
+    counts only chart over years or when they count the same thing.
+    Values labelled by a year in their sentence become a line chart over the
+    years; percentages that add up to about 100 become a pie; anything else
+    is a bar chart labelled with the words next to each number, or no chart
+    if a label is missing or repeated.
+    """
+    settings = config.PPTConfig.CHARTS
+    if not settings['enabled']:
+        return None
+    analysis = analyze_slide(slide_data)
+    plain = plain_text(analysis.body)
+    sentences = [match.span() for match in _SENTENCE_RE.finditer(plain)]
+    years = [token for token in analysis.numbers if _is_year(token)]
+
+    def year_of(token: NumberToken) -> Optional[str]:
+        # A year in the same sentence makes the value a point in time
+        sentence = _span(sentences, token.start)
+        same_sentence = [year for year in years if sentence[0] <= year.start < sentence[1]]
+        end = token.start + len(token.text)
+        year = min(same_sentence, key=lambda year: year.start - end if year.start >= end
+                   else token.start - (year.start + len(year.text)), default=None)
+        return year.text if year else None
+
+    groups = {}
+    for token in analysis.numbers:
+        if not _is_year(token) and not _is_ordinal(plain, token):
+            groups.setdefault(token.unit, []).append(token)
+    # Plain counts only chart as a series over years or of one measured thing
+    # ("1,200 employees ... 800 employees"), not "3 pillars and 5 principles"
+    counts = groups.get('', [])
+    nouns = {_measured_noun(plain, token) for token in counts}
+    over_years = all(year_of(token) for token in counts) and len({year_of(token) for token in counts}) == len(counts)
+    if counts and not over_years and (len(nouns) != 1 or None in nouns):
+        del groups['']
+    if not groups:
+        return None
+    unit, tokens = max(groups.items(), key=lambda item: (len(item[1]), -_UNIT_ORDER.index(item[0])))
+    if len(tokens) < settings['min_points']:
+        return None
+    tokens = tokens[:settings['max_points']]
+    points = [(token, year_of(token), _label(plain, token, _span(sentences, token.start))) for token in tokens]
+
+    year_labels = [year for _, year, _ in points]
+    if all(year_labels) and len(set(year_labels)) == len(points):
+        kind = LINE
+        points.sort(key=lambda point: point[1])
+        categories = [year for _, year, _ in points]
+    else:
+        total = sum(token.value for token, _, _ in points)
+        kind = (PIE if unit == '%' and all(token.value > 0 for token, _, _ in points)
+                and abs(total - 100) <= settings['pie_total_tolerance'] else BAR)
+        categories = [label for _, _, label in points]
+        # A bar nobody can name, or two bars with one name, would mislabel the values
+        if not all(categories) or len(set(categories)) < len(categories):
+            return None
+
+    raw = [token.value for token, _, _ in points]
+    divisor, suffix, number_format = _display_scale(raw, unit)
+    series_name = slide_data.get('slide_title', '') or 'Values'
+    return ChartSpec(kind, tuple(categories), tuple(value / divisor for value in raw), number_format, series_name)
+
+
+def _palette(theme: dict, count: int) -> List[RGBColor]:
+    """Shades of the accent colour, blended towards the background, for pie slices."""
+    accent, bg = theme['accent'], theme['bg']
+    shades = []
+    for i in range(count):
+        mix = i / max(count, 2) * 0.75
+        shades.append(RGBColor(*(int(a + (b - a) * mix) for a, b in zip(accent, bg))))
+    return shades
+
+
+def add_chart(slide, spec: ChartSpec, left, top, width, height, theme: dict):
+    """Draw a spec as a native (editable) PowerPoint chart in the theme's colours."""
+    chart_data = CategoryChartData(number_format=spec.number_format)
+    chart_data.categories = spec.categories
+    chart_data.add_series(spec.series_name, spec.values)
+    chart = slide.shapes.add_chart(_CHART_TYPES[spec.kind], left, top, width, height, chart_data).chart
+
+    chart.font.name = theme['font']
+    chart.font.size = Pt(12)
+    chart.font.color.rgb = theme['text']
+    chart.has_title = False
+    plot = chart.plots[0]
+    plot.has_data_labels = True
+    labels = plot.data_labels
+    labels.number_format = spec.number_format
+    labels.number_format_is_linked = False
+    labels.font.size = Pt(12)
+    labels.font.color.rgb = theme['text']
+    series = plot.series[0]
+
+    if spec.kind == PIE:
+        chart.has_legend = True
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+        chart.legend.font.color.rgb = theme['text']
+        labels.position = XL_LABEL_POSITION.CENTER
+        labels.font.color.rgb = RGBColor(255, 255, 255)
+        for point, color in zip(series.points, _palette(theme, len(spec.values))):
+            point.format.fill.solid()
+            point.format.fill.fore_color.rgb = color
+        return chart
+
+    chart.has_legend = False
+    value_axis, category_axis = chart.value_axis, chart.category_axis
+    value_axis.visible = False
+    value_axis.has_major_gridlines = False
+    category_axis.format.line.color.rgb = theme['subtext']
+    category_axis.tick_labels.font.color.rgb = theme['subtext']
+    if spec.kind == LINE:
+        series.smooth = False
+        series.format.line.color.rgb = theme['accent']
+        series.format.line.width = Pt(3)
+        series.marker.style = XL_MARKER_STYLE.CIRCLE
+        series.marker.size = 9
+        series.marker.format.fill.solid()
+        series.marker.format.fill.fore_color.rgb = theme['accent']
+        series.marker.format.line.color.rgb = theme['accent']
+        labels.position = XL_LABEL_POSITION.ABOVE
+    else:
+        plot.gap_width = 60
+        series.format.fill.solid()
+        series.format.fill.fore_color.rgb = theme['accent']
+        labels.position = XL_LABEL_POSITION.OUTSIDE_END
+    return chart
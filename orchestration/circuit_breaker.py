@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+import config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+def _counts_as_failure(exc: Exception) -> bool:
+    """Client errors (bad query, missing photo) say nothing about the dependency's health."""
+    status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return not (status is not None and status < 500 and status != 429)
+
+
+class CircuitBreaker:
+    """
+    Tracks one dependency's recent calls in a rolling time window and stops
+    calling it while it is failing or too slow.
+
+    closed    -> calls go through; trips to open once the window holds at least
+                 min_calls and the failure or slow-call rate reaches its limit.
+    open      -> calls fail immediately with CircuitOpenError for open_seconds.
+    half-open -> up to half_open_probes calls are let through; a success closes
+                 the circuit, a failure opens it again.
+    """
+
+    def __init__(self, name: str, window_seconds: float = 60, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 10,
+                 slow_call_rate: float = 0.8, open_seconds: float = 30, half_open_probes: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._calls = deque()  # (finished_at, ok, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Claim permission for one call. Every allowed call must be followed by record()."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._state, self._probes = HALF_OPEN, 0
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def _open(self, now: float):
+        if self._state != OPEN:
+            print(f"Warning: {self.name} is unhealthy; failing fast for {self.open_seconds:.0f}s")
+        self._state, self._opened_at = OPEN, now
+
+    def record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if ok and latency < self.slow_call_seconds:
+                    print(f"-> {self.name} has recovered")
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, ok, latency))
+            self._trim(now)
+            total = len(self._calls)
+            if self._state == CLOSED and total >= self.min_calls:
+                failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+                slow = sum(1 for _, _, call_latency in self._calls if call_latency >= self.slow_call_seconds)
+                if failures / total >= self.failure_rate or slow / total >= self.slow_call_rate:
+                    self._open(now)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Run func through the breaker, raising CircuitOpenError while the circuit is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record(not _counts_as_failure(e), time.monotonic() - started)
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = list(self._calls)
+        total = len(calls)
+        return {
+            'state': self.state,
+            'calls': total,
+            'failure_rate': round(sum(1 for _, ok, _ in calls if not ok) / total, 3) if total else 0.0,
+            'p50_latency': round(sorted(latency for _, _, latency in calls)[total // 2], 3) if total else None,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for a dependency, configured from PPTConfig.CIRCUIT_BREAKERS."""
+    with _breakers_lock:
+        if name not in _breakers:
+            settings = config.PPTConfig.CIRCUIT_BREAKERS
+            _breakers[name] = CircuitBreaker(name, **{**settings['default'], **settings.get(name, {})})
+        return _breakers[name]
+
+
+def health_snapshot() -> Dict[str, dict]:
+    """State and recent error rate/latency of every dependency called so far."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
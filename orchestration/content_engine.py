@@ -1,12 +1,76 @@
 import json
-from .gemini_client import gemini_chat
+from typing import Callable, List, Optional
+import config
+from .gemini_client import gemini_chat, gemini_chat_stream
+from .layout_engine import SlideLayout, classify_slide_layout, is_confident
+from .outline_cache import get_outline_cache
+from .metrics import cache_lookup
 
 # --- AI Configuration ---
 
-def generate_slide_outline(topic: str, num_slides: int) -> list:
+# The outline is one long call the deck cannot do without
+OUTLINE_TIMEOUT = 120
+
+class OutlineStreamParser:
+    """
+    Pulls complete slide objects out of a streamed JSON outline as soon as each
+    closing brace arrives, so work on early slides can start before the rest exists.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> List[dict]:
+        self._buffer += text
+        slides = []
+        while True:
+            start = self._buffer.find('{', self._pos)
+            if start == -1:
+                break
+            try:
+                obj, end = self._decoder.raw_decode(self._buffer, start)
+            except json.JSONDecodeError:
+                break  # Object not complete yet
+            self._pos = end
+            if isinstance(obj, dict) and obj.get('slide_title'):
+                slides.append(obj)
+        return slides
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+def _parse_outline_json(response: str) -> list:
+    # Extract JSON from the response
+    json_str = response.strip()
+    if json_str.startswith('```json'):
+        json_str = json_str[7:]
+    if json_str.endswith('```'):
+        json_str = json_str[:-3]
+    return json.loads(json_str.strip())
+
+def generate_slide_outline(topic: str, num_slides: int,
+                           on_slide: Optional[Callable[[dict], None]] = None,
+                           use_cache: bool = True) -> list:
     """
     Generate a structured outline for the presentation using Gemini.
+    If on_slide is given, the outline is streamed and on_slide is called with
+    each slide as soon as it is complete (e.g. to prefetch its images).
+    An outline cached for a near-identical topic is served instead unless
+    use_cache is False or OUTLINE_CACHE is disabled.
     """
+    use_cache = use_cache and config.PPTConfig.OUTLINE_CACHE['enabled']
+    if use_cache:
+        cached = _cached_outline(topic, num_slides)
+        cache_lookup('outlines', bool(cached))
+        if cached:
+            if on_slide:
+                for slide in cached:
+                    on_slide(slide)
+            return cached
+
     prompt = f"""Generate a professional presentation outline for the topic '{topic}' with {num_slides} slides.
     Each slide should have a title, body content, and visual focus.
     Return the response in JSON format with the following structure:
@@ -20,24 +84,82 @@ def generate_slide_outline(topic: str, num_slides: int) -> list:
     ]
     Make it engaging and include relevant statistics and examples."""
 
-    response = gemini_chat(prompt)
     try:
-        # Extract JSON from the response
-        json_str = response.strip()
-        if json_str.startswith('```json'):
-            json_str = json_str[7:]
-        if json_str.endswith('```'):
-            json_str = json_str[:-3]
-        return json.loads(json_str.strip())
+        if on_slide:
+            response = _stream_outline(prompt, num_slides, on_slide)
+        else:
+            response = gemini_chat(prompt, timeout=OUTLINE_TIMEOUT)
+    except Exception as e:
+        print(f"Error generating outline: {e}")
+        return []
+    try:
+        slides = _parse_outline_json(response)
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON response: {e}")
         print(f"Raw response: {response}")
         return []
+    if use_cache and slides:
+        try:
+            get_outline_cache().store(topic, num_slides, slides)
+        except OSError as e:
+            print(f"Warning: Could not cache outline: {e}")
+    return slides
+
+def _cached_outline(topic: str, num_slides: int) -> Optional[list]:
+    try:
+        match = get_outline_cache().lookup(topic, num_slides)
+    except OSError as e:
+        print(f"Warning: Outline cache unavailable: {e}")
+        return None
+    if not match:
+        return None
+    slides, cached_topic, similarity = match
+    print(f"   ... Reusing the outline for '{cached_topic}' (similarity {similarity:.2f})")
+    return slides
+
+def _stream_outline(prompt: str, num_slides: int, on_slide: Callable[[dict], None]) -> str:
+    """
+    Stream the outline, handing each finished slide to on_slide. Returns the full text.
+    If the stream breaks, the slides already handed out are kept (their images
+    may be prefetching) and only the rest are requested in one piece.
+    """
+    parser = OutlineStreamParser()
+    received = []
+    try:
+        for text in gemini_chat_stream(prompt, timeout=OUTLINE_TIMEOUT):
+            for slide in parser.feed(text):
+                received.append(slide)
+                on_slide(slide)
+        return parser.text
+    except Exception as e:
+        if not received:
+            print(f"Error streaming outline, requesting it in one piece: {e}")
+            return gemini_chat(prompt, timeout=OUTLINE_TIMEOUT)
+        missing = num_slides - len(received)
+        if missing <= 0:
+            return json.dumps(received)
+        print(f"Error streaming outline after {len(received)} slides, requesting the other {missing}: {e}")
+
+    rest_prompt = f"""{prompt}
+
+    The first {len(received)} slides are already written:
+    {json.dumps(received, indent=1)}
+    Return only the remaining {missing} slides, as a JSON array in the same format."""
+    rest = [slide for slide in _parse_outline_json(gemini_chat(rest_prompt, timeout=OUTLINE_TIMEOUT))
+            if isinstance(slide, dict) and slide.get('slide_title')][:missing]
+    for slide in rest:
+        on_slide(slide)
+    return json.dumps(received + rest)
 
-def decide_slide_layout(slide_data: dict) -> str:
+def decide_slide_layout(slide_data: dict) -> SlideLayout:
     """
-    Decide the best layout for a slide based on its content using Gemini.
+    Decide the best layout for a slide based on its content.
+    The local classifier answers first; Gemini is only asked on low confidence.
     """
+    layout, confidence = classify_slide_layout(slide_data)
+    if is_confident(confidence):
+        return layout
+
     prompt = f"""Based on this slide content, suggest the best layout type:
     Title: {slide_data.get('slide_title', '')}
     Content: {slide_data.get('slide_body', '')}
@@ -51,12 +173,17 @@ def decide_slide_layout(slide_data: dict) -> str:
     
     Return only the layout name."""
 
-    response = gemini_chat(prompt)
-    return response.strip()
+    try:
+        response = gemini_chat(prompt)
+    except Exception as e:
+        print(f"Error deciding layout with Gemini, using local rules: {e}")
+        return layout
+    return SlideLayout.parse(response) or layout
 
-def generate_visual_keyword(slide_title: str, slide_body: str) -> str:
+def generate_visual_keyword(slide_title: str, slide_body: str, visual_focus: str = '') -> str:
     """
     Generate a keyword for image search using Gemini.
+    Falls back to the outline's visual focus (or the title) if Gemini is unavailable.
     """
     prompt = f"""Generate a specific, descriptive keyword for finding a relevant image for this slide:
     Title: {slide_title}
@@ -65,7 +192,12 @@ def generate_visual_keyword(slide_title: str, slide_body: str) -> str:
     The keyword should be specific enough to find a relevant image but not too long.
     Return only the keyword."""
 
-    response = gemini_chat(prompt)
+    try:
+        response = gemini_chat(prompt)
+    except Exception as e:
+        fallback = (visual_focus or slide_title).replace('*', '').strip()
+        print(f"Error generating visual keyword, using '{fallback}': {e}")
+        return fallback
     return response.strip()
 
 def generate_diagram_code(slide_data: dict) -> str:
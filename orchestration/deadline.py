@@ -0,0 +1,95 @@
+import contextvars
+import time
+from typing import List, Optional, Tuple
+import config
+from .metrics import DEGRADED_STAGES
+
+# Optional work, in the order it is given up as a deck runs out of time
+STAGES = ('image_scoring', 'supporting_images', 'diagrams', 'backgrounds')
+
+_current = contextvars.ContextVar('deck_deadline', default=None)
+
+
+class Deadline:
+    """
+    A per-deck time budget shared by every stage of generation.
+
+    Each optional stage needs a share of the budget left to run
+    (DEADLINE['min_remaining']), so scoring search results is dropped first,
+    then supporting images, diagrams and Pexels backgrounds, while rendering and saving the deck always
+    keep DEADLINE['render_reserve'] seconds. Expiry is wall-clock based so the
+    same deadline can be handed to worker processes.
+
+    Entering the context makes it the current deadline for request timeouts and
+    stage checks in this thread (and in threads started with a copy of its context).
+    """
+
+    def __init__(self, seconds: Optional[float] = None, expires_at: Optional[float] = None):
+        settings = config.PPTConfig.DEADLINE
+        self.seconds = seconds if seconds is not None else settings['seconds']
+        self.expires_at = expires_at if expires_at is not None else time.time() + self.seconds
+        self.degraded: List[Tuple[str, str]] = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def allows(self, stage: str) -> bool:
+        """True while enough of the budget is left for an optional stage."""
+        settings = config.PPTConfig.DEADLINE
+        needed = settings['min_remaining'][stage] * self.seconds + settings['render_reserve']
+        return self.remaining > needed
+
+    def record(self, stage: str, slide_title: str):
+        self.degraded.append((stage, slide_title))
+
+    def report(self) -> str:
+        elapsed = self.seconds - (self.expires_at - time.time())
+        if not self.degraded:
+            return f"-> Deck finished in {elapsed:.0f}s of its {self.seconds:.0f}s budget, nothing degraded"
+        lines = [f"-> Deck finished in {elapsed:.0f}s of its {self.seconds:.0f}s budget, degraded to stay on time:"]
+        for stage in STAGES:
+            titles = [title for skipped, title in self.degraded if skipped == stage]
+            if titles:
+                lines.append(f"   ... Skipped {stage.replace('_', ' ')} on {len(titles)} slide(s): {', '.join(titles)}")
+        return "\n".join(lines)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def stage_allowed(stage: str, slide_data: Optional[dict] = None) -> bool:
+    """
+    Whether an optional stage may still run under the current deadline. A
+    skipped stage is recorded on the deadline and in slide_data['degraded'].
+    """
+    deadline = current_deadline()
+    if deadline is None or deadline.allows(stage):
+        return True
+    title = (slide_data or {}).get('slide_title', '')
+    print(f"   ... Out of time: skipping {stage.replace('_', ' ')} for '{title}'")
+    deadline.record(stage, title)
+    DEGRADED_STAGES.inc(stage=stage)
+    if slide_data is not None:
+        slide_data.setdefault('degraded', []).append(stage)
+    return False
+
+
+def request_timeout(cap: Optional[float] = None) -> float:
+    """Timeout for one network call: the configured cap, shortened to fit the deadline."""
+    cap = cap or config.PPTConfig.DEADLINE['request_timeout']
+    deadline = current_deadline()
+    if deadline is None:
+        return cap
+    usable = deadline.remaining - config.PPTConfig.DEADLINE['render_reserve']
+    return max(1.0, min(cap, usable))
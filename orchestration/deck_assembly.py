@@ -0,0 +1,191 @@
+import io
+import math
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from copy import deepcopy
+from typing import List, Optional, Tuple
+from lxml import etree
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.package import Part
+from pptx.oxml.ns import qn
+import config
+from .deadline import Deadline, current_deadline
+from .memory_budget import DeckMemory
+from .package_optimizer import compress_media
+from .theme_engine import get_theme
+from .visual_engine import add_content_slide, new_deck
+
+# Attributes in this namespace hold relationship IDs (r:embed, r:link, r:id, ...)
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+def shard_count(num_slides: int) -> int:
+    """How many worker processes a deck of num_slides content slides is built with."""
+    settings = config.PPTConfig.ASSEMBLY
+    workers = settings['max_workers'] or os.cpu_count() or 1
+    return max(1, min(workers, num_slides // settings['slides_per_shard']))
+
+
+def should_shard(num_slides: int) -> bool:
+    return num_slides > config.PPTConfig.ASSEMBLY['shard_threshold'] and shard_count(num_slides) > 1
+
+
+def _split(slides: list, shards: int) -> List[list]:
+    """Contiguous, evenly sized runs of slides, in deck order."""
+    size = math.ceil(len(slides) / shards)
+    return [slides[start:start + size] for start in range(0, len(slides), size)]
+
+
+# Fields a worker resolves while drawing that the parent's slide data needs back
+_DRAWN_FIELDS = ('diagram_path', 'chart', 'degraded')
+
+
+def _worker_context():
+    """
+    Start workers with forkserver (spawn where it does not exist) rather than
+    fork: by now prefetch, GC, metrics and server threads are running, and a
+    forked child inherits any lock they happen to hold.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _config_snapshot() -> dict:
+    """The parent's settings, including any changed at runtime, for workers that import config afresh."""
+    return {name: value for name, value in vars(config.PPTConfig).items() if name.isupper()}
+
+
+def _init_worker(settings: dict):
+    for name, value in settings.items():
+        setattr(config.PPTConfig, name, value)
+
+
+def _build_shard(style: str, use_theme_template: bool, slides: list,
+                 deadline_at: Optional[float] = None) -> Tuple[bytes, List[dict]]:
+    """
+    Worker process: draw a run of content slides into a deck of their own,
+    under the parent's deadline if it has one.
+    Returns the saved deck and the fields drawing resolved for each slide.
+    """
+    buffer = io.BytesIO()
+    deadline = Deadline(expires_at=deadline_at) if deadline_at else nullcontext()
+    with deadline, DeckMemory() as memory:
+        prs, layouts, theme = new_deck(style, use_theme_template)
+        for slide_data in slides:
+            add_content_slide(prs, layouts, slide_data, theme)
+            memory.checkpoint(prs)
+
+        if config.PPTConfig.OUTPUT_BUDGET['enabled']:
+            # Size media to its placement here, in parallel; the budget itself is checked after merging
+            compress_media(prs, target_mb=float('inf'), verbose=False)
+        prs.save(buffer)
+    drawn = [{field: slide_data[field] for field in _DRAWN_FIELDS if slide_data.get(field)}
+             for slide_data in slides]
+    return buffer.getvalue(), drawn
+
+
+def _remap_rIds(element, rId_map: dict):
+    for node in element.iter():
+        for name, value in node.attrib.items():
+            if name.startswith(_REL_NS) and value in rId_map:
+                node.set(name, rId_map[value])
+
+
+def _copy_part(source_part, package, copied: dict):
+    """Copy a non-image part (e.g. a chart) and everything it relates to into package."""
+    if source_part in copied:
+        return copied[source_part]
+
+    template = re.sub(r'\d+(?=\.\w+$)', '%d', str(source_part.partname))
+    part = Part(package.next_partname(template), source_part.content_type, package, source_part.blob)
+    copied[source_part] = part
+
+    rId_map = {}
+    for rId, rel in source_part.rels.items():
+        if rel.is_external:
+            rId_map[rId] = part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        else:
+            rId_map[rId] = part.relate_to(_copy_part(rel.target_part, package, copied), rel.reltype)
+
+    if rId_map and source_part.content_type.endswith('xml'):
+        root = etree.fromstring(source_part.blob)
+        _remap_rIds(root, rId_map)
+        part._blob = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+    return part
+
+
+def merge_slides(prs, layouts: dict, source_prs):
+    """
+    Append every slide of source_prs to prs. Slides go on the layout of the same
+    name; images are shared with any identical image already in the package.
+    """
+    layouts_by_name = {layout.name: layout for layout in layouts.values()}
+    fallback_layout = next(iter(layouts.values()))
+    copied = {}
+
+    for source_slide in source_prs.slides:
+        layout = layouts_by_name.get(source_slide.slide_layout.name, fallback_layout)
+        slide = prs.slides.add_slide(layout)
+        source_part = source_slide.part
+
+        rId_map = {}
+        for rId, rel in source_part.rels.items():
+            if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+                continue
+            if rel.is_external:
+                rId_map[rId] = slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                _, rId_map[rId] = slide.part.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+            else:
+                target = _copy_part(rel.target_part, prs.part.package, copied)
+                rId_map[rId] = slide.part.relate_to(target, rel.reltype)
+
+        # Replace the new slide's content (background and shape tree) with the source's
+        cSld = deepcopy(source_slide._element.find(qn('p:cSld')))
+        _remap_rIds(cSld, rId_map)
+        slide._element.replace(slide._element.find(qn('p:cSld')), cSld)
+
+
+def add_slides_sharded(prs, layouts: dict, enriched_slides: list, style: str, use_theme_template: bool,
+                       memory: Optional[DeckMemory] = None):
+    """
+    Draw the content slides in worker processes and merge them into prs in order.
+    A shard that fails is drawn in this process instead.
+    """
+    shards = _split(enriched_slides, shard_count(len(enriched_slides)))
+    print(f"-> Building {len(enriched_slides)} content slides in {len(shards)} worker processes...")
+
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=_worker_context(),
+                             initializer=_init_worker, initargs=(_config_snapshot(),)) as pool:
+        deadline = current_deadline()
+        deadline_at = deadline.expires_at if deadline else None
+        futures = [pool.submit(_build_shard, style, use_theme_template, shard, deadline_at) for shard in shards]
+        # Merge in deck order while later shards are still being drawn
+        for shard_index, (shard, future) in enumerate(zip(shards, futures)):
+            try:
+                blob, drawn = future.result()
+            except Exception as e:
+                print(f"Warning: Shard {shard_index + 1} failed ({e}); drawing its slides here")
+                theme = dict(get_theme(style), templated=use_theme_template)
+                for slide_data in shard:
+                    add_content_slide(prs, layouts, slide_data, theme)
+                    if memory:
+                        memory.checkpoint(prs)
+                continue
+
+            merge_slides(prs, layouts, Presentation(io.BytesIO(blob)))
+            del blob
+            if memory:
+                memory.checkpoint(prs)
+            for slide_data, fields in zip(shard, drawn):
+                # Stages skipped while drawing are appended to those skipped during enrichment
+                already_degraded = len(slide_data.get('degraded', []))
+                slide_data.update(fields)
+                for stage in slide_data.get('degraded', [])[already_degraded:]:
+                    if deadline:
+                        deadline.record(stage, slide_data.get('slide_title', ''))
+            print(f"   ... Merged shard {shard_index + 1}/{len(shards)} ({len(shard)} slides)")
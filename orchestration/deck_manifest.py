@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+from .image_engine import get_image_metadata
+from .outline_cache import CONTENT_FIELDS
+
+MANIFEST_VERSION = 1
+
+# Fields produced by enrichment and rendering that the manifest keeps
+RESOLVED_FIELDS = ('layout', 'visual_keyword', 'image_path', 'supporting_images', 'diagram_path', 'degraded')
+
+
+def content_hash(slide_data: dict) -> str:
+    """Hash of the outline content of a slide, independent of anything resolved from it."""
+    content = {field: slide_data.get(field) for field in CONTENT_FIELDS}
+    return hashlib.md5(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def manifest_path_for(pptx_path: str) -> Path:
+    """The manifest lives next to the deck: deck.pptx -> deck.manifest.json"""
+    path = Path(pptx_path)
+    return path.with_name(f"{path.stem}.manifest.json")
+
+
+def _file_hash(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def build_manifest(topic: str, style: str, enriched_slides: list, output_path: str) -> dict:
+    """Describe a generated deck: per-slide content hashes and the assets resolved for them."""
+    slides = []
+    for index, slide_data in enumerate(enriched_slides):
+        entry = {field: slide_data.get(field) for field in CONTENT_FIELDS + RESOLVED_FIELDS}
+        layout = entry['layout']
+        if layout is not None:
+            entry['layout'] = str(layout.value if hasattr(layout, 'value') else layout)
+        entry['index'] = index
+        entry['content_hash'] = content_hash(slide_data)
+        entry['image_id'] = get_image_metadata(slide_data['image_path']).get('pexels_id') if slide_data.get('image_path') else None
+        entry['supporting_image_ids'] = [get_image_metadata(path).get('pexels_id')
+                                         for path in slide_data.get('supporting_images') or []]
+        entry['diagram_hash'] = _file_hash(slide_data.get('diagram_path'))
+        slides.append(entry)
+
+    return {
+        'version': MANIFEST_VERSION,
+        'topic': topic,
+        'style': style,
+        'output_path': str(output_path),
+        'slides': slides,
+    }
+
+
+def save_manifest(manifest: dict, path: Path) -> Path:
+    tmp_path = Path(f"{path}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_manifest(path: str) -> dict:
+    manifest = json.loads(Path(path).read_text())
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.get('version')} in {path}")
+    return manifest
+
+
+def is_reusable(entry: dict) -> bool:
+    """True if the slide was not degraded and every asset it points at is still on disk."""
+    if entry.get('degraded'):
+        return False
+    paths = [entry.get('image_path'), entry.get('diagram_path')] + list(entry.get('supporting_images') or [])
+    return all(os.path.exists(path) for path in paths if path)
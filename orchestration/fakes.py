@@ -0,0 +1,256 @@
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from unittest import mock
+import numpy as np
+import requests
+from PIL import Image
+import config
+from . import gemini_client, pexels_quota
+
+# Renditions the fake Pexels CDN serves, at the sizes Pexels uses
+RENDITIONS = {'original': (3840, 2160), 'large2x': (1880, 1058), 'small': (230, 130)}
+
+# Distinct pictures generated per rendition; downloads cycle through them
+_VARIANTS = 6
+
+_ASPECTS = ['Overview', 'Market Size', 'Key Drivers', 'Challenges', 'Case Study', 'Timeline',
+            'Comparison', 'Costs and Benefits', 'Adoption', 'Risks', 'Roadmap', 'Outlook']
+_VISUALS = ['team meeting', 'city skyline', 'data center', 'growth chart', 'laboratory',
+            'solar panels', 'factory floor', 'handshake', 'mountain road', 'classroom']
+_LAYOUTS = ['Photo Layout', 'Diagram Layout', 'Text Layout']
+
+# The dependency (LOAD_TEST['error_rate'] key) each kind of call belongs to
+_DEPENDENCY = {'gemini_outline': 'gemini', 'gemini_chat': 'gemini', 'gemini_vision': 'gemini',
+               'pexels_search': 'pexels', 'pexels_cdn': 'pexels_cdn'}
+
+
+class _Response:
+    """Just enough of requests.Response for image_engine."""
+
+    def __init__(self, url: str, status_code: int = 200, content: bytes = b'', payload=None, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self._payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} from fake {self.url}", response=self)
+
+
+class _Text:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeServices:
+    """
+    In-process stand-ins for Gemini and Pexels with realistic latency: every
+    call sleeps for a lognormal sample around the median in
+    LOAD_TEST['latency'], scaled by time_scale, and fails at
+    LOAD_TEST['error_rate']. A call that would outlast its timeout sleeps for
+    the timeout and raises, as a real one would.
+
+    Answers are shaped like the real ones (a JSON outline with statistics,
+    image keywords, search results with X-Ratelimit-* headers, JPEG bytes), so
+    everything between the two ends runs for real: breakers, quota, caches,
+    image scoring and rendering.
+    """
+
+    def __init__(self, time_scale: Optional[float] = None, seed: Optional[int] = None):
+        settings = config.PPTConfig.LOAD_TEST
+        self.time_scale = settings['time_scale'] if time_scale is None else time_scale
+        self.latency = settings['latency']
+        self.error_rate = settings['error_rate']
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images: Dict[Tuple[str, int], bytes] = {}
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    # --- Shared behaviour ---
+
+    def _sample(self, kind: str) -> float:
+        median, sigma = self.latency[kind]
+        with self._lock:
+            return self._random.lognormvariate(math.log(median), sigma) * self.time_scale
+
+    def _fails(self, kind: str) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate.get(_DEPENDENCY[kind], 0.0)
+
+    def _count(self, kind: str, failed: bool = False):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            if failed:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def _wait(self, kind: str, timeout: Optional[float], error):
+        """Sleep for one call of this kind; raise like a timed-out or failed call would."""
+        delay = self._sample(kind)
+        if timeout and delay > timeout:
+            time.sleep(timeout)
+            self._count(kind, failed=True)
+            raise error(f"fake {kind} timed out after {timeout:.0f}s")
+        time.sleep(delay)
+        if self._fails(kind):
+            self._count(kind, failed=True)
+            failure = requests.HTTPError if _DEPENDENCY[kind].startswith('pexels') else RuntimeError
+            raise failure(f"fake {kind} returned 503")
+        self._count(kind)
+
+    # --- Gemini ---
+
+    def _answer(self, prompt: str) -> str:
+        if 'presentation outline' in prompt:
+            topic = re.search(r"topic '(.*?)' with", prompt, re.S)
+            count = re.search(r"with (\d+) slides", prompt)
+            return self.outline(topic.group(1) if topic else 'the topic', int(count.group(1)) if count else 6)
+        with self._lock:
+            visual = self._random.choice(_VISUALS)
+            second = self._random.choice(_VISUALS)
+            layout = self._random.choice(_LAYOUTS)
+        if 'suggest 2-3 specific images' in prompt:
+            return json.dumps([{'keyword': visual, 'explanation': 'Sets the scene'},
+                               {'keyword': f"{second} closeup", 'explanation': 'Shows the detail'}])
+        if 'best layout type' in prompt:
+            return layout
+        if 'keyword for finding a relevant image' in prompt:
+            return visual
+        return 'yes'
+
+    def outline(self, topic: str, num_slides: int) -> str:
+        slides = []
+        with self._lock:
+            for i in range(num_slides):
+                growth, revenue = self._random.randint(5, 60), self._random.randint(2, 90)
+                slides.append({
+                    'slide_title': f"{topic}: {_ASPECTS[i % len(_ASPECTS)]}",
+                    'slide_body': (f"First, adoption of {topic.lower()} grew {growth}% last year. "
+                                   f"Spending reached ${revenue} billion in {2015 + i}. "
+                                   f"Next, teams compare options and measure results. "
+                                   f"Finally, the outlook depends on cost and skills."),
+                    'visual_focus': f"{self._random.choice(_VISUALS)} {topic.split()[0].lower()}",
+                    'supporting_visuals': [self._random.choice(_VISUALS)],
+                })
+        return '```json\n' + json.dumps(slides, indent=2) + '\n```'
+
+    def generative_model(self, *args, **kwargs) -> '_FakeModel':
+        return _FakeModel(self)
+
+    # --- Pexels ---
+
+    def _image(self, rendition: str, variant: int) -> bytes:
+        key = (rendition, variant)
+        with self._lock:
+            data = self._images.get(key)
+        if data is None:
+            width, height = RENDITIONS[rendition]
+            rng = np.random.default_rng(variant)
+            # Smooth colour fields compress like photographs, unlike pure noise
+            base = (rng.random((9, 16, 3)) * 255).astype('uint8')
+            img = Image.fromarray(base).resize((width, height), Image.Resampling.BICUBIC)
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG', quality=88)
+            data = buffer.getvalue()
+            with self._lock:
+                self._images[key] = data
+        return data
+
+    def get(self, url: str, params=None, headers=None, timeout=None, **kwargs) -> _Response:
+        if 'api.pexels.com' in url:
+            self._wait('pexels_search', timeout, requests.Timeout)
+            query, count = params['query'], params.get('per_page', 5)
+            photos = []
+            for i in range(count):
+                photo_id = abs(hash((query, i))) % 10 ** 7
+                base = f"https://images.pexels.fake/{photo_id}"
+                photos.append({'id': photo_id, 'width': 6000, 'height': 4000, 'alt': query,
+                               'url': base, 'photographer': 'Fake Photographer',
+                               'src': {name: f"{base}/{name}?v={photo_id % _VARIANTS}" for name in RENDITIONS}})
+            reset = int(time.time()) + 30 * 86400
+            return _Response(url, payload={'photos': photos},
+                             headers={'X-Ratelimit-Limit': '20000', 'X-Ratelimit-Remaining': '19000',
+                                      'X-Ratelimit-Reset': str(reset)})
+        self._wait('pexels_cdn', timeout, requests.Timeout)
+        rendition = next((name for name in RENDITIONS if f"/{name}?" in url), 'original')
+        variant = int(url.rsplit('v=', 1)[-1]) if 'v=' in url else 0
+        return _Response(url, content=self._image(rendition, variant))
+
+
+class _FakeModel:
+    """Stands in for genai.GenerativeModel."""
+
+    def __init__(self, services: FakeServices):
+        self.services = services
+
+    def generate_content(self, contents, stream: bool = False, request_options=None):
+        timeout = (request_options or {}).get('timeout')
+        if isinstance(contents, list):
+            self.services._wait('gemini_vision', timeout, TimeoutError)
+            return _Text('yes')
+        if stream:
+            return self._stream(contents, timeout)
+        kind = 'gemini_outline' if 'presentation outline' in contents else 'gemini_chat'
+        self.services._wait(kind, timeout, TimeoutError)
+        return _Text(self.services._answer(contents))
+
+    def _stream(self, prompt: str, timeout: Optional[float]) -> Iterator[_Text]:
+        """The answer in slide-sized chunks spread over the call's latency."""
+        text = self.services._answer(prompt)
+        chunks = re.split(r'(?<=\}),', text)
+        total = self.services._sample('gemini_outline')
+        if timeout and total > timeout:
+            time.sleep(timeout)
+            self.services._count('gemini_outline', failed=True)
+            raise TimeoutError(f"fake gemini_outline timed out after {timeout:.0f}s")
+        # The first token takes longest, then slides arrive at an even pace
+        time.sleep(total * 0.3)
+        if self.services._fails('gemini_outline'):
+            self.services._count('gemini_outline', failed=True)
+            raise RuntimeError("fake gemini_outline returned 503")
+        for i, chunk in enumerate(chunks):
+            time.sleep(total * 0.7 / len(chunks))
+            yield _Text(chunk + (',' if i < len(chunks) - 1 else ''))
+        self.services._count('gemini_outline')
+
+    def start_chat(self, history=None) -> '_FakeChat':
+        return _FakeChat(self)
+
+
+class _FakeChat:
+    def __init__(self, model: _FakeModel):
+        self.model = model
+
+    def send_message(self, message: str, request_options=None):
+        return self.model.generate_content(message, request_options=request_options)
+
+
+@contextmanager
+def offline_services(services: Optional[FakeServices] = None, pexels_keys: Optional[int] = None):
+    """
+    Route every Gemini and Pexels call in this process to the fakes while the
+    context is active, with a fresh Pexels key pool of pexels_keys fake keys.
+    Nothing leaves the machine. PEXELS_API_KEY is one of the fake keys, so
+    worker processes can still import config.
+    """
+    services = services or FakeServices()
+    count = pexels_keys or config.PPTConfig.LOAD_TEST['pexels_keys']
+    keys = ','.join(f"offline-key-{i}" for i in range(count))
+    with mock.patch.object(gemini_client.genai, 'GenerativeModel', services.generative_model), \
+            mock.patch.object(requests, 'get', services.get), \
+            mock.patch.dict(os.environ, {'PEXELS_API_KEYS': keys, 'PEXELS_API_KEY': 'offline-key-0'}), \
+            mock.patch.object(pexels_quota, '_quota', None):
+        yield services
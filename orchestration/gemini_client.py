@@ -1,35 +1,76 @@
 import google.generativeai as genai
 import os
+import time
+from typing import Iterator
 from dotenv import load_dotenv
+from .circuit_breaker import CircuitOpenError, get_breaker
+from .deadline import request_timeout
+from .metrics import external_call, record_external_call
 
 load_dotenv()
 
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
-def gemini_chat(prompt: str, system_prompt: str = None) -> str:
+def gemini_chat(prompt: str, system_prompt: str = None, timeout: float = None) -> str:
     """
     Send a chat message to Gemini and get the response.
+    The timeout (default DEADLINE['request_timeout']) is shortened to fit the deck's deadline.
+    Raises CircuitOpenError without calling Gemini while it is unhealthy.
     """
+    with external_call('gemini', 'chat'):
+        return get_breaker('gemini').call(_chat, prompt, system_prompt, timeout)
+
+def _chat(prompt: str, system_prompt: str = None, timeout: float = None) -> str:
     model = genai.GenerativeModel('models/gemini-2.5-flash-preview-05-20')
     
     if system_prompt:
         chat = model.start_chat(history=[])
-        response = chat.send_message(f"{system_prompt}\n\n{prompt}")
+        response = chat.send_message(f"{system_prompt}\n\n{prompt}",
+                                     request_options={'timeout': request_timeout(timeout)})
     else:
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, request_options={'timeout': request_timeout(timeout)})
     
     return response.text
 
+def gemini_chat_stream(prompt: str, system_prompt: str = None, timeout: float = None) -> Iterator[str]:
+    """
+    Send a message to Gemini and yield the response text as it is generated.
+    """
+    breaker = get_breaker('gemini')
+    if not breaker.allow():
+        record_external_call('gemini', 'chat_stream', 'rejected')
+        raise CircuitOpenError("gemini is unavailable (circuit open)")
+    model = genai.GenerativeModel('models/gemini-2.5-flash-preview-05-20')
+    if system_prompt:
+        prompt = f"{system_prompt}\n\n{prompt}"
+    started, ok = time.monotonic(), True
+    try:
+        for chunk in model.generate_content(prompt, stream=True, request_options={'timeout': request_timeout(timeout)}):
+            if chunk.text:
+                yield chunk.text
+    except GeneratorExit:
+        raise  # The caller stopped reading, which says nothing about Gemini
+    except Exception:
+        ok = False
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        breaker.record(ok, elapsed)
+        record_external_call('gemini', 'chat_stream', 'ok' if ok else 'error', elapsed)
+
 def gemini_vision(prompt: str, image_path: str) -> str:
     """
     Send an image and prompt to Gemini Vision and get the response.
     """
-    model = genai.GenerativeModel('models/gemini-1.0-pro-vision-latest')
+    model = genai.GenerativeModel('models/gemini-2.5-flash-preview-05-20')
     
     with open(image_path, 'rb') as f:
         image_data = f.read()
     
-    response = model.generate_content([prompt, image_data])
+    mime_type = 'image/png' if image_path.lower().endswith('.png') else 'image/jpeg'
+    with external_call('gemini', 'vision'):
+        response = get_breaker('gemini').call(model.generate_content, [prompt, {'mime_type': mime_type, 'data': image_data}],
+                                              request_options={'timeout': request_timeout()})
     return response.text
 
 def list_gemini_models():
@@ -7,125 +7,322 @@ from PIL import Image
 import io
 import os
 import json
+import tempfile
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from .circuit_breaker import CircuitOpenError, get_breaker
+from .deadline import request_timeout, stage_allowed
+from .pexels_quota import BACKGROUND, SUPPORTING, QuotaExceeded, get_pexels_quota, pexels_api_keys
 from .gemini_client import gemini_chat, gemini_vision
-from typing import Optional
+from .image_library import get_image_library
+from .workspace import scratch_dir, touch
+from .metrics import cache_lookup, external_call
+from .image_quality import analyze_text_legibility, load_preview, rank_candidates
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Downsampled size used for background legibility analysis (16:9)
+LEGIBILITY_SAMPLE_SIZE = (96, 54)
+
+def _image_cache_path(keyword: str, is_background: bool) -> Path:
+    """Cache location of the optimized image for a keyword."""
+    key = f"{keyword.strip().lower()}|{'background' if is_background else 'supporting'}"
+    return config.PPTConfig.PATHS['images'] / f"{hashlib.md5(key.encode()).hexdigest()}.jpg"
+
+def _write_image_metadata(image_path: str, metadata: dict):
+    """Store metadata (Pexels ID, keyword, ...) in a JSON sidecar next to a cached image."""
+    sidecar = Path(image_path).with_suffix('.json')
+    existing = get_image_metadata(image_path)
+    existing.update(metadata)
+    tmp_path = sidecar.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(existing, indent=2))
+    os.replace(tmp_path, sidecar)
+
+def get_image_metadata(image_path: str) -> dict:
+    """Read the JSON sidecar of a cached image; empty if there is none."""
+    sidecar = Path(image_path).with_suffix('.json')
+    try:
+        return json.loads(sidecar.read_text())
+    except (OSError, ValueError):
+        return {}
+
+# One lock per cache entry, so concurrent requests for the same image (e.g. a
+# prefetch and the slide that needs it) download it once
+_download_locks = {}
+_download_locks_guard = threading.Lock()
+
+def _download_lock(cache_path: Path) -> threading.Lock:
+    with _download_locks_guard:
+        return _download_locks.setdefault(str(cache_path), threading.Lock())
 
 def search_and_download_photo(keyword: str, is_background: bool = False) -> str:
     """
     Search for and download a photo using Pexels API.
+    Optimized results are cached by keyword, so repeated searches are free.
     """
-    pexels_api_key = os.getenv('PEXELS_API_KEY')
-    if not pexels_api_key:
+    cache_path = _image_cache_path(keyword, is_background)
+    with _download_lock(cache_path):
+        if cache_path.exists():
+            print(f"   ... Image for '{keyword}' found in cache.")
+            cache_lookup('images', True)
+            touch(str(cache_path))
+            return str(cache_path)
+        cache_lookup('images', False)
+        if not config.PPTConfig.IMAGE_LIBRARY['enabled']:
+            return _search_and_download(keyword, is_background, cache_path)
+
+        # A good local match saves the Pexels round trip and quota
+        settings = config.PPTConfig.IMAGE_LIBRARY
+        library = get_image_library()
+        local_path = _from_library(library, keyword, is_background, cache_path, settings['min_score'])
+        cache_lookup('image_library', bool(local_path))
+        if local_path:
+            return local_path
+        image_path = _search_and_download(keyword, is_background, cache_path)
+        if image_path == str(cache_path):
+            library.add(image_path)
+            return image_path
+        return image_path or _from_library(library, keyword, is_background, cache_path,
+                                           settings['fallback_min_score'])
+
+def _from_library(library, keyword: str, is_background: bool, cache_path: Path,
+                  min_score: float) -> Optional[str]:
+    """The best local image for a keyword, prepared for its use in the cache, or None."""
+    match = library.query(keyword, is_background, min_score=min_score)
+    if not match:
+        return None
+    library_path, score = match
+    print(f"   ... Using local image for '{keyword}' (match {score:.2f}): {Path(library_path).name}")
+    metadata = get_image_metadata(library_path)
+    if not os.path.exists(library_path):
+        return None
+    # Cached downloads made for the same use are ready as they are
+    if Path(library_path).parent == cache_path.parent and metadata.get('is_background') == is_background:
+        touch(library_path)
+        return library_path
+
+    optimized_path = optimize_image_for_ppt(library_path, is_background, output_path=str(cache_path))
+    if optimized_path != str(cache_path):
+        return None
+    metadata.pop('legibility', None)
+    metadata.update({'keyword': keyword, 'is_background': is_background,
+                     'source': metadata.get('source') or 'library', 'library_path': library_path})
+    _write_image_metadata(optimized_path, metadata)
+    library.add(optimized_path)
+    return optimized_path
+
+def _http_get(url: str, dependency: str, **kwargs) -> requests.Response:
+    """GET through the dependency's circuit breaker; HTTP error statuses raise."""
+    def get():
+        response = requests.get(url, **kwargs)
+        response.raise_for_status()
+        return response
+    return get_breaker(dependency).call(get)
+
+def _pexels_search(is_background: bool, params: dict) -> dict:
+    """Run one search on a key chosen by the quota scheduler, recording the quota Pexels reports."""
+    quota = get_pexels_quota()
+    kind = BACKGROUND if is_background else SUPPORTING
+    with external_call('pexels', 'search'):
+        pexels_api_key = quota.acquire(kind)
+        headers = {"Authorization": pexels_api_key}
+        try:
+            response = _http_get("https://api.pexels.com/v1/search", 'pexels', params=params, headers=headers,
+                                 timeout=request_timeout())
+        except CircuitOpenError:
+            # Never sent, so it costs no quota
+            quota.release(pexels_api_key, kind)
+            raise
+        except requests.HTTPError as e:
+            if getattr(e.response, 'status_code', None) == 429:
+                quota.exhausted(pexels_api_key, e.response.headers)
+            raise
+    quota.update(pexels_api_key, response.headers)
+    return response.json()
+
+def _search_and_download(keyword: str, is_background: bool, cache_path: Path) -> Optional[str]:
+    if not pexels_api_keys():
         print("WARNING: Pexels API key not found. Using placeholder image.")
         return None
 
     try:
         # Search for the image with enhanced parameters
-        search_url = f"https://api.pexels.com/v1/search"
+        scoring = config.PPTConfig.IMAGE_SCORING
         params = {
             "query": keyword,
-            "per_page": 3,  # Get multiple candidates
+            # Candidates to score; supporting images only look at the top few
+            "per_page": scoring['candidates'] if is_background else scoring['supporting_candidates'],
             "orientation": "landscape" if is_background else "any",
             "size": "large",
             "color": "vibrant" if is_background else "any"  # Prefer vibrant colors for backgrounds
         }
-        headers = {"Authorization": pexels_api_key}
-        
-        response = requests.get(search_url, params=params, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = _pexels_search(is_background, params)
         if not data["photos"]:
             print(f"No images found for keyword: {keyword}")
             return None
             
-        # Get the best image URL (first one)
-        image_url = data["photos"][0]["src"]["original"]
+        # Score every candidate locally and take the best one
+        photo, quality_score = _select_best_photo(data["photos"], is_background, keyword)
+        # Supporting images are shown at most 1000px wide; skip the multi-megabyte original
+        image_url = photo["src"]["original"] if is_background else photo["src"].get("large2x", photo["src"]["original"])
         
         # Download the image
-        image_response = requests.get(image_url)
-        image_response.raise_for_status()
+        with external_call('pexels_cdn', 'download'):
+            image_response = _http_get(image_url, 'pexels_cdn', timeout=request_timeout())
         
         # Process the image
         img = Image.open(io.BytesIO(image_response.content))
         
-        # Save the original image
-        output_dir = "output/images"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{keyword.replace(' ', '_')}.jpg")
+        # Save the original image in this run's scratch space
+        output_path = str(scratch_dir('images') / cache_path.name)
         img.save(output_path, "JPEG", quality=95)
         
-        # Optimize the image for PowerPoint
-        optimized_path = optimize_image_for_ppt(output_path, is_background)
+        # Optimize the image for PowerPoint straight into the cache
+        optimized_path = optimize_image_for_ppt(output_path, is_background, output_path=str(cache_path))
+        if optimized_path == str(cache_path):
+            _write_image_metadata(optimized_path, {
+                'keyword': keyword,
+                'is_background': is_background,
+                'pexels_id': photo.get('id'),
+                'source_url': photo.get('url'),
+                'photographer': photo.get('photographer'),
+                'quality_score': quality_score,
+            })
         
         return optimized_path
+    except (CircuitOpenError, QuotaExceeded) as e:
+        # Pexels is down or out of quota: no photo, the slide falls back to the theme background
+        print(f"   ... Skipping photo for '{keyword}': {e}")
+        return None
     except Exception as e:
         print(f"Error downloading photo: {e}")
         return None
 
-def render_diagram_local(dot_code: str, slide_title: str) -> Optional[str]:
+def _fetch_preview(photo: dict) -> Optional[bytes]:
+    """Download the small rendition Pexels serves for a search result."""
+    src = photo.get("src", {})
+    url = src.get("small") or src.get("medium") or src.get("tiny")
+    if not url:
+        return None
+    try:
+        with external_call('pexels_cdn', 'preview'):
+            return _http_get(url, 'pexels_cdn', timeout=request_timeout(10)).content
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        print(f"Error downloading preview: {e}")
+        return None
+
+def _select_best_photo(photos: List[dict], is_background: bool, keyword: str = '') -> Tuple[dict, Optional[float]]:
+    """
+    Rank search results by local quality score and return the best one.
+    Gemini Vision is only consulted when the top two are too close to call.
+    Short on time, the first result is taken without downloading any previews.
+    """
+    if len(photos) == 1 or not stage_allowed('image_scoring', {'slide_title': keyword}):
+        return photos[0], None
+
+    # Each download runs in a copy of this context, under the deck's deadline and profile
+    with ThreadPoolExecutor(max_workers=len(photos)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _fetch_preview, photo) for photo in photos]
+        preview_bytes = [future.result() for future in futures]
+    previews = [load_preview(data) if data else None for data in preview_bytes]
+    dimensions = [(photo.get("width", 0), photo.get("height", 0)) for photo in photos]
+
+    ranked = rank_candidates(previews, dimensions, is_background)
+    if not ranked:
+        return photos[0], None
+
+    settings = config.PPTConfig.IMAGE_SCORING
+    (best, best_score), runner_up = ranked[0], ranked[1] if len(ranked) > 1 else None
+    if (settings['vision_tiebreak'] and runner_up
+            and best_score - runner_up[1] < settings['close_call_margin']):
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+            tmp.write(preview_bytes[best])
+        try:
+            if not analyze_image_quality(tmp.name):
+                print("   ... Vision check rejected the top candidate; using the runner-up.")
+                best, best_score = runner_up
+        finally:
+            os.unlink(tmp.name)
+
+    return photos[best], round(best_score, 4)
+
+# Default styling, placed before the diagram's own statements so the DOT source can override it
+DOT_DEFAULTS = (
+    'graph [rankdir="TB", splines="ortho", nodesep="0.8", ranksep="1.0", pad="0.2", margin="0"];\n'
+    'node [shape="box", style="rounded,filled", margin="0.3,0.1", fontname="Arial", '
+    'fontsize="12", height="0.4", width="0.8"];\n'
+    'edge [fontname="Arial", fontsize="10", penwidth="1.5"];\n'
+)
+
+def _sized_dot_source(dot_code: str, size_in: Tuple[float, float], dpi: int) -> str:
+    """
+    Add the default styling and the output size to a DOT graph. graphviz.Source
+    has no attr() API, so the defaults go straight after the opening brace and
+    the sizing just before the closing one, where it wins over the graph's own.
+    size="W,H!" scales the layout up or down to fill the placement box.
+    Raises ValueError if the source has no '{'.
+    """
+    brace = dot_code.index('{') + 1
+    body = dot_code[brace:].rstrip()
+    if body.endswith('}'):
+        body = body[:-1]
+    sizing = f'graph [size="{size_in[0]},{size_in[1]}!", dpi="{dpi}"];\n'
+    return dot_code[:brace] + '\n' + DOT_DEFAULTS + body + '\n' + sizing + '}'
+
+def render_diagram_local(dot_code: str, slide_title: str, size_in: Optional[Tuple[float, float]] = None,
+                         dpi: Optional[int] = None) -> Optional[str]:
+    """
+    Render a Graphviz diagram once, at the size and resolution it will be placed at.
+    PowerPoint cannot embed SVG through python-pptx and Graphviz has no EMF output,
+    so this is a single PNG render with no post-processing.
+    """
     print(f"-> Rendering diagram locally for '{slide_title}'...")
-    filename = "diagram_" + hashlib.md5(slide_title.encode()).hexdigest() + ".png"
-    cache_path = config.PPTConfig.PATHS['cache'] / filename
-    
+    settings = config.PPTConfig.DIAGRAMS
+    size_in = size_in or settings['size']
+    dpi = dpi or settings['dpi']
+    try:
+        source = _sized_dot_source(dot_code, size_in, dpi)
+    except ValueError:
+        print("   ... Failed to render diagram locally: the DOT source has no graph body")
+        return None
+
+    diagrams_dir = config.PPTConfig.PATHS['diagrams']
+    os.makedirs(diagrams_dir, exist_ok=True)
+    cache_path = diagrams_dir / f"dot_{hashlib.md5(source.encode()).hexdigest()}.png"
     if cache_path.exists():
         print("   ... Diagram found in cache.")
         return str(cache_path)
-        
+
     try:
-        # Configure graphviz for high quality
-        graph = graphviz.Source(dot_code, format='png', engine='dot')
-        graph.attr(dpi='300')  # High DPI for better quality
-        
-        # Set graph attributes for better rendering
-        graph.attr('graph', 
-                  rankdir='TB',
-                  splines='ortho',
-                  nodesep='0.8',
-                  ranksep='1.0',
-                  pad='0.5',
-                  margin='0.2')
-                  
-        graph.attr('node',
-                  shape='box',
-                  style='rounded,filled',
-                  margin='0.3,0.1',
-                  fontname='Arial',
-                  fontsize='12',
-                  height='0.4',
-                  width='0.8')
-                  
-        graph.attr('edge',
-                  fontname='Arial',
-                  fontsize='10',
-                  penwidth='1.5')
-        
-        output_path = str(cache_path).replace('.png', '')
-        rendered_path = graph.render(outfile=output_path, cleanup=True, view=False)
-        
-        # Post-process the image for better quality
-        if rendered_path:
-            img = Image.open(rendered_path)
-            # Convert to RGBA if needed
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-                
-            # Enhance diagram quality
-            img = img.resize((int(img.width * 1.5), int(img.height * 1.5)), Image.Resampling.LANCZOS)
-            
-            # Save with high quality
-            img.save(rendered_path, 'PNG', optimize=True)
-            
-        return rendered_path
-        
+        png_bytes = graphviz.Source(source, format='png', engine='dot').pipe()
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(png_bytes)
+        os.replace(tmp_path, cache_path)
+        return str(cache_path)
+
     except Exception as e:
         print(f"   ... Failed to render diagram locally: {e}")
         return None
 
-def get_supporting_images(slide_data: dict) -> list:
+def get_supporting_images(slide_data: dict, keywords: Optional[List[str]] = None) -> list:
     """
     Generate and download supporting images for a slide using Gemini.
+    Keywords already planned for the slide skip the Gemini call.
     """
+    if keywords is None:
+        keywords = suggest_supporting_keywords(slide_data)
+    supporting_images = []
+    for keyword in keywords:
+        image_path = search_and_download_photo(keyword)
+        if image_path:
+            supporting_images.append(image_path)
+    return supporting_images
+
+def suggest_supporting_keywords(slide_data: dict) -> List[str]:
+    """Search keywords for 2-3 supporting images, from Gemini or else the outline."""
     prompt = f"""Based on this slide content, suggest 2-3 specific images that would enhance the presentation:
     Title: {slide_data.get('slide_title', '')}
     Content: {slide_data.get('slide_body', '')}
@@ -154,17 +351,12 @@ def get_supporting_images(slide_data: dict) -> list:
             response = response[:-3]
         
         image_suggestions = json.loads(response.strip())
-        
-        supporting_images = []
-        for suggestion in image_suggestions:
-            image_path = search_and_download_photo(suggestion["keyword"])
-            if image_path:
-                supporting_images.append(image_path)
-        
-        return supporting_images
+        keywords = [suggestion["keyword"] for suggestion in image_suggestions]
     except Exception as e:
-        print(f"Error generating supporting images: {e}")
-        return []
+        # Gemini is down or answered badly: the outline already names some visuals
+        print(f"Error generating supporting image keywords, using the outline's: {e}")
+        keywords = [visual for visual in slide_data.get('supporting_visuals') or [] if isinstance(visual, str)][:3]
+    return keywords
 
 def analyze_image_quality(image_path: str) -> bool:
     """
@@ -186,9 +378,10 @@ def analyze_image_quality(image_path: str) -> bool:
         print(f"Error analyzing image quality: {e}")
         return True  # Default to accepting the image if analysis fails
 
-def optimize_image_for_ppt(image_path: str, is_background: bool = False) -> str:
+def optimize_image_for_ppt(image_path: str, is_background: bool = False, output_path: Optional[str] = None) -> str:
     """
     Optimize image dimensions and quality for PowerPoint presentation.
+    Writes to output_path if given, otherwise next to the other optimized images.
     Returns the path to the optimized image.
     """
     try:
@@ -217,17 +410,38 @@ def optimize_image_for_ppt(image_path: str, is_background: bool = False) -> str:
         img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
         
         # Enhance image quality
+        legibility = None
         if is_background:
             # Increase contrast slightly for better visibility
             from PIL import ImageEnhance
             enhancer = ImageEnhance.Contrast(img)
             img = enhancer.enhance(1.1)
+            
+            # Analyse text legibility on a tiny copy of the pixels we already hold,
+            # centre-cropped to the slide the way the background fill crops it
+            crop_w = min(img.width, img.height * 16 / 9)
+            crop_h = crop_w * 9 / 16
+            box = ((img.width - crop_w) / 2, (img.height - crop_h) / 2,
+                   (img.width + crop_w) / 2, (img.height + crop_h) / 2)
+            small = img.convert('RGB').resize(LEGIBILITY_SAMPLE_SIZE, Image.Resampling.BOX, box=box)
+            legibility = analyze_text_legibility(np.asarray(small))
         
         # Save optimized image
-        output_dir = "output/images/optimized"
-        os.makedirs(output_dir, exist_ok=True)
-        optimized_path = os.path.join(output_dir, f"opt_{os.path.basename(image_path)}")
-        img.save(optimized_path, "JPEG", quality=95, optimize=True)
+        if output_path:
+            optimized_path = output_path
+            os.makedirs(os.path.dirname(optimized_path), exist_ok=True)
+        else:
+            optimized_path = str(scratch_dir('optimized') / f"opt_{os.path.basename(image_path)}")
+        
+        # Write to a temporary name first so concurrent readers never see a partial file
+        tmp_path = f"{optimized_path}.{os.getpid()}.tmp"
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.save(tmp_path, "JPEG", quality=95, optimize=True)
+        os.replace(tmp_path, optimized_path)
+        
+        if legibility:
+            _write_image_metadata(optimized_path, {'legibility': legibility})
         
         return optimized_path
     except Exception as e:
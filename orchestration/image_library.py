@@ -0,0 +1,363 @@
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+import config
+from .outline_cache import normalize_topic
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# Hashes this close (in bits, of 64) are treated as the same picture
+DUPLICATE_DISTANCE = 4
+
+
+def keyword_tokens(text: str) -> List[str]:
+    """Normalized words of a keyword or tag, singularized so 'offices' finds 'office'."""
+    tokens = []
+    for word in normalize_topic(text):
+        if len(word) > 3 and word.endswith('ies'):
+            word = word[:-3] + 'y'
+        elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def dhash(img: Image.Image) -> str:
+    """64-bit difference hash of an image, as 16 hex digits."""
+    small = np.asarray(img.convert('L').resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+
+def hash_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def _hash_blocks(value: str) -> List[Tuple[int, int]]:
+    """
+    The hash cut into DUPLICATE_DISTANCE + 1 bit ranges. Two hashes within
+    DUPLICATE_DISTANCE bits share at least one range exactly, so only images
+    sharing a range need comparing.
+    """
+    bits = int(value, 16)
+    count = DUPLICATE_DISTANCE + 1
+    width = math.ceil(64 / count)
+    return [(i, (bits >> (i * width)) & ((1 << width) - 1)) for i in range(count)]
+
+
+def dominant_color(img: Image.Image) -> str:
+    """Most common colour of a 64-colour quantization, as #rrggbb."""
+    small = np.asarray(img.convert('RGB').resize((32, 18), Image.Resampling.BOX)) // 64
+    bins = Counter(map(tuple, small.reshape(-1, 3)))
+    r, g, b = (channel * 64 + 32 for channel in bins.most_common(1)[0][0])
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _sidecar(image_path: Path) -> dict:
+    try:
+        return json.loads(image_path.with_suffix('.json').read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _signature(image_path: Path) -> Tuple[float, int]:
+    """(mtime, size) that changes when the image or its sidecar does."""
+    stat = image_path.stat()
+    try:
+        sidecar_mtime = image_path.with_suffix('.json').stat().st_mtime
+    except OSError:
+        sidecar_mtime = 0.0
+    return max(stat.st_mtime, sidecar_mtime), stat.st_size
+
+
+def _describe(image_path: Path) -> Optional[dict]:
+    """Index entry for one image: keywords from its sidecar (or file name), size, colour and hash."""
+    metadata = _sidecar(image_path)
+    mtime, size = _signature(image_path)
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            img.draft('RGB', (256, 256))  # Hash and colour only need a thumbnail
+            entry_hash, color = dhash(img), dominant_color(img)
+    except Exception as e:
+        print(f"   ... Skipping unreadable library image {image_path.name}: {e}")
+        return None
+
+    keywords = metadata.get('keywords') or ([metadata['keyword']] if metadata.get('keyword') else [])
+    if not keywords:
+        # Stock images without a sidecar are described by their file name
+        keywords = [re.sub(r'[_\-]+', ' ', image_path.stem)]
+    return {
+        'path': str(image_path),
+        'mtime': mtime,
+        'size': size,
+        'keywords': keywords,
+        'tags': metadata.get('tags', []),
+        'width': width,
+        'height': height,
+        'color': color,
+        'dhash': entry_hash,
+        # Images downloaded for one use are already sized for it
+        'is_background': metadata.get('is_background'),
+        'source': metadata.get('source') or ('pexels' if metadata.get('pexels_id') else 'library'),
+        'license': metadata.get('license'),
+    }
+
+
+def _stored(entry: dict) -> dict:
+    """An entry as written to disk; the tokens are derived again on load."""
+    return {key: value for key, value in entry.items() if key != 'tokens'}
+
+
+class ImageLibrary:
+    """
+    Local images indexed for keyword search: licensed stock under
+    IMAGE_LIBRARY['dirs'] plus every photo already downloaded into the image cache.
+
+    The index (keywords and tags, dimensions, dominant colour and a perceptual
+    hash per image) is kept on disk and rebuilt incrementally: only new or
+    changed files are opened. Queries run against an in-memory inverted index
+    and take well under a millisecond. Near-duplicate pictures (dHash within
+    DUPLICATE_DISTANCE bits, e.g. one photo saved both as a background and as a
+    supporting image) are linked by 'duplicate_of' and reported on refresh.
+
+    Image sidecars (<image>.json) may set 'keywords' or 'keyword', 'tags',
+    'license' and 'source'.
+
+    Images added one at a time (fresh downloads) are appended to a journal next
+    to the index instead of rewriting it; refresh() folds the journal into the
+    index. Both are re-read before the index is written, so entries other
+    processes added are kept. An entry lost to a race is only described again.
+    """
+
+    def __init__(self, dirs: Optional[Iterable[Path]] = None, index_path: Optional[Path] = None):
+        settings = config.PPTConfig.IMAGE_LIBRARY
+        if dirs is None:
+            dirs = list(settings['dirs'])
+            if settings['include_cache']:
+                dirs.append(config.PPTConfig.PATHS['images'])
+        self.dirs = [Path(directory) for directory in dirs]
+        self.index_path = Path(index_path or settings['index_path'])
+        self.journal_path = self.index_path.with_suffix('.journal')
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        self._postings: Dict[str, set] = defaultdict(set)
+        self._hash_buckets: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+        self._loaded = False
+
+    def _files(self) -> Iterable[Path]:
+        for directory in self.dirs:
+            if directory.is_dir():
+                for path in directory.rglob('*'):
+                    if path.suffix.lower() in IMAGE_SUFFIXES and '.tmp' not in path.name:
+                        yield path
+
+    def _read_disk(self) -> Dict[str, dict]:
+        """Entries of the saved index, updated by the journal."""
+        try:
+            entries = json.loads(self.index_path.read_text()).get('entries', [])
+        except (OSError, ValueError):
+            entries = []
+        try:
+            lines = self.journal_path.read_text().splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # A line still being written
+        return {entry['path']: entry for entry in entries if isinstance(entry, dict) and 'path' in entry}
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._entries = self._read_disk()
+        self._loaded = True
+        self._reindex()
+
+    def _reindex(self):
+        self._postings = defaultdict(set)
+        self._hash_buckets = defaultdict(list)
+        for path in sorted(self._entries):
+            self._index_entry(path)
+
+    def _index_entry(self, path: str):
+        entry = self._entries[path]
+        entry['tokens'] = sorted({token for text in entry['keywords'] + entry['tags']
+                                  for token in keyword_tokens(text)})
+        for token in entry['tokens']:
+            self._postings[token].add(path)
+        # Link near-duplicates to the first picture of their group
+        blocks = _hash_blocks(entry['dhash'])
+        duplicate_of = next((kept for block in blocks for kept in self._hash_buckets[block]
+                             if hash_distance(self._entries[kept]['dhash'], entry['dhash']) <= DUPLICATE_DISTANCE), None)
+        if duplicate_of is None:
+            entry.pop('duplicate_of', None)
+            for block in blocks:
+                self._hash_buckets[block].append(path)
+        else:
+            entry['duplicate_of'] = duplicate_of
+
+    def _save(self):
+        """Write the whole index and start a new journal."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        entries = [_stored(entry) for entry in self._entries.values()]
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({'entries': entries}))
+        os.replace(tmp_path, self.index_path)
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _append_journal(self, entry: dict):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        # One short append per entry, so lines from several processes do not interleave
+        with open(self.journal_path, 'a') as f:
+            f.write(json.dumps(_stored(entry)) + '\n')
+
+    def refresh(self, verbose: bool = True) -> Tuple[int, int]:
+        """Index new and changed images, drop missing ones. Returns (added_or_updated, removed)."""
+        with self._lock:
+            self._load()
+            # Pick up what other processes indexed since, rather than describing it again
+            journaled = self.journal_path.exists()
+            self._entries.update(self._read_disk())
+            seen, updated = set(), 0
+            for path in self._files():
+                key = str(path)
+                seen.add(key)
+                entry = self._entries.get(key)
+                if entry and (entry['mtime'], entry['size']) == _signature(path):
+                    continue
+                entry = _describe(path)
+                if entry:
+                    self._entries[key] = entry
+                    updated += 1
+            removed = [key for key in self._entries if key not in seen]
+            for key in removed:
+                del self._entries[key]
+            if updated or removed or journaled:
+                self._reindex()
+                self._save()
+            if verbose:
+                duplicates = sum(1 for entry in self._entries.values() if entry.get('duplicate_of'))
+                print(f"-> Image library: {len(self._entries)} images indexed "
+                      f"({updated} new or changed, {len(removed)} removed, {duplicates} near-duplicates)")
+            return updated, len(removed)
+
+    def add(self, image_path: str):
+        """Index one image right away, e.g. a photo just downloaded into the cache."""
+        path = Path(image_path)
+        # Opened outside the lock, so queries are not held up
+        try:
+            entry = _describe(path)
+        except OSError:
+            return
+        if not entry:
+            return
+        with self._lock:
+            self._load()
+            replaced = str(path) in self._entries
+            self._entries[str(path)] = entry
+            if replaced:
+                self._reindex()
+            else:
+                self._index_entry(str(path))
+            try:
+                self._append_journal(entry)
+            except OSError as e:
+                print(f"Warning: Could not record {path.name} in the image library journal: {e}")
+
+    def query(self, keyword: str, is_background: bool = False,
+              min_score: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        The best local image for a keyword as (path, score), or None if nothing
+        scores at least min_score. The score is the IDF-weighted share of the
+        keyword's words the image's keywords and tags cover.
+        """
+        settings = config.PPTConfig.IMAGE_LIBRARY
+        min_score = settings['min_score'] if min_score is None else min_score
+        tokens = keyword_tokens(keyword)
+        if not tokens:
+            return None
+        with self._lock:
+            self._load()
+            total = len(self._entries) + 1
+            idf = {token: math.log(total / (1 + len(self._postings.get(token, ())))) + 1 for token in tokens}
+            wanted = sum(idf.values())
+
+            min_w, min_h = settings['min_size']['background' if is_background else 'supporting']
+            candidates = set().union(*(self._postings.get(token, set()) for token in tokens))
+            best = None
+            for path in candidates:
+                entry = self._entries[path]
+                if entry['width'] < min_w or entry['height'] < min_h:
+                    continue
+                if is_background and entry['width'] < entry['height']:
+                    continue
+                matched = set(entry['tokens']).intersection(tokens)
+                score = sum(idf[token] for token in matched) / wanted
+                # Prefer pictures made for the same use, then the larger one
+                rank = (score, entry.get('is_background') == is_background, entry['width'] * entry['height'])
+                if best is None or rank > best[0]:
+                    best = (rank, path)
+        if best is None or best[0][0] < min_score:
+            return None
+        return best[1], round(best[0][0], 3)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+
+_library: Optional[ImageLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_image_library() -> ImageLibrary:
+    """The process-wide library; indexed (incrementally) on first use."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            started = time.monotonic()
+            _library = ImageLibrary()
+            _library.refresh(verbose=False)
+            print(f"-> Image library ready: {len(_library)} images ({time.monotonic() - started:.1f}s)")
+        return _library
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the local image library index')
+    parser.add_argument('keywords', nargs='*', help='Keywords to look up instead of only refreshing the index')
+    parser.add_argument('--background', action='store_true', help='Look up a slide background')
+    parser.add_argument('--rebuild', action='store_true', help='Re-read every image instead of only new or changed ones')
+    args = parser.parse_args()
+
+    library = ImageLibrary()
+    if args.rebuild:
+        for path in (library.index_path, library.journal_path):
+            if path.exists():
+                path.unlink()
+    library.refresh()
+    for keyword in args.keywords:
+        started = time.perf_counter()
+        match = library.query(keyword, is_background=args.background)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"   {keyword!r}: {match[0] + f' (score {match[1]:.2f})' if match else 'no local match'} "
+              f"[{elapsed_ms:.2f} ms]")
+
+
+if __name__ == '__main__':
+    main()
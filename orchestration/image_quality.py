@@ -0,0 +1,172 @@
+import io
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from PIL import Image
+import config
+
+# All candidates are scored on previews of the same size so they stack into one array
+PREVIEW_SIZE = (160, 90)  # Width, Height
+
+# Rec. 709 luma weights
+_LUMA = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+
+def load_preview(image_bytes: bytes) -> Optional[np.ndarray]:
+    """Decode image bytes into a float32 RGB array of PREVIEW_SIZE, values in [0, 1]."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft('RGB', PREVIEW_SIZE)  # Let the JPEG decoder downscale for us
+            preview = img.convert('RGB').resize(PREVIEW_SIZE, Image.Resampling.BILINEAR)
+        return np.asarray(preview, dtype=np.float32) / 255.0
+    except Exception as e:
+        print(f"Error decoding image preview: {e}")
+        return None
+
+
+def score_images(previews: np.ndarray, dimensions: Sequence[Tuple[int, int]],
+                 is_background: bool) -> Tuple[np.ndarray, dict]:
+    """
+    Score a batch of candidate images for slide use.
+
+    Args:
+        previews: (N, H, W, 3) float array of PREVIEW_SIZE previews in [0, 1].
+        dimensions: Full-resolution (width, height) of each candidate.
+        is_background: Backgrounds are judged against the 16:9 slide and
+                       PPTConfig.IMAGE_STANDARDS; supporting images against a 4:3 box.
+
+    Returns:
+        (scores, components): an (N,) array in [0, 1] and the per-criterion arrays.
+    """
+    settings = config.PPTConfig.IMAGE_SCORING
+    dims = np.asarray(dimensions, dtype=np.float32).reshape(-1, 2)
+
+    # Resolution against what the slide needs
+    if is_background:
+        min_w, min_h = config.PPTConfig.IMAGE_STANDARDS['min_resolution']
+        target_ratio = np.float32(16 / 9)
+    else:
+        min_w, min_h = settings['supporting_min_resolution']
+        target_ratio = np.float32(4 / 3)
+    resolution = np.minimum(1.0, np.minimum(dims[:, 0] / min_w, dims[:, 1] / min_h))
+
+    # Aspect fit: 1.0 at the target ratio, falling off with log-distance
+    ratio = dims[:, 0] / np.maximum(dims[:, 1], 1.0)
+    aspect = np.exp(-2.0 * np.abs(np.log(ratio / target_ratio)))
+
+    luma = previews @ _LUMA  # (N, H, W)
+
+    # Sharpness: variance of a 4-neighbour Laplacian
+    laplacian = (4 * luma[:, 1:-1, 1:-1] - luma[:, :-2, 1:-1] - luma[:, 2:, 1:-1]
+                 - luma[:, 1:-1, :-2] - luma[:, 1:-1, 2:])
+    lap_var = laplacian.var(axis=(1, 2))
+    sharpness = lap_var / (lap_var + settings['sharpness_knee'])
+
+    # Exposure: mean brightness near mid-grey, penalising clipped shadows/highlights
+    mean_luma = luma.mean(axis=(1, 2))
+    clipped = ((luma < 0.02) | (luma > 0.98)).mean(axis=(1, 2))
+    exposure = np.clip(1.0 - 2.0 * np.abs(mean_luma - 0.5) - clipped, 0.0, 1.0)
+
+    contrast = np.minimum(1.0, luma.std(axis=(1, 2)) / 0.25)
+
+    # Colorfulness (Hasler & Suesstrunk), on [0, 1] channel values
+    r, g, b = previews[..., 0], previews[..., 1], previews[..., 2]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colorfulness_raw = (np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+                        + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2))
+    colorfulness = np.minimum(1.0, colorfulness_raw / 0.4)
+
+    components = {
+        'resolution': resolution,
+        'sharpness': sharpness,
+        'exposure': exposure,
+        'contrast': contrast,
+        'colorfulness': colorfulness,
+        'aspect': aspect,
+    }
+    weights = settings['weights']
+    total_weight = sum(weights.values())
+    scores = sum(weights[name] * values for name, values in components.items()) / total_weight
+    return scores.astype(np.float32), components
+
+
+def rank_candidates(previews: List[Optional[np.ndarray]], dimensions: Sequence[Tuple[int, int]],
+                    is_background: bool) -> List[Tuple[int, float]]:
+    """
+    Score every candidate that has a preview in one vectorized pass.
+    Returns (candidate index, score) pairs, best first.
+    """
+    indices = [i for i, preview in enumerate(previews) if preview is not None]
+    if not indices:
+        return []
+    batch = np.stack([previews[i] for i in indices])
+    scores, _ = score_images(batch, [dimensions[i] for i in indices], is_background)
+    order = np.argsort(-scores)
+    return [(indices[i], float(scores[i])) for i in order]
+
+
+# Where _draw_photo_slide puts text, as (top, bottom, left, right) fractions of the slide
+TEXT_REGIONS = {
+    'title': (1 / 9, 3 / 9, 1 / 16, 15 / 16),
+    'body': (7 / 9, 8 / 9, 1 / 16, 15 / 16),
+}
+# Relative luminance of the light and dark text colours we can switch between
+_LIGHT_TEXT_LUMINANCE = 1.0
+_DARK_TEXT_LUMINANCE = 0.0137  # RGB(30, 30, 30)
+
+
+def _contrast_ratio(l1, l2):
+    """WCAG contrast ratio between two relative luminances (broadcasts over arrays)."""
+    return (np.maximum(l1, l2) + 0.05) / (np.minimum(l1, l2) + 0.05)
+
+
+def analyze_text_legibility(small_rgb: np.ndarray) -> dict:
+    """
+    Pick a scrim opacity and text colour for a background image.
+
+    Args:
+        small_rgb: (H, W, 3) uint8 array of a small downsampled copy of the
+                   background, already stretched to the slide's aspect ratio.
+
+    Returns:
+        dict with 'overlay_alpha' (black scrim opacity), 'text_color'
+        ('light' or 'dark') and the measured luminance/contrast per text region.
+    """
+    settings = config.PPTConfig.BACKGROUND_LEGIBILITY
+    srgb = small_rgb.astype(np.float32) / 255.0
+    linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ _LUMA
+
+    height, width = luminance.shape
+    regions = {}
+    for name, (top, bottom, left, right) in TEXT_REGIONS.items():
+        region = luminance[int(top * height):max(int(bottom * height), int(top * height) + 1),
+                           int(left * width):max(int(right * width), int(left * width) + 1)]
+        # Text must stay legible over the bright and the dark parts of the region
+        regions[name] = {
+            'mean': float(region.mean()),
+            'bright': float(np.percentile(region, 90)),
+            'dark': float(np.percentile(region, 10)),
+            'std': float(region.std()),
+        }
+
+    target = settings['target_contrast']
+    brightest = max(region['bright'] for region in regions.values())
+    darkest = min(region['dark'] for region in regions.values())
+
+    # Dark text with no scrim if the image is bright enough everywhere text goes
+    if settings['adapt_text_color'] and _contrast_ratio(darkest, _DARK_TEXT_LUMINANCE) >= target:
+        text_color, alpha = 'dark', 0.0
+    else:
+        # A black scrim of opacity a scales luminance by (1 - a); solve for white text
+        max_luminance = (_LIGHT_TEXT_LUMINANCE + 0.05) / target - 0.05
+        needed = 1.0 - max_luminance / brightest if brightest > max_luminance else 0.0
+        text_color = 'light'
+        alpha = float(np.clip(needed, settings['min_alpha'], settings['max_alpha']))
+
+    return {
+        'overlay_alpha': round(alpha, 3),
+        'text_color': text_color,
+        'regions': {name: {key: round(value, 4) for key, value in stats.items()}
+                    for name, stats in regions.items()},
+    }
@@ -0,0 +1,83 @@
+import re
+from enum import Enum
+from typing import Optional, Tuple
+import config
+from .text_analysis import analyze_slide
+
+
+class SlideLayout(str, Enum):
+    """The layouts understood by create_presentation."""
+    TITLE = "Title Layout"
+    PHOTO = "Photo Layout"
+    DIAGRAM = "Diagram Layout"
+    TEXT = "Text Layout"
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["SlideLayout"]:
+        """
+        Map free text (e.g. an LLM reply) onto a layout.
+        Returns None if the text does not name exactly one layout.
+        """
+        if not text:
+            return None
+        lowered = text.lower()
+        matches = [layout for layout in cls if layout.value.split()[0].lower() in lowered]
+        return matches[0] if len(matches) == 1 else None
+
+
+# Keyword groups shared with visual_engine._determine_diagram_type
+DIAGRAM_KEYWORDS = {
+    'flow', 'process', 'steps', 'sequence',
+    'compare', 'versus', 'vs', 'difference',
+    'timeline', 'history', 'future', 'roadmap',
+    'chart', 'graph', 'diagram', 'framework', 'cycle', 'stages', 'phases'
+}
+PHOTO_KEYWORDS = {
+    'photo', 'image', 'picture', 'landscape', 'people', 'scene', 'illustration', 'visual'
+}
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _text_features(slide_data: dict) -> dict:
+    """Extract the cheap text features the classifier scores on."""
+    text = analyze_slide(slide_data)
+    focus_words = set(_WORD_RE.findall((slide_data.get('visual_focus', '') or '').lower()))
+    body_words = len(text.body.split())
+
+    return {
+        'bullets': len(text.points),
+        'avg_sentence_words': (body_words / len(text.sentences)) if text.sentences else 0.0,
+        'numbers': len(text.numbers),
+        'diagram_hits': len(text.keywords & DIAGRAM_KEYWORDS) + len(focus_words & DIAGRAM_KEYWORDS),
+        'photo_hits': len(focus_words & PHOTO_KEYWORDS),
+        'body_words': body_words,
+    }
+
+
+def classify_slide_layout(slide_data: dict) -> Tuple[SlideLayout, float]:
+    """
+    Pick a layout from the slide's text alone.
+    Returns the layout and a confidence in [0, 1].
+    """
+    f = _text_features(slide_data)
+
+    scores = {
+        SlideLayout.DIAGRAM: 1.5 * f['diagram_hits'] + 0.5 * min(f['numbers'], 4),
+        SlideLayout.TEXT: (1.0 if f['bullets'] >= 5 else 0.0)
+                          + (1.0 if f['avg_sentence_words'] > 22 else 0.0)
+                          + (1.0 if f['body_words'] > 90 else 0.0),
+        SlideLayout.PHOTO: 1.0 + 1.5 * f['photo_hits']
+                           + (0.5 if f['body_words'] < 40 else 0.0),
+    }
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+
+    # Confidence is the winner's margin over the runner-up
+    confidence = (best_score - runner_up) / ((best_score + runner_up) or 1.0)
+    return best, round(confidence, 3)
+
+
+def is_confident(confidence: float) -> bool:
+    return confidence >= config.PPTConfig.LAYOUT_RULES['confidence_threshold']
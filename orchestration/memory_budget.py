@@ -0,0 +1,161 @@
+import gc
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+import config
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Blobs smaller than this are not worth a file and a mapping
+_MIN_SPILL_BYTES = 64 * 1024
+
+
+def private_rss() -> Optional[int]:
+    """
+    Resident memory of the whole process that is not file-backed, in bytes, or
+    None where /proc is unavailable. It covers every deck the process is
+    building, not one deck's share. Spilled media is file-backed, so it does not count.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            _, resident, shared = (int(value) for value in f.read().split()[:3])
+        return (resident - shared) * _PAGE_SIZE
+    except (OSError, ValueError):
+        return None
+
+
+def _image_parts(prs):
+    seen = set()
+    for slide in prs.slides:
+        for rel in slide.part.rels.values():
+            if rel.reltype == RT.IMAGE and not rel.is_external and rel.target_part not in seen:
+                seen.add(rel.target_part)
+                yield rel.target_part
+
+
+_active = {}  # DeckMemory -> its media bytes in memory at the last checkpoint
+_active_lock = threading.Lock()
+
+
+class DeckMemory:
+    """
+    Keeps one deck's media under PPTConfig.MEMORY while it is assembled by
+    spilling its image blobs to temp files that are memory-mapped for reads.
+
+    The deck spills once its own in-memory media passes media_budget_mb, so
+    decks built side by side (server, load test) are each held to their own
+    budget. Process RSS is only a global guard: past rss_budget_mb, the deck
+    holding the most media in memory spills first, then the next at its
+    following checkpoint if the process is still over.
+
+    python-pptx reads part._blob through the buffer protocol (hashing,
+    PIL, zip writing), so a read-only mmap works wherever the bytes did. python-pptx reads part._blob through the buffer protocol (hashing,
+    PIL, zip writing), so a read-only mmap works wherever the bytes did.
+
+    Use as a context manager around assembly and save; the spill files are
+    removed on exit, so the deck must be saved before then.
+    """
+
+    def __init__(self, low_memory: Optional[bool] = None):
+        settings = config.PPTConfig.MEMORY
+        self.low_memory = settings['low_memory'] if low_memory is None else low_memory
+        self.media_budget = settings['media_budget_mb'] * 1024 * 1024
+        self.rss_budget = settings['rss_budget_mb'] * 1024 * 1024
+        self.spill_root = settings['spill_dir']
+        self.peak_rss = 0          # Of the whole process
+        self.peak_media = 0        # This deck's image bytes held in memory
+        self.spilled_bytes = 0
+        self._dir = None
+        self._maps = []
+
+    def __enter__(self):
+        with _active_lock:
+            _active[self] = 0
+        self.checkpoint()
+        return self
+
+    def __exit__(self, *exc):
+        with _active_lock:
+            _active.pop(self, None)
+        for mapped in self._maps:
+            mapped.close()
+        self._maps.clear()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+        return False
+
+    def _spill_part(self, part) -> int:
+        blob = part._blob
+        if isinstance(blob, mmap.mmap) or len(blob) < _MIN_SPILL_BYTES:
+            return 0
+        if self._dir is None:
+            if self.spill_root:
+                os.makedirs(self.spill_root, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix='pptgen_media_', dir=self.spill_root)
+
+        fd, path = tempfile.mkstemp(dir=self._dir, suffix='.bin')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        part._blob = mapped
+        return len(blob)
+
+    def spill(self, prs) -> int:
+        """Move every in-memory image blob of the deck to disk. Returns the bytes spilled."""
+        spilled = sum(self._spill_part(part) for part in _image_parts(prs))
+        if spilled:
+            self.spilled_bytes += spilled
+            gc.collect()
+        return spilled
+
+    def in_memory_media(self, prs) -> int:
+        return sum(len(part._blob) for part in _image_parts(prs) if not isinstance(part._blob, mmap.mmap))
+
+    def checkpoint(self, prs=None):
+        """
+        Sample memory and spill the deck's media if the deck is over its media
+        budget, or the process is over its RSS guard and no running deck holds
+        more media (always, in low-memory mode).
+        """
+        rss = private_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        if prs is None:
+            return
+        media = self.in_memory_media(prs)
+        self.peak_media = max(self.peak_media, media)
+        if self.low_memory is False:
+            return
+
+        with _active_lock:
+            _active[self] = media
+            # Over the process guard, only the deck holding the most media gives it up
+            over_guard = (rss is not None and rss > self.rss_budget
+                          and media >= max(_active.values(), default=0))
+        if self.low_memory or media > self.media_budget or over_guard:
+            self.spill(prs)
+            with _active_lock:
+                if self in _active:
+                    _active[self] = self.in_memory_media(prs)
+            rss = private_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def report(self) -> str:
+        line = (f"-> Memory: deck media peaked at {self.peak_media / 1024 / 1024:.1f} MB in memory "
+                f"(budget {self.media_budget / 1024 / 1024:.0f} MB)")
+        if self.spilled_bytes:
+            line += f", {self.spilled_bytes / 1024 / 1024:.1f} MB spilled to disk"
+        if not self.peak_rss:
+            return line + "; process RSS not available on this platform"
+        line += (f"; process peak RSS {self.peak_rss / 1024 / 1024:.0f} MB "
+                 f"(guard {self.rss_budget / 1024 / 1024:.0f} MB)")
+        if self.peak_rss > self.rss_budget:
+            line += " -- over the guard"
+        return line
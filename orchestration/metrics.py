@@ -0,0 +1,303 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+import config
+from .circuit_breaker import CircuitOpenError
+from .pexels_quota import QuotaExceeded
+from .profiling import current_profile
+
+# Seconds; external calls and render stages range from milliseconds to minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labelvalues, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labelvalues, extra)} "
+                         f"{_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [('', key, '', value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', key, f'le="{_format_value(bound)}"', count))
+                samples.append(('_sum', key, '', total))
+                samples.append(('_count', key, '', counts[-1]))
+        return samples
+
+
+class Registry:
+    """Named metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, documentation: str, labelnames=(), **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, documentation, tuple(labelnames), **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        _update_hit_ratios()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+EXTERNAL_CALLS = REGISTRY.counter(
+    'pptgen_external_calls_total', 'Calls to external services by outcome (ok, error, rejected)',
+    ('dependency', 'operation', 'outcome'))
+EXTERNAL_LATENCY = REGISTRY.histogram(
+    'pptgen_external_call_seconds', 'Latency of external calls that were sent', ('dependency', 'operation'))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'pptgen_cache_lookups_total', 'Cache lookups by result (hit, miss)', ('cache', 'result'))
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    'pptgen_cache_hit_ratio', 'Share of lookups served from each cache since start', ('cache',))
+STAGE_SECONDS = REGISTRY.histogram(
+    'pptgen_stage_seconds', 'Time spent in each pipeline and render stage', ('stage',))
+DECKS = REGISTRY.counter(
+    'pptgen_decks_total', 'Finished deck generations by outcome (ok, failed, cancelled)', ('outcome',))
+DECK_SECONDS = REGISTRY.histogram(
+    'pptgen_deck_seconds', 'End-to-end deck generation time', ('outcome',))
+DECK_SLIDES = REGISTRY.histogram(
+    'pptgen_deck_slides', 'Content slides per generated deck', buckets=(3, 5, 8, 10, 15, 20, 30, 50, 100))
+DECKS_IN_PROGRESS = REGISTRY.gauge(
+    'pptgen_decks_in_progress', 'Deck generations currently running')
+DEGRADED_STAGES = REGISTRY.counter(
+    'pptgen_degraded_stages_total', 'Optional stages skipped to meet a deck deadline', ('stage',))
+
+
+def record_external_call(dependency: str, operation: str, outcome: str, seconds: Optional[float] = None):
+    EXTERNAL_CALLS.inc(dependency=dependency, operation=operation, outcome=outcome)
+    if seconds is not None:
+        EXTERNAL_LATENCY.observe(seconds, dependency=dependency, operation=operation)
+    profile = current_profile()
+    if profile:
+        profile.record_external(dependency, operation, seconds)
+
+
+@contextmanager
+def external_call(dependency: str, operation: str):
+    """
+    Count and time one call to an external service. Calls refused locally (open
+    circuit, no quota) count as 'rejected' and are left out of the latency histogram.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except (CircuitOpenError, QuotaExceeded):
+        record_external_call(dependency, operation, 'rejected')
+        raise
+    except Exception:
+        record_external_call(dependency, operation, 'error', time.perf_counter() - started)
+        raise
+    record_external_call(dependency, operation, 'ok', time.perf_counter() - started)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time one pipeline or render stage (and track its memory when a deck is being profiled)."""
+    profile = current_profile()
+    with STAGE_SECONDS.time(stage=stage), (profile.stage(stage) if profile else nullcontext()):
+        yield
+
+
+class _DeckRun:
+    def __init__(self):
+        self.outcome = 'failed'
+
+    def finished(self, slides: int):
+        self.outcome = 'ok'
+        DECK_SLIDES.observe(slides)
+
+
+@contextmanager
+def deck_run():
+    """
+    Track one deck generation: in progress while inside, then counted and timed
+    by outcome. Call .finished(slides) on success; anything else counts as
+    failed, and a run stopped by a BaseException (cancellation) as cancelled.
+    """
+    run = _DeckRun()
+    DECKS_IN_PROGRESS.inc()
+    started = time.perf_counter()
+    try:
+        yield run
+    except Exception:
+        run.outcome = 'failed'
+        raise
+    except BaseException:
+        run.outcome = 'cancelled'
+        raise
+    finally:
+        DECKS_IN_PROGRESS.dec()
+        DECKS.inc(outcome=run.outcome)
+        DECK_SECONDS.observe(time.perf_counter() - started, outcome=run.outcome)
+
+
+def _update_hit_ratios():
+    totals: Dict[str, list] = {}
+    for _, (cache, result), _, value in CACHE_LOOKUPS._samples():
+        totals.setdefault(cache, [0, 0])[result == 'hit'] += value
+    for cache, (misses, hits) in totals.items():
+        CACHE_HIT_RATIO.set(hits / (hits + misses) if hits + misses else 0.0, cache=cache)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def dump_metrics(path: Optional[str] = None) -> str:
+    """Write the current metrics in Prometheus text format (for node-exporter's textfile collector)."""
+    path = str(path or config.PPTConfig.METRICS['dump_path'])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Scrapes every few seconds would drown the generation log
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread (once per process)."""
+    global _server
+    settings = config.PPTConfig.METRICS
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host or settings['host'], port or settings['port']), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+            print(f"-> Metrics served at http://{_server.server_address[0]}:{_server.server_address[1]}/metrics")
+        return _server
@@ -0,0 +1,211 @@
+import copy
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config
+
+# Expanded before comparing, so "Intro to ML" and "Introduction to Machine Learning" match
+ABBREVIATIONS = {
+    'ai': 'artificial intelligence',
+    'ml': 'machine learning',
+    'dl': 'deep learning',
+    'nlp': 'natural language processing',
+    'llm': 'large language model',
+    'llms': 'large language models',
+    'cv': 'computer vision',
+    'iot': 'internet of things',
+    'ar': 'augmented reality',
+    'vr': 'virtual reality',
+    'ux': 'user experience',
+    'ui': 'user interface',
+    'db': 'database',
+    'k8s': 'kubernetes',
+    'js': 'javascript',
+    'esg': 'environmental social governance',
+    'hr': 'human resources',
+    'intro': 'introduction',
+    'mgmt': 'management',
+    'dev': 'development',
+    'govt': 'government',
+    'vs': 'versus',
+    '&': 'and',
+}
+# Outline fields a slide's layout, images and diagram are derived from; the
+# cache keeps only these, never what enrichment resolved from them
+CONTENT_FIELDS = ('slide_title', 'slide_body', 'visual_focus', 'supporting_visuals')
+
+STOPWORDS = {'a', 'an', 'the', 'to', 'of', 'in', 'on', 'for', 'and', 'with', 'about', 'into', 'how', 'what', 'is', 'are'}
+
+_TOKEN_RE = re.compile(r"[a-z0-9&+#]+")
+
+
+def normalize_topic(topic: str) -> List[str]:
+    """Lower-cased content words of a topic with abbreviations expanded."""
+    words = []
+    for token in _TOKEN_RE.findall(topic.lower()):
+        words.extend(ABBREVIATIONS.get(token, token).split())
+    return [word for word in words if word not in STOPWORDS]
+
+
+def _numbers(words: List[str]) -> set:
+    """Numbers and versions in a topic ('3', 'v2', '2030'); topics that differ in one want different decks."""
+    return {word for word in words if any(char.isdigit() for char in word)}
+
+
+def _features(words: List[str]) -> Counter:
+    """Whole words plus character trigrams, so plurals and small typos still overlap."""
+    features = Counter(f"w:{word}" for word in words)
+    for word in words:
+        padded = f" {word} "
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def _content_only(slides: list) -> list:
+    """Independent copies of the slides with their outline fields only."""
+    return [copy.deepcopy({field: slide[field] for field in CONTENT_FIELDS if field in slide}) for slide in slides]
+
+
+def _fit_outline(outline: list, num_slides: int) -> list:
+    """Shorten a cached outline to num_slides, keeping its closing slide."""
+    slides = outline[:num_slides] if num_slides < 2 else outline[:num_slides - 1] + outline[-1:]
+    return _content_only(slides)
+
+
+class OutlineCache:
+    """
+    Outlines of past topics, matched by TF-IDF cosine similarity of the topic
+    text. Everything is local: a JSON file under PATHS['outlines'].
+
+    An outline is served for a new topic when the similarity reaches the
+    threshold, both topics name the same numbers and versions ("Python 2" is
+    never served "Python 3"), and the cached outline has at least as many
+    slides as requested (a longer one is shortened, keeping its closing slide).
+    Entries expire after ttl_days and the least recently used are evicted
+    beyond max_entries.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        settings = config.PPTConfig.OUTLINE_CACHE
+        self.path = Path(path or config.PPTConfig.PATHS['outlines'] / 'outlines.json')
+        self.threshold = settings['similarity_threshold']
+        self.max_entries = settings['max_entries']
+        self.ttl_seconds = settings['ttl_days'] * 86400
+        self._lock = threading.Lock()
+        self._entries: List[dict] = []
+        self._loaded_mtime = None
+
+    def _load(self):
+        # Reload if another process wrote the file since we last read it
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            self._entries = json.loads(self.path.read_text()).get('entries', [])
+            self._loaded_mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable outline cache {self.path}: {e}")
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps({'entries': self._entries}, indent=1))
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = self.path.stat().st_mtime
+
+    def _expire(self, now: float):
+        self._entries = [entry for entry in self._entries if now - entry['created'] < self.ttl_seconds]
+
+    def _similarities(self, words: List[str]) -> List[float]:
+        """Cosine similarity of the topic to every cached topic, with IDF over the cache."""
+        documents = [_features(entry['words']) for entry in self._entries]
+        query = _features(words)
+        document_frequency = Counter()
+        for features in documents + [query]:
+            document_frequency.update(features.keys())
+        total = len(documents) + 1
+        idf = {feature: math.log((1 + total) / (1 + count)) + 1 for feature, count in document_frequency.items()}
+
+        def weigh(features: Counter) -> Dict[str, float]:
+            return {feature: count * idf[feature] for feature, count in features.items()}
+
+        query_vector = weigh(query)
+        query_norm = math.sqrt(sum(value * value for value in query_vector.values())) or 1.0
+        scores = []
+        for features in documents:
+            vector = weigh(features)
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            dot = sum(value * vector.get(feature, 0.0) for feature, value in query_vector.items())
+            scores.append(dot / (norm * query_norm))
+        return scores
+
+    def lookup(self, topic: str, num_slides: int) -> Optional[Tuple[list, str, float]]:
+        """(outline, cached topic, similarity) of the closest usable match, or None."""
+        words = normalize_topic(topic)
+        if not words:
+            return None
+        with self._lock:
+            self._load()
+            self._expire(time.time())
+            numbers = _numbers(words)
+            candidates = [(score, entry) for score, entry in zip(self._similarities(words), self._entries)
+                          if len(entry['outline']) >= num_slides and _numbers(entry['words']) == numbers]
+            if not candidates:
+                return None
+            score, entry = max(candidates, key=lambda candidate: candidate[0])
+            if score < self.threshold:
+                return None
+            entry['last_used'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self._save()
+            return _fit_outline(entry['outline'], num_slides), entry['topic'], score
+
+    def store(self, topic: str, num_slides: int, outline: list):
+        words = normalize_topic(topic)
+        if not words or not outline:
+            return
+        # The caller goes on to enrich its slides in place
+        outline = _content_only(outline)
+        now = time.time()
+        with self._lock:
+            self._load()
+            self._expire(now)
+            # One entry per normalized topic: keep the longest outline
+            existing = next((entry for entry in self._entries if entry['words'] == words), None)
+            if existing and len(existing['outline']) > len(outline):
+                existing['last_used'] = now
+            else:
+                if existing:
+                    self._entries.remove(existing)
+                self._entries.append({'topic': topic, 'words': words, 'outline': outline,
+                                      'created': now, 'last_used': now, 'hits': 0})
+            if len(self._entries) > self.max_entries:
+                self._entries.sort(key=lambda entry: entry['last_used'], reverse=True)
+                del self._entries[self.max_entries:]
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._save()
+
+
+_cache: Optional[OutlineCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_outline_cache() -> OutlineCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OutlineCache()
+        return _cache
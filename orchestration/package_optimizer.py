@@ -0,0 +1,184 @@
+import argparse
+import io
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from pptx import Presentation
+from pptx.oxml.ns import qn
+from pptx.util import Emu
+import config
+
+# Quality/resolution steps tried, in order, until the media fits the size budget
+_BUDGET_STEPS = [
+    (None, 1.0),   # Configured JPEG quality, configured DPI
+    (75, 0.85),
+    (65, 0.7),
+    (55, 0.55),
+]
+
+
+def _placed_size(blip, slide) -> Optional[Tuple[float, float]]:
+    """
+    Displayed size in inches of the full image behind an <a:blip>, taking any
+    srcRect crop into account, or None if the blip is not placed on the slide.
+    """
+    container = next((ancestor for ancestor in blip.iterancestors()
+                      if ancestor.tag in (qn('p:pic'), qn('p:bg'), qn('p:sp'))), None)
+    if container is None:
+        return None
+
+    if container.tag == qn('p:bg'):
+        presentation = slide.part.package.presentation_part.presentation
+        width, height = presentation.slide_width, presentation.slide_height
+    else:
+        ext = container.find(f".//{qn('a:xfrm')}/{qn('a:ext')}")
+        if ext is None:
+            return None
+        width, height = int(ext.get('cx')), int(ext.get('cy'))
+
+    # A cropped image shows only part of its pixels in the placed box
+    visible_w = visible_h = 1.0
+    src_rect = blip.getparent().find(qn('a:srcRect'))
+    if src_rect is not None:
+        visible_w -= (int(src_rect.get('l', 0)) + int(src_rect.get('r', 0))) / 100000
+        visible_h -= (int(src_rect.get('t', 0)) + int(src_rect.get('b', 0))) / 100000
+    return Emu(width).inches / max(visible_w, 0.01), Emu(height).inches / max(visible_h, 0.01)
+
+
+def collect_placements(prs) -> Dict[object, Tuple[float, float]]:
+    """Map each embedded image part to the largest size (inches) it is displayed at."""
+    placements = {}
+    for slide in prs.slides:
+        for blip in slide._element.iter(qn('a:blip')):
+            rId = blip.get(qn('r:embed'))
+            if not rId:
+                continue
+            part = slide.part.related_part(rId)
+            size = _placed_size(blip, slide)
+            if size is None or not hasattr(part, 'image'):
+                continue
+            current = placements.get(part, (0.0, 0.0))
+            placements[part] = (max(current[0], size[0]), max(current[1], size[1]))
+    return placements
+
+
+def media_bytes(prs) -> int:
+    """Total size of the images placed on the deck's slides."""
+    return sum(len(part.blob) for part in collect_placements(prs))
+
+
+def _recompress(blob: bytes, placed_in: Tuple[float, float], quality: int, dpi: float) -> Tuple[bytes, dict]:
+    """Downsample an image to dpi at its placed size and re-encode it in its own format."""
+    with Image.open(io.BytesIO(blob)) as img:
+        img_format = img.format
+        px_w, px_h = img.size
+        target_w = max(1, round(placed_in[0] * dpi))
+        target_h = max(1, round(placed_in[1] * dpi))
+        # Keep both axes at or above the target, even if the placement stretches the image
+        scale = min(1.0, max(target_w / px_w, target_h / px_h))
+
+        if img_format == 'JPEG' and scale < 0.5:
+            # Let the JPEG decoder do most of the downscaling
+            img.draft('RGB', (round(px_w * scale), round(px_h * scale)))
+        out = img
+        if scale < 1.0:
+            out = out.resize((max(1, round(px_w * scale)), max(1, round(px_h * scale))), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        if img_format == 'JPEG':
+            if out.mode not in ('RGB', 'L'):
+                out = out.convert('RGB')
+            out.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        elif img_format == 'PNG':
+            out.save(buffer, 'PNG', optimize=True)
+        else:
+            # Leave formats we do not re-encode (GIF, BMP, ...) untouched
+            return blob, {'pixels_after': (px_w, px_h)}
+        new_size = out.size
+
+    return buffer.getvalue(), {'pixels_before': (px_w, px_h), 'pixels_after': new_size}
+
+
+def compress_media(prs, target_mb: Optional[float] = None, verbose: bool = True) -> List[dict]:
+    """
+    Downsample and recompress every embedded image to what its placement needs,
+    stepping quality and DPI down until the media fits target_mb.
+
+    Works on an in-memory Presentation so the deck is only saved once.
+    Returns a per-media report.
+    """
+    settings = config.PPTConfig.OUTPUT_BUDGET
+    target_bytes = (target_mb if target_mb is not None else settings['target_mb']) * 1024 * 1024
+    placements = collect_placements(prs)
+    originals = {part: part.blob for part in placements}
+
+    report: List[dict] = []
+    for quality, dpi_factor in _BUDGET_STEPS:
+        quality = quality or settings['jpeg_quality']
+        report = []
+        for part, placed_in in placements.items():
+            blob = originals[part]
+            is_photo = part.content_type == 'image/jpeg'
+            dpi = max(settings['min_dpi'], (settings['photo_dpi'] if is_photo else settings['diagram_dpi']) * dpi_factor)
+            try:
+                new_blob, info = _recompress(blob, placed_in, quality, dpi)
+            except Exception as e:
+                print(f"Warning: Could not recompress {part.partname}: {e}")
+                new_blob, info = blob, {}
+            if len(new_blob) >= len(blob):
+                new_blob = blob
+                info['pixels_after'] = info.get('pixels_before')
+            part._blob = new_blob
+
+            pixels_before = info.get('pixels_before')
+            pixels_after = info.get('pixels_after') or pixels_before
+            report.append({
+                'part': str(part.partname),
+                'placed_in': (round(placed_in[0], 2), round(placed_in[1], 2)),
+                'dpi_before': round(pixels_before[0] / placed_in[0]) if pixels_before else None,
+                'dpi_after': round(pixels_after[0] / placed_in[0]) if pixels_after else None,
+                'bytes_before': len(blob),
+                'bytes_after': len(new_blob),
+            })
+
+        total = sum(entry['bytes_after'] for entry in report)
+        if total <= target_bytes:
+            break
+    else:
+        print(f"Warning: Media is {total / 1024 / 1024:.1f} MB, still over the "
+              f"{target_bytes / 1024 / 1024:.1f} MB budget at the lowest quality step")
+
+    if verbose:
+        print(format_report(report))
+    return report
+
+
+def format_report(report: List[dict]) -> str:
+    lines = ["-> Media recompression report:"]
+    for entry in report:
+        lines.append(
+            f"   {entry['part']:<24} {entry['placed_in'][0]:>5}x{entry['placed_in'][1]:<5}in "
+            f"{entry['dpi_before'] or '?':>4} -> {entry['dpi_after'] or '?':>4} dpi  "
+            f"{entry['bytes_before'] / 1024:>8.0f} -> {entry['bytes_after'] / 1024:>8.0f} KB"
+        )
+    before = sum(entry['bytes_before'] for entry in report)
+    after = sum(entry['bytes_after'] for entry in report)
+    lines.append(f"   Total: {before / 1024 / 1024:.2f} MB -> {after / 1024 / 1024:.2f} MB "
+                 f"(saved {(before - after) / 1024 / 1024:.2f} MB)")
+    return "\n".join(lines)
+
+
+def compress_pptx_file(pptx_path: str, target_mb: Optional[float] = None,
+                       output_path: Optional[str] = None) -> List[dict]:
+    """Recompress the media of an existing .pptx, in place unless output_path is given."""
+    prs = Presentation(pptx_path)
+    report = compress_media(prs, target_mb)
+    prs.save(output_path or pptx_path)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Shrink the media in a generated .pptx to a size budget')
+    parser.add_argument('pptx', help='Deck to recompress (rewritten in place)')
+    parser.add_argument('--target-mb', type=float, default=None, help='Size budget for embedded media')
+    args = parser.parse_args()
+    compress_pptx_file(args.pptx, args.target_mb)
@@ -0,0 +1,258 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+import config
+
+# What a search is for; backgrounds keep going when quota runs short
+BACKGROUND, SUPPORTING = 'background', 'supporting'
+
+_HOUR = 3600
+
+_current = contextvars.ContextVar('deck_quota', default=None)
+
+
+class QuotaExceeded(Exception):
+    """No Pexels search may be sent right now for this deck or key pool."""
+
+
+def pexels_api_keys() -> List[str]:
+    """Keys from PEXELS_API_KEYS (comma separated) followed by PEXELS_API_KEY, without duplicates."""
+    keys = [key.strip() for key in os.getenv('PEXELS_API_KEYS', '').split(',')]
+    keys.append((os.getenv('PEXELS_API_KEY') or '').strip())
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+class _KeyState:
+    """
+    Quota of one API key. The hourly limit is counted locally over a sliding
+    hour; the monthly quota is whatever Pexels last reported in X-Ratelimit-*.
+    """
+
+    def __init__(self, key: str, hourly_limit: int):
+        self.key = key
+        self.hourly_limit = hourly_limit
+        self.sent = deque()  # send times within the last hour
+        self.monthly_remaining = None
+        self.monthly_reset_at = None
+        self.blocked_until = 0.0
+        self.last_used = 0.0
+
+    def refresh(self, now: float):
+        while self.sent and self.sent[0] <= now - _HOUR:
+            self.sent.popleft()
+        if self.monthly_reset_at is not None and now >= self.monthly_reset_at:
+            self.monthly_remaining = self.monthly_reset_at = None
+
+    def remaining(self, now: float) -> int:
+        if now < self.blocked_until:
+            return 0
+        hourly = self.hourly_limit - len(self.sent)
+        if self.monthly_remaining is None:
+            return max(0, hourly)
+        return max(0, min(hourly, self.monthly_remaining))
+
+    def available_at(self, now: float) -> float:
+        """When this key can send again if it cannot now."""
+        times = [self.blocked_until] if now < self.blocked_until else []
+        if self.monthly_remaining is not None and self.monthly_remaining <= 0:
+            times.append(self.monthly_reset_at)
+        if len(self.sent) >= self.hourly_limit:
+            times.append(self.sent[0] + _HOUR)
+        return max(times, default=now)
+
+
+class DeckQuota:
+    """
+    The Pexels searches one deck may make. Entering the context registers the
+    deck with the key pool, so decks running at the same time share what is
+    left of the hour's quota instead of the first one using it all.
+    """
+
+    def __init__(self, searches: Optional[int] = None, pool: Optional['PexelsQuota'] = None):
+        self.searches = searches if searches is not None else config.PPTConfig.PEXELS_QUOTA['per_deck_searches']
+        self.pool = pool
+        self.used = {BACKGROUND: 0, SUPPORTING: 0}
+        self.denied = {BACKGROUND: 0, SUPPORTING: 0}
+        self._token = None
+
+    def __enter__(self):
+        self.pool = self.pool or get_pexels_quota()
+        self.pool.register(self)
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        self.pool.unregister(self)
+        return False
+
+    @property
+    def total_used(self) -> int:
+        return sum(self.used.values())
+
+    def report(self) -> str:
+        line = (f"-> Pexels: {self.total_used} of {self.searches} searches used "
+                f"({self.used[BACKGROUND]} backgrounds, {self.used[SUPPORTING]} supporting)")
+        skipped = sum(self.denied.values())
+        if skipped:
+            line += (f", {skipped} skipped for quota ({self.denied[BACKGROUND]} backgrounds, "
+                     f"{self.denied[SUPPORTING]} supporting)")
+        return line
+
+
+def current_deck_quota() -> Optional[DeckQuota]:
+    return _current.get()
+
+
+class PexelsQuota:
+    """
+    Schedules Pexels API searches across a pool of keys.
+
+    - Each key may send RATE_LIMITS['pexels'] searches in any hour, and no more
+      than the monthly quota Pexels reports in its X-Ratelimit-* headers.
+    - A search goes to the key with the most quota left, the least recently
+      used one on a tie, so load rotates evenly over the pool.
+    - A deck may use at most its own budget, and at most an equal share of the
+      quota left when the decks currently running started, so one heavy deck
+      cannot starve the others.
+    - Once the pool is below low_quota_fraction of its limit, supporting images
+      are refused so the remaining searches go to slide backgrounds, and
+      supporting images may use at most supporting_share of a deck's budget.
+
+    Photo and preview downloads come from the Pexels CDN and do not count.
+    """
+
+    def __init__(self, keys: Optional[List[str]] = None, hourly_limit: Optional[int] = None):
+        limit = hourly_limit or config.PPTConfig.RATE_LIMITS['pexels']
+        self._keys = [_KeyState(key, limit) for key in (keys if keys is not None else pexels_api_keys())]
+        self._lock = threading.Lock()
+        self._decks: List[DeckQuota] = []
+
+    def register(self, deck: DeckQuota):
+        with self._lock:
+            self._decks.append(deck)
+
+    def unregister(self, deck: DeckQuota):
+        with self._lock:
+            if deck in self._decks:
+                self._decks.remove(deck)
+
+    def _state(self, key: str) -> Optional[_KeyState]:
+        return next((state for state in self._keys if state.key == key), None)
+
+    def acquire(self, kind: str = SUPPORTING) -> str:
+        """Claim one search and return the API key to send it with, or raise QuotaExceeded."""
+        settings = config.PPTConfig.PEXELS_QUOTA
+        deck = current_deck_quota()
+        with self._lock:
+            now = time.time()
+            for state in self._keys:
+                state.refresh(now)
+            if not self._keys:
+                raise QuotaExceeded("no Pexels API key configured")
+            try:
+                remaining = sum(state.remaining(now) for state in self._keys)
+                if remaining <= 0:
+                    wait = min(state.available_at(now) for state in self._keys) - now
+                    raise QuotaExceeded(f"Pexels quota used up for the next {wait / 60:.0f} min")
+
+                capacity = sum(state.hourly_limit for state in self._keys)
+                if kind == SUPPORTING and remaining < settings['low_quota_fraction'] * capacity:
+                    raise QuotaExceeded(f"Pexels quota low ({remaining} left), keeping it for backgrounds")
+
+                if deck is not None:
+                    deck_left = deck.searches - deck.total_used
+                    if kind == SUPPORTING:
+                        deck_left = min(deck_left, int(settings['supporting_share'] * deck.searches) - deck.used[SUPPORTING])
+                    # Equal split of what the running decks have used plus what is left
+                    shared = remaining + sum(other.total_used for other in self._decks)
+                    fair_share = math.ceil(shared / max(1, len(self._decks)))
+                    if min(deck_left, fair_share - deck.total_used) <= 0:
+                        raise QuotaExceeded(f"deck's Pexels budget for {kind} images is used up")
+            except QuotaExceeded:
+                if deck is not None:
+                    deck.denied[kind] += 1
+                raise
+
+            state = max((s for s in self._keys if s.remaining(now) > 0),
+                        key=lambda s: (s.remaining(now), -s.last_used))
+            state.sent.append(now)
+            if state.monthly_remaining is not None:
+                state.monthly_remaining -= 1
+            state.last_used = now
+            if deck is not None:
+                deck.used[kind] += 1
+            return state.key
+
+    def release(self, key: str, kind: str = SUPPORTING) -> None:
+        """Give back a search that was claimed but never sent."""
+        deck = current_deck_quota()
+        with self._lock:
+            state = self._state(key)
+            if state and state.sent:
+                state.sent.pop()
+                if state.monthly_remaining is not None:
+                    state.monthly_remaining += 1
+            if deck is not None and deck.used[kind]:
+                deck.used[kind] -= 1
+
+    def update(self, key: str, headers) -> None:
+        """Adopt the monthly quota Pexels reports in a response's X-Ratelimit-* headers."""
+        try:
+            remaining = int(headers['X-Ratelimit-Remaining'])
+            reset_at = float(headers['X-Ratelimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            state = self._state(key)
+            if state:
+                state.monthly_remaining = remaining
+                state.monthly_reset_at = reset_at
+
+    def exhausted(self, key: str, headers=None) -> None:
+        """A 429 for this key: take it out of rotation until its quota frees up."""
+        with self._lock:
+            state = self._state(key)
+            if state is None:
+                return
+            now = time.time()
+            state.refresh(now)
+            try:
+                monthly_exhausted = int(headers['X-Ratelimit-Remaining']) <= 0
+                if monthly_exhausted:
+                    state.monthly_remaining = 0
+                    state.monthly_reset_at = float(headers['X-Ratelimit-Reset'])
+            except (KeyError, TypeError, ValueError):
+                monthly_exhausted = False
+            if not monthly_exhausted:
+                # The hourly limit: wait until the oldest search leaves the window
+                state.blocked_until = (state.sent[0] if state.sent else now) + _HOUR
+        print("Warning: A Pexels API key hit its rate limit; rotating to the others")
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Quota per key (keys shown by their last four characters) and running decks."""
+        with self._lock:
+            now = time.time()
+            keys = []
+            for state in self._keys:
+                state.refresh(now)
+                keys.append({'key': f"...{state.key[-4:]}", 'remaining': state.remaining(now),
+                             'sent_last_hour': len(state.sent), 'monthly_remaining': state.monthly_remaining})
+            return {'keys': keys, 'active_decks': len(self._decks)}
+
+
+_quota: Optional[PexelsQuota] = None
+_quota_lock = threading.Lock()
+
+
+def get_pexels_quota() -> PexelsQuota:
+    """The process-wide scheduler for the configured Pexels keys."""
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            _quota = PexelsQuota()
+        return _quota
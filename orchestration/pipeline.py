@@ -0,0 +1,210 @@
+import threading
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional
+import config
+from .content_engine import generate_slide_outline, decide_slide_layout, generate_visual_keyword
+from .layout_engine import SlideLayout
+from .visual_engine import create_presentation
+from .image_engine import search_and_download_photo, get_supporting_images
+from .prefetch import ImagePrefetcher
+from .deadline import Deadline, stage_allowed
+from .pexels_quota import DeckQuota
+from .workspace import Workspace, current_workspace
+from .metrics import cache_lookup, deck_run, stage_timer
+from .plan_cache import get_plan_cache
+from .profiling import DeckProfile
+from .request_log import log_request
+from .deck_manifest import (CONTENT_FIELDS, build_manifest, content_hash, is_reusable,
+                            load_manifest, manifest_path_for, save_manifest)
+
+
+# Stages reported to a generate_presentation progress callback, in order
+PROGRESS_STAGES = ('outline', 'images', 'render')
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class GenerationCancelled(BaseException):
+    """
+    Raised inside generate_presentation once its cancel event is set. It derives
+    from BaseException so the per-step fallbacks (which catch Exception) let it through.
+    """
+
+
+def enrich_slide(slide_data: dict, index: int, prefetcher: Optional[ImagePrefetcher] = None) -> dict:
+    """
+    Resolve layout, background image and supporting images for one outline slide.
+    Images already fetched by the prefetcher are used instead of fetching them again,
+    and a plan stored by warm_cache.py replaces the Gemini calls.
+    """
+    plan = get_plan_cache().lookup(slide_data) or {}
+    cache_lookup('plans', bool(plan))
+
+    # Set layout
+    if index == 0:
+        slide_data['layout'] = SlideLayout.TITLE
+    else:
+        slide_data['layout'] = SlideLayout.parse(plan.get('layout')) or decide_slide_layout(slide_data)
+
+    # Generate and download background image. A prefetch that already finished
+    # costs nothing, so it is used even when the deadline rules out fetching
+    visual_keyword = image_path = None
+    prefetched = prefetcher.background(slide_data, wait=False) if prefetcher else None
+    if prefetcher:
+        cache_lookup('prefetch', bool(prefetched))
+    if not prefetched and stage_allowed('backgrounds', slide_data):
+        prefetched = prefetcher.background(slide_data) if prefetcher else None
+        if not prefetched:
+            visual_keyword = plan.get('visual_keyword') or generate_visual_keyword(
+                slide_data['slide_title'], slide_data['slide_body'], slide_data.get('visual_focus', ''))
+            if visual_keyword:
+                print(f"-> Searching for background image: {visual_keyword}")
+                image_path = search_and_download_photo(visual_keyword, is_background=True)
+    if prefetched:
+        visual_keyword, image_path = prefetched
+        print(f"-> Background image prefetched: {visual_keyword}")
+    if visual_keyword:
+        slide_data['visual_keyword'] = visual_keyword
+        if image_path:
+            slide_data['image_path'] = image_path
+
+    # Get supporting images for non-title slides
+    if index > 0:
+        supporting_images = prefetcher.supporting(slide_data, wait=False) if prefetcher else None
+        if supporting_images is None and stage_allowed('supporting_images', slide_data):
+            supporting_images = prefetcher.supporting(slide_data) if prefetcher else None
+            if supporting_images is None:
+                supporting_images = get_supporting_images(slide_data, plan.get('supporting_keywords'))
+        if supporting_images:
+            slide_data['supporting_images'] = supporting_images
+
+    return slide_data
+
+
+def write_manifest(topic: str, style: str, enriched_slides: list, output_file: str) -> str:
+    """Save the deck manifest next to the generated .pptx."""
+    manifest = build_manifest(topic, style, enriched_slides, output_file)
+    return str(save_manifest(manifest, manifest_path_for(output_file)))
+
+
+def _run_workspace():
+    """A private workspace for the run, unless the caller already entered one."""
+    return nullcontext(current_workspace()) if current_workspace() else Workspace()
+
+
+def _deck_deadline():
+    """The deck's time budget, or a no-op context if DEADLINE['seconds'] is None."""
+    return Deadline() if config.PPTConfig.DEADLINE['seconds'] else nullcontext()
+
+
+def generate_presentation(topic: str, num_slides: int = 6, style: str = 'dark',
+                          use_outline_cache: bool = True,
+                          progress: Optional[ProgressCallback] = None,
+                          cancel_event: Optional[threading.Event] = None,
+                          profile: bool = False, log: bool = True) -> Optional[str]:
+    """
+    Run the whole pipeline: outline, enrichment, rendering and manifest.
+    use_outline_cache=False always asks Gemini for a fresh outline.
+    log=False leaves the request out of the log warm_cache.py --from-logs reads.
+    profile=True runs it under cProfile and tracemalloc and writes
+    <deck>.profile.txt and <deck>.prof next to the deck.
+
+    progress is called as progress(stage, done, total) for each stage in
+    PROGRESS_STAGES, from the calling thread. Setting cancel_event stops the
+    run at the next slide boundary with GenerationCancelled.
+    """
+    def report(stage: str, done: int, total: int):
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled()
+        if progress:
+            progress(stage, done, total)
+
+    if log:
+        log_request(topic, style, num_slides)
+    profiler = DeckProfile() if profile else nullcontext()
+    with profiler, deck_run() as run, _run_workspace(), _deck_deadline() as deadline, DeckQuota() as quota:
+        print("-> AI generating text outline...")
+        report('outline', 0, num_slides)
+        prefetch = config.PPTConfig.PREFETCH['enabled']
+        with (ImagePrefetcher() if prefetch else nullcontext()) as prefetcher:
+            streamed = []
+
+            def on_slide(slide_data: dict):
+                streamed.append(slide_data)
+                report('outline', min(len(streamed), num_slides), num_slides)
+                if prefetcher:
+                    prefetcher.submit(slide_data)
+
+            # Images for early slides are fetched while later slides are still being written
+            with stage_timer('outline'):
+                slides = generate_slide_outline(topic, num_slides, on_slide=on_slide, use_cache=use_outline_cache)
+            if not slides:
+                print("ERROR: Failed to generate slide outline")
+                return None
+            report('outline', num_slides, num_slides)
+
+            enriched_slides = []
+            for i, slide_data in enumerate(slides):
+                report('images', i, len(slides))
+                print(f"\n-> Processing slide {i+1}: {slide_data['slide_title']}")
+                with stage_timer('enrich_slide'):
+                    enriched_slides.append(enrich_slide(slide_data, i, prefetcher))
+            report('images', len(slides), len(slides))
+
+        output_file = create_presentation(enriched_slides, topic, style, num_slides,
+                                          on_slide=lambda done, total: report('render', done, total))
+        write_manifest(topic, style, enriched_slides, output_file)
+        run.finished(len(enriched_slides))
+        if deadline:
+            print(deadline.report())
+        print(quota.report())
+    if profile:
+        report_path, stats_path = profiler.save(output_file)
+        print(f"-> Profile written to {report_path} (raw stats: {stats_path})")
+    return output_file
+
+
+def regenerate_presentation(manifest_path: str, edits: Optional[Dict[int, dict]] = None,
+                            style: Optional[str] = None) -> str:
+    """
+    Rebuild a deck from its manifest, re-enriching only slides whose content changed.
+
+    Args:
+        manifest_path: Path to the <deck>.manifest.json written with the deck.
+        edits: Maps a 0-based outline slide index to the fields to change, e.g.
+               {2: {'slide_body': '...'}}. Content fields (title, body, visual
+               focus) trigger re-enrichment of that slide; resolved fields such
+               as 'layout' or 'image_path' are applied as overrides.
+        style: Optionally re-render the whole deck in a different style.
+
+    Returns:
+        The path of the regenerated .pptx.
+    """
+    manifest = load_manifest(manifest_path)
+    edits = edits or {}
+    style = style or manifest['style']
+
+    with _run_workspace(), _deck_deadline() as deadline:
+        enriched_slides = []
+        for entry in manifest['slides']:
+            index = entry['index']
+            slide_data = {key: value for key, value in entry.items() if value is not None}
+            slide_data.update(edits.get(index, {}))
+
+            # Slides degraded by a deadline last time are completed now
+            content_changed = content_hash(slide_data) != entry['content_hash']
+            if content_changed or not is_reusable(entry):
+                print(f"-> Re-rendering slide {index + 1}: {slide_data['slide_title']}")
+                overrides = {key: value for key, value in edits.get(index, {}).items() if key not in CONTENT_FIELDS}
+                fresh = {field: slide_data[field] for field in CONTENT_FIELDS if field in slide_data}
+                slide_data = enrich_slide(fresh, index)
+                slide_data.update(overrides)
+            else:
+                print(f"-> Reusing slide {index + 1}: {slide_data['slide_title']}")
+            enriched_slides.append(slide_data)
+
+        output_file = create_presentation(enriched_slides, manifest['topic'], style, len(enriched_slides))
+        write_manifest(manifest['topic'], style, enriched_slides, output_file)
+        if deadline:
+            print(deadline.report())
+    return output_file
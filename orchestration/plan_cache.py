@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import config
+from .deck_manifest import content_hash
+
+
+class SlidePlanCache:
+    """
+    What enrichment resolved for a slide's content: its layout, background
+    keyword and supporting image keywords, keyed by the slide's content hash.
+
+    With a plan, enrich_slide and the prefetcher skip the Gemini calls for the
+    slide, and its keywords hit the image cache, so a warmed slide needs no
+    external calls at all. Plans are written by warm_cache.py; one small JSON
+    file per slide under PATHS['plans'], ignored after OUTLINE_CACHE['ttl_days'].
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or config.PPTConfig.PATHS['plans'])
+        self.ttl_seconds = config.PPTConfig.OUTLINE_CACHE['ttl_days'] * 86400
+
+    def _path(self, slide_data: dict) -> Path:
+        return self.directory / f"{content_hash(slide_data)}.json"
+
+    def lookup(self, slide_data: dict) -> Optional[dict]:
+        path = self._path(slide_data)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                return None
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def store(self, slide_data: dict, plan: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(slide_data)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(plan, indent=1))
+        os.replace(tmp_path, path)
+
+
+_cache: Optional[SlidePlanCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> SlidePlanCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SlidePlanCache()
+        return _cache
@@ -0,0 +1,131 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import config
+from .content_engine import generate_visual_keyword
+from .deadline import current_deadline, request_timeout
+from .image_engine import get_supporting_images, search_and_download_photo
+from .plan_cache import get_plan_cache
+
+# Pexels searches charged against the budget for each kind of prefetch
+_BACKGROUND_COST = 1
+_SUPPORTING_COST = 3  # get_supporting_images asks for 2-3 images
+
+
+def _stage_open(stage: str) -> bool:
+    """Whether the deck's deadline still allows a stage; enrich_slide records any skip."""
+    deadline = current_deadline()
+    return deadline is None or deadline.allows(stage)
+
+
+def _slide_key(slide_data: dict) -> Tuple[str, str, str]:
+    return (slide_data.get('slide_title', ''), slide_data.get('slide_body', ''),
+            slide_data.get('visual_focus', ''))
+
+
+class ImagePrefetcher:
+    """
+    Starts the image work for outline slides while the rest of the outline is
+    still being generated: the visual keyword and background photo, and the
+    supporting images. enrich_slide() then picks up the results instead of
+    making the same calls on the critical path.
+
+    Everything fetched lands in the image cache, so results for slides that end
+    up unused (cancelled deck, edited outline) are still reused later.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_searches: Optional[int] = None):
+        settings = config.PPTConfig.PREFETCH
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or settings['max_workers'],
+                                            thread_name_prefix='prefetch')
+        self._budget = max_searches if max_searches is not None else settings['max_searches']
+        self._wait_timeout = settings['wait_timeout']
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._backgrounds: Dict[tuple, Future] = {}
+        self._supporting: Dict[tuple, Future] = {}
+        self._submitted = 0
+
+    def _charge(self, cost: int) -> bool:
+        with self._lock:
+            if self._cancelled.is_set() or self._budget < cost:
+                return False
+            self._budget -= cost
+            return True
+
+    def submit(self, slide_data: dict):
+        """Queue prefetching for the next outline slide; the first slide is the title slide."""
+        index = self._submitted
+        self._submitted += 1
+        key = _slide_key(slide_data)
+        snapshot = dict(slide_data)
+
+        # Each task runs in a copy of the caller's context, so it sees the deck's deadline
+        if key not in self._backgrounds and self._charge(_BACKGROUND_COST):
+            self._backgrounds[key] = self._executor.submit(
+                contextvars.copy_context().run, self._fetch_background, snapshot)
+        # Backgrounds are queued first so they win the budget and the workers
+        if index > 0 and key not in self._supporting and self._charge(_SUPPORTING_COST):
+            self._supporting[key] = self._executor.submit(
+                contextvars.copy_context().run, self._fetch_supporting, snapshot)
+
+    def _fetch_background(self, slide_data: dict) -> Tuple[Optional[str], Optional[str]]:
+        if self._cancelled.is_set() or not _stage_open('backgrounds'):
+            return None, None
+        plan = get_plan_cache().lookup(slide_data) or {}
+        keyword = plan.get('visual_keyword') or generate_visual_keyword(
+            slide_data['slide_title'], slide_data['slide_body'], slide_data.get('visual_focus', ''))
+        if not keyword or self._cancelled.is_set():
+            return keyword, None
+        return keyword, search_and_download_photo(keyword, is_background=True)
+
+    def _fetch_supporting(self, slide_data: dict) -> Optional[list]:
+        if self._cancelled.is_set() or not _stage_open('supporting_images'):
+            return None
+        plan = get_plan_cache().lookup(slide_data) or {}
+        return get_supporting_images(slide_data, plan.get('supporting_keywords'))
+
+    def _result(self, futures: Dict[tuple, Future], slide_data: dict, wait: bool):
+        key = _slide_key(slide_data)
+        future = futures.get(key)
+        if future is None or not (wait or future.done()):
+            return None
+        futures.pop(key)
+        if future.cancelled():
+            return None
+        try:
+            # Waiting for a prefetch in flight never runs past the deck's deadline
+            return future.result(timeout=request_timeout(self._wait_timeout))
+        except Exception as e:
+            print(f"   ... Prefetch for '{slide_data.get('slide_title', '')}' not usable: {e!r}")
+            return None
+
+    def background(self, slide_data: dict, wait: bool = True) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        (visual_keyword, image_path) prefetched for this slide, or None to fetch it now.
+        With wait=False only a prefetch that has already finished is returned.
+        """
+        result = self._result(self._backgrounds, slide_data, wait)
+        if not result or not result[0]:
+            return None
+        return result
+
+    def supporting(self, slide_data: dict, wait: bool = True) -> Optional[list]:
+        """Supporting image paths prefetched for this slide, or None to fetch them now."""
+        return self._result(self._supporting, slide_data, wait)
+
+    def cancel(self):
+        """Drop queued work. Downloads already running finish into the image cache."""
+        self._cancelled.set()
+        for future in list(self._backgrounds.values()) + list(self._supporting.values()):
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Whatever the deck did not use is cancelled
+        self.cancel()
+        return False
@@ -0,0 +1,271 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config
+
+_current = contextvars.ContextVar('deck_profile', default=None)
+
+# Built-ins where a thread sits waiting on the network, another thread or a timer.
+# Their time is reported as waiting, not as local CPU work.
+_WAIT_FUNCTIONS = (
+    "'recv_into' of '_socket.socket'", "'recv' of '_socket.socket'", "'connect' of '_socket.socket'",
+    "'read' of '_ssl._SSLSocket'", "'do_handshake' of '_ssl._SSLSocket'", "_socket.getaddrinfo",
+    "'acquire' of '_thread.lock'", "'acquire' of '_thread.RLock'", "time.sleep",
+    "select.select", "'poll' of 'select.poll'", "'control' of 'select.kqueue'",
+)
+
+_MB = 1024 * 1024
+
+
+def _is_wait(func: Tuple[str, int, str]) -> bool:
+    filename, _, name = func
+    return filename == '~' and any(wait in name for wait in _WAIT_FUNCTIONS)
+
+
+def _short_path(filename: str) -> str:
+    """A source path relative to site-packages or the project, e.g. 'pptx/parts/image.py'."""
+    parts = Path(filename).parts
+    for marker in ('site-packages', 'dist-packages', 'orchestration'):
+        if marker in parts:
+            start = parts.index(marker) + (marker != 'orchestration')
+            return '/'.join(parts[start:])
+    return filename
+
+
+def _component(filename: str) -> str:
+    """What a source file belongs to: a third-party package, an orchestration module, or the stdlib."""
+    parts = Path(filename).parts
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            package = parts[parts.index(marker) + 1]
+            return Path(package).stem if package.endswith('.py') else package
+    if 'orchestration' in parts:
+        return f"orchestration.{Path(filename).stem}"
+    if filename.startswith('<frozen') or 'lib' in (part.lower() for part in parts):
+        return 'stdlib'
+    return Path(filename).stem
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+class _StageMemory:
+    __slots__ = ('name', 'peak')
+
+    def __init__(self, name: str, peak: int):
+        self.name = name
+        self.peak = peak
+
+
+class DeckProfile:
+    """
+    Profile one deck generation: cProfile for the calling thread's CPU time and
+    tracemalloc for the memory of every thread.
+
+    Pipeline and render stages (metrics.stage_timer) report their peak traced
+    memory here, and external calls (metrics.external_call) their time, so the
+    report separates time spent waiting on Gemini and Pexels from local work.
+    Entering the context makes this the current profile for this thread and for
+    threads started with a copy of its context.
+
+    Only the calling thread is in the function table; work on prefetch threads
+    shows up in the stage and external call sections.
+    """
+
+    def __init__(self, top_n: Optional[int] = None):
+        self._thread = threading.get_ident()
+        self.top_n = top_n or config.PPTConfig.PROFILING['top_n']
+        self.profiler = cProfile.Profile()
+        self.stats: Optional[pstats.Stats] = None
+        self.wall = self.cpu = 0.0
+        self.peak_memory = 0
+        self.stage_peaks: Dict[str, int] = {}
+        self.stage_counts: Dict[str, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.external: Dict[Tuple[str, str], List[float]] = {}
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_stage = ''
+        self._snapshot_size = 0
+        self._open: List[_StageMemory] = []
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        self._token = None
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(config.PPTConfig.PROFILING['traceback_frames'])
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._token = _current.set(self)
+        self._wall_started, self._cpu_started = time.perf_counter(), time.process_time()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.wall = time.perf_counter() - self._wall_started
+        self.cpu = time.process_time() - self._cpu_started
+        _current.reset(self._token)
+        with self._lock:
+            self.peak_memory = max([self.peak_memory, tracemalloc.get_traced_memory()[1]]
+                                   + list(self.stage_peaks.values()))
+        if self.snapshot is None:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_stage = 'end of run'
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        self.stats = pstats.Stats(self.profiler)
+        return False
+
+    # --- Hooks called from orchestration.metrics ---
+
+    def _raise_open_peaks(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        for stage in self._open:
+            stage.peak = max(stage.peak, peak)
+        return current
+
+    @contextmanager
+    def stage(self, name: str):
+        """Track the peak traced memory of one stage (stages may nest or overlap across threads)."""
+        with self._lock:
+            current = self._raise_open_peaks()
+            tracemalloc.reset_peak()
+            memory = _StageMemory(name, current)
+            self._open.append(memory)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+                current = self._raise_open_peaks()
+                self._open.remove(memory)
+                self.stage_peaks[name] = max(self.stage_peaks.get(name, 0), memory.peak)
+                self.stage_counts[name] = self.stage_counts.get(name, 0) + 1
+                # Keep the allocations of the moment the most memory was still live
+                take_snapshot = current > self._snapshot_size
+                if take_snapshot:
+                    self._snapshot_size = current
+            if take_snapshot:
+                # The snapshot itself is profiling overhead, not deck work
+                own_thread = threading.get_ident() == self._thread
+                if own_thread:
+                    self.profiler.disable()
+                snapshot = tracemalloc.take_snapshot()
+                if own_thread:
+                    self.profiler.enable()
+                with self._lock:
+                    self.snapshot, self.snapshot_stage = snapshot, f"end of {name}"
+
+    def record_external(self, dependency: str, operation: str, seconds: Optional[float]):
+        with self._lock:
+            totals = self.external.setdefault((dependency, operation), [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds or 0.0
+
+    # --- Report ---
+
+    def _function_rows(self, waiting: bool) -> List[Tuple[float, float, int, str]]:
+        rows = []
+        for func, (_, ncalls, tottime, cumtime, _) in self.stats.stats.items():
+            if _is_wait(func) == waiting:
+                rows.append((tottime, cumtime, ncalls, _label(func)))
+        return sorted(rows, reverse=True)
+
+    def _components(self) -> List[Tuple[float, str]]:
+        """
+        Own time per component. Built-ins (PIL's C code, zlib, lxml) count
+        towards the component of the code that called them, so decoding an
+        image is charged to PIL rather than to 'built-ins'.
+        """
+        totals: Dict[str, float] = {}
+        for func, (_, _, tottime, _, callers) in self.stats.stats.items():
+            if _is_wait(func):
+                continue
+            if func[0] != '~':
+                shares = [(_component(func[0]), tottime)]
+            else:
+                caller_time = sum(times[2] for times in callers.values())
+                shares = [(_component(caller[0]) if caller[0] != '~' else 'builtins',
+                           tottime * times[2] / caller_time if caller_time else tottime / len(callers))
+                          for caller, times in callers.items()] or [('builtins', tottime)]
+            for component, seconds in shares:
+                totals[component] = totals.get(component, 0.0) + seconds
+        return sorted(((seconds, name) for name, seconds in totals.items()), reverse=True)
+
+    def report(self, title: str = '') -> str:
+        """Plain-text report: time split, components, top functions, stage memory, allocation sites."""
+        if self.stats is None:
+            return "Profile not finished"
+        top = self.top_n
+        waiting = sum(row[0] for row in self._function_rows(waiting=True))
+        external = sum(seconds for _, seconds in self.external.values())
+        out = io.StringIO()
+        w = lambda line='': out.write(line + '\n')
+
+        w(f"Deck profile{': ' + title if title else ''}")
+        w(f"Wall time {self.wall:.2f}s, CPU time {self.cpu:.2f}s (all threads), "
+          f"peak traced memory {self.peak_memory / _MB:.1f} MB")
+        w(f"Calling thread: {max(0.0, self.wall - waiting):.2f}s local work, {waiting:.2f}s waiting "
+          f"(network, locks, other threads)")
+        w()
+        w(f"External calls (all threads, {external:.2f}s in total; not local CPU time):")
+        if not self.external:
+            w("   none")
+        for (dependency, operation), (count, seconds) in sorted(self.external.items(), key=lambda item: -item[1][1]):
+            w(f"   {dependency + ' ' + operation:<28} {count:>5} calls {seconds:>9.2f}s")
+        w()
+        w("Local time by component (calling thread, own time):")
+        for seconds, name in self._components()[:top]:
+            w(f"   {name:<40} {seconds:>9.3f}s")
+        w()
+        w(f"Top {top} functions by own time (calling thread, waits excluded):")
+        w(f"   {'own s':>9} {'cum s':>9} {'calls':>8}  function")
+        for tottime, cumtime, ncalls, label in self._function_rows(waiting=False)[:top]:
+            w(f"   {tottime:>9.3f} {cumtime:>9.3f} {ncalls:>8}  {label}")
+        w()
+        w("Stages (wall time, all threads; peak traced memory):")
+        if not self.stage_peaks:
+            w("   no stages recorded")
+        for name, peak in sorted(self.stage_peaks.items(), key=lambda item: -item[1]):
+            w(f"   {name:<28} {self.stage_counts[name]:>5} runs {self.stage_seconds[name]:>9.2f}s "
+              f"{peak / _MB:>9.1f} MB peak")
+        w()
+        w(f"Top {top} allocation sites still live at {self.snapshot_stage}:")
+        snapshot = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        for stat in snapshot.statistics('lineno')[:top]:
+            frame = stat.traceback[0]
+            w(f"   {stat.size / _MB:>9.2f} MB {stat.count:>8} blocks  {_short_path(frame.filename)}:{frame.lineno}")
+        return out.getvalue()
+
+    def save(self, deck_path: str) -> Tuple[Path, Path]:
+        """Write <deck>.profile.txt and <deck>.prof (pstats, for snakeviz or pstats) next to the deck."""
+        deck = Path(deck_path)
+        report_path = deck.with_suffix('.profile.txt')
+        stats_path = deck.with_suffix('.prof')
+        tmp_path = report_path.with_name(f"{report_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.report(deck.stem))
+        os.replace(tmp_path, report_path)
+        self.stats.dump_stats(stats_path)
+        return report_path, stats_path
+
+
+def current_profile() -> Optional[DeckProfile]:
+    return _current.get()
@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+import config
+
+_lock = threading.Lock()
+
+
+def log_request(topic: str, style: str, slides: int):
+    """
+    Append one line per deck request to WARMING['request_log'], for
+    warm_cache.py --from-logs. Past 'request_log_max_mb' the log is moved to
+    <log>.1, so only the current and the previous log are kept.
+    """
+    path = config.PPTConfig.WARMING['request_log']
+    if not path:
+        return
+    path = Path(path)
+    line = json.dumps({'time': round(time.time()), 'topic': topic, 'style': style, 'slides': slides}) + '\n'
+    try:
+        with _lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > config.PPTConfig.WARMING['request_log_max_mb'] * 1024 * 1024:
+                os.replace(path, rotated_path(path))
+            # One short write in append mode, so lines from several processes do not interleave
+            with open(path, 'a') as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Warning: Could not log the request: {e}")
+
+
+def rotated_path(path: Path) -> Path:
+    return path.with_name(path.name + '.1')
+
+
+def read_requests(paths: Optional[List[Path]] = None) -> Iterator[dict]:
+    """Logged requests, oldest first; each log's rotated predecessor is read before it."""
+    if paths is None:
+        paths = [Path(config.PPTConfig.WARMING['request_log'])]
+    for path in paths:
+        for log_path in (rotated_path(Path(path)), Path(path)):
+            try:
+                lines = log_path.read_text().splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(request, dict) and request.get('topic'):
+                    yield request
@@ -0,0 +1,121 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, NamedTuple, Tuple
+
+# --- Compiled patterns (shared by every renderer) ---
+# Sentence ends at . ! ? followed by whitespace; decimals like 3.5 never match
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_NUMBERED_RE = re.compile(r"^\s*\d+[.)]\s+")
+_BULLET_RE = re.compile(r"^\s*[•\-\*]\s+")
+_LIST_MARKER_RE = re.compile(r"^\s*(?:\d+[.)]|[•\-\*])\s+", re.MULTILINE)
+_BOLD_RE = re.compile(r"\*([^*\n]+)\*")
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+_NUMBER_RE = re.compile(
+    r"(?P<currency>[$€£])?"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"\s*(?P<unit>%|percent\b|x\b|million\b|billion\b|trillion\b|k\b|m\b|bn\b)?",
+    re.IGNORECASE
+)
+
+# Tokens that end with a period but do not end a sentence
+_ABBREVIATIONS = {'e.g.', 'i.e.', 'etc.', 'vs.', 'approx.', 'dr.', 'mr.', 'ms.', 'inc.', 'u.s.', 'no.'}
+
+_SCALE = {'k': 1e3, 'm': 1e6, 'million': 1e6, 'bn': 1e9, 'billion': 1e9, 'trillion': 1e12}
+
+
+class NumberToken(NamedTuple):
+    text: str       # As written, e.g. "$3.5 billion"
+    value: float    # Scaled value, e.g. 3.5e9
+    unit: str       # '%', 'x', '$' (currency) or '' for plain counts
+    start: int      # Offset into the body with markers and list prefixes removed
+
+
+@dataclass(frozen=True)
+class SlideText:
+    """A slide body parsed once into the pieces every renderer needs."""
+    title: str
+    body: str
+    sentences: Tuple[str, ...]          # With *bold* markers, trailing '.' removed
+    plain_sentences: Tuple[str, ...]    # Same sentences without markers
+    bullets: Tuple[str, ...]            # List items if the body is already a list
+    is_list: bool                       # More than half the lines are bullets/numbers
+    numbers: Tuple[NumberToken, ...]
+    bold_spans: Tuple[str, ...]
+    keywords: FrozenSet[str]            # Lower-case words of title and body
+
+    @property
+    def points(self) -> Tuple[str, ...]:
+        """Key points to render: list items when already formatted, else sentences."""
+        return self.bullets if self.is_list else self.sentences
+
+    @property
+    def plain_points(self) -> Tuple[str, ...]:
+        return tuple(point.replace('*', '') for point in self.points)
+
+    def has_any(self, words) -> bool:
+        return not self.keywords.isdisjoint(words)
+
+
+def _split_sentences(text: str) -> Tuple[str, ...]:
+    pieces = [piece.strip() for piece in _SENTENCE_END_RE.split(text) if piece and piece.strip()]
+
+    # Re-join pieces that were split after an abbreviation
+    merged = []
+    for piece in pieces:
+        if merged and merged[-1].split()[-1].lower() in _ABBREVIATIONS:
+            merged[-1] = f"{merged[-1]} {piece}"
+        else:
+            merged.append(piece)
+
+    return tuple(sentence[:-1].rstrip() if sentence.endswith('.') else sentence for sentence in merged)
+
+
+def _parse_numbers(plain: str) -> Tuple[NumberToken, ...]:
+    tokens = []
+    for match in _NUMBER_RE.finditer(plain):
+        value = float(match.group('number').replace(',', ''))
+        unit = (match.group('unit') or '').lower()
+        if unit in _SCALE:
+            value *= _SCALE[unit]
+            unit = ''
+        elif unit == 'percent':
+            unit = '%'
+        if match.group('currency') and unit != '%':
+            unit = '$'
+        tokens.append(NumberToken(match.group(0).strip(), value, unit, match.start()))
+    return tuple(tokens)
+
+
+def plain_text(body: str) -> str:
+    """The body without list markers or *bold* markers; NumberToken.start offsets point into this."""
+    return _LIST_MARKER_RE.sub('', body).replace('*', '')
+
+
+@lru_cache(maxsize=256)
+def _analyze(title: str, body: str) -> SlideText:
+    lines = [line for line in body.strip().split('\n') if line.strip()]
+    list_lines = [line for line in lines if _NUMBERED_RE.match(line) or _BULLET_RE.match(line)]
+    is_list = len(lines) > 1 and len(list_lines) > len(lines) / 2
+    bullets = tuple(_BULLET_RE.sub('', _NUMBERED_RE.sub('', line)).strip() for line in list_lines)
+
+    sentences = _split_sentences(body)
+    # List markers are layout, not data: keep them out of numbers and keywords
+    plain_body = plain_text(body)
+
+    return SlideText(
+        title=title,
+        body=body,
+        sentences=sentences,
+        plain_sentences=tuple(sentence.replace('*', '') for sentence in sentences),
+        bullets=bullets if is_list else (),
+        is_list=is_list,
+        numbers=_parse_numbers(plain_body),
+        bold_spans=tuple(span.strip() for span in _BOLD_RE.findall(body)),
+        keywords=frozenset(_WORD_RE.findall(f"{title} {plain_body}".lower())),
+    )
+
+
+def analyze_slide(slide_data: dict) -> SlideText:
+    """Parse a slide's title and body; memoized so every renderer shares one result."""
+    return _analyze(slide_data.get('slide_title', '') or '', slide_data.get('slide_body', '') or '')
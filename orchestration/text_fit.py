@@ -0,0 +1,157 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from PIL import ImageFont
+from matplotlib import font_manager
+from pptx.util import Length, Pt
+import config
+
+# Glyph advances are measured once at this size and scaled linearly
+_REFERENCE_SIZE = 100
+# Kerning and renderer differences are not modelled; leave a little slack
+_WIDTH_SAFETY = 1.03
+# python-pptx textboxes default to 0.1" left/right and 0.05" top/bottom insets
+_INSET_X_IN = 0.2
+_INSET_Y_IN = 0.1
+
+
+class TextFit(NamedTuple):
+    size: Length          # Chosen font size
+    lines: List[str]      # Wrapped lines at that size, across all paragraphs
+    fits: bool            # False if the text overflows even at min_size
+
+
+@lru_cache(maxsize=None)
+def _font_path(font_name: str, bold: bool) -> Optional[str]:
+    """Find a TrueType file for the theme font, falling back to a metric-similar system font."""
+    fonts_dir = config.PPTConfig.PATHS['fonts']
+    candidates = [f"{font_name}-Bold.ttf", f"{font_name}b.ttf"] if bold else [f"{font_name}.ttf"]
+    for candidate in candidates:
+        path = Path(fonts_dir) / candidate
+        if path.exists():
+            return str(path)
+
+    try:
+        props = font_manager.FontProperties(family=[font_name, 'sans-serif'], weight='bold' if bold else 'normal')
+        return font_manager.findfont(props, fallback_to_default=True)
+    except Exception as e:
+        print(f"Warning: Could not resolve font '{font_name}': {e}")
+        return None
+
+
+class _GlyphTable:
+    """Per-font cache of glyph advance widths at the reference size."""
+
+    def __init__(self, font_name: str, bold: bool):
+        path = _font_path(font_name, bold)
+        self._font = ImageFont.truetype(path, _REFERENCE_SIZE) if path else ImageFont.load_default()
+        self._advances: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def width(self, text: str) -> float:
+        """Width of text in points at the reference size."""
+        advances = self._advances
+        total = 0.0
+        for ch in text:
+            advance = advances.get(ch)
+            if advance is None:
+                with self._lock:
+                    advance = advances[ch] = self._font.getlength(ch)
+            total += advance
+        return total
+
+
+@lru_cache(maxsize=None)
+def _glyph_table(font_name: str, bold: bool) -> _GlyphTable:
+    return _GlyphTable(font_name, bold)
+
+
+def measure_text(text: str, font_name: str, size_pt: float, bold: bool = False) -> float:
+    """Width of a single line of text in inches."""
+    width_pt = _glyph_table(font_name, bold).width(text) * size_pt / _REFERENCE_SIZE
+    return width_pt * _WIDTH_SAFETY / 72
+
+
+def wrap_text(text: str, font_name: str, size_pt: float, max_width_in: float, bold: bool = False) -> List[str]:
+    """Greedy word wrap of text into lines no wider than max_width_in."""
+    table = _glyph_table(font_name, bold)
+    scale = size_pt / _REFERENCE_SIZE * _WIDTH_SAFETY / 72
+    space = table.width(' ') * scale
+
+    lines = []
+    for raw_line in text.split('\n'):
+        current, current_width = [], 0.0
+        for word in raw_line.split():
+            word_width = table.width(word) * scale
+            needed = word_width if not current else current_width + space + word_width
+            if current and needed > max_width_in:
+                lines.append(' '.join(current))
+                current, current_width = [word], word_width
+            else:
+                current.append(word)
+                current_width = needed
+        lines.append(' '.join(current))
+    return lines
+
+
+def fit_paragraphs(paragraphs: Sequence[str], font_name: str, box_width: Length, box_height: Length,
+                   max_size: int, min_size: int, bold: bool = False, line_spacing: float = 1.2,
+                   space_after: int = 0, step: int = 2) -> TextFit:
+    """
+    Choose the largest font size (in points, max_size down to min_size) at which
+    all paragraphs wrap inside the box. space_after is in points per paragraph.
+    """
+    width_in = Length(box_width).inches - _INSET_X_IN
+    height_pt = (Length(box_height).inches - _INSET_Y_IN) * 72
+
+    lines: List[str] = []
+    size = max_size
+    while True:
+        lines = []
+        for paragraph in paragraphs:
+            lines.extend(wrap_text(paragraph, font_name, size, width_in, bold))
+        needed_pt = len(lines) * size * line_spacing + space_after * max(len(paragraphs) - 1, 0)
+        if needed_pt <= height_pt:
+            return TextFit(Pt(size), lines, True)
+        if size - step < min_size:
+            return TextFit(Pt(min_size), lines, False)
+        size -= step
+
+
+def fit_text(text: str, font_name: str, box_width: Length, box_height: Length,
+             max_size: int, min_size: int, bold: bool = False, line_spacing: float = 1.2) -> TextFit:
+    """Single-paragraph convenience wrapper around fit_paragraphs."""
+    return fit_paragraphs([text], font_name, box_width, box_height, max_size, min_size, bold, line_spacing)
+
+
+def fit_sentences(sentences: Sequence[str], font_name: str, box_width: Length, box_height: Length,
+                  max_size: int, min_size: int, bold: bool = False,
+                  line_spacing: float = 1.2) -> Tuple[str, TextFit]:
+    """
+    Join as many leading sentences as fit in the box at min_size or larger.
+    Sentences may carry *bold* markers; they are ignored when measuring.
+    If not even the first sentence fits, it is cut at the last word that does.
+    Returns the text to place and its fit.
+    """
+    def join(parts):
+        return '. '.join(parts) + ('.' if len(parts) > 1 else '')
+
+    plain = [sentence.replace('*', '') for sentence in sentences]
+    best: Optional[Tuple[str, TextFit]] = None
+    for count in range(1, len(sentences) + 1):
+        fit = fit_text(join(plain[:count]), font_name, box_width, box_height, max_size, min_size, bold, line_spacing)
+        if not fit.fits:
+            break
+        best = (join(sentences[:count]), fit)
+
+    if best is not None:
+        return best
+    if not sentences:
+        return '', TextFit(Pt(max_size), [], True)
+
+    # Even the first sentence overflows at min_size: keep the lines that fit
+    fit = fit_text(plain[0], font_name, box_width, box_height, min_size, min_size, bold, line_spacing)
+    max_lines = max(1, int((Length(box_height).inches - _INSET_Y_IN) * 72 // (min_size * line_spacing)))
+    kept = ' '.join(fit.lines[:max_lines]).rstrip(' ,;:') + '…'
+    return kept, TextFit(Pt(min_size), fit.lines[:max_lines], True)
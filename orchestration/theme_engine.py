@@ -0,0 +1,249 @@
+import copy
+import hashlib
+import io
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from lxml import etree
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.util import Inches
+import config
+
+# Bump when the generated masters/layouts change shape, to invalidate cached templates
+TEMPLATE_VERSION = 2
+
+# Names of the layouts generated for every theme
+LAYOUT_TITLE = "Generator Title"
+LAYOUT_TOC = "Generator Contents"
+LAYOUT_PHOTO = "Generator Photo"  # One per scrim level, e.g. "Generator Photo 35"
+LAYOUT_DIAGRAM = "Generator Diagram"
+
+THEMES = {
+    'dark': {
+        'font': 'Calibri',
+        'text': RGBColor(255, 255, 255),
+        'subtext': RGBColor(200, 200, 200),
+        'bg': RGBColor(45, 52, 54),
+        'accent': RGBColor(52, 152, 219),
+        'secondary': RGBColor(44, 62, 80)
+    },
+    'light': {
+        'font': 'Calibri',
+        'text': RGBColor(30, 30, 30),
+        'subtext': RGBColor(80, 80, 80),
+        'bg': RGBColor(248, 249, 250),
+        'accent': RGBColor(41, 128, 185),
+        'secondary': RGBColor(52, 73, 94)
+    }
+}
+
+
+def get_theme(style: str) -> dict:
+    """Return a copy of the theme for a style, falling back to dark."""
+    return dict(THEMES.get(style, THEMES['dark']))
+
+
+def _scrim_levels() -> list:
+    levels = set(config.PPTConfig.BACKGROUND_LEGIBILITY['scrim_levels'])
+    levels.add(config.PPTConfig.THEME_TEMPLATES['scrim_alpha'])
+    return sorted(levels)
+
+
+def photo_layout_name(overlay_alpha: Optional[float] = None) -> str:
+    """Name of the photo layout whose scrim is the lightest one at least as dark as overlay_alpha."""
+    if overlay_alpha is None:
+        overlay_alpha = config.PPTConfig.THEME_TEMPLATES['scrim_alpha']
+    levels = _scrim_levels()
+    level = next((level for level in levels if level >= overlay_alpha - 1e-6), levels[-1])
+    return f"{LAYOUT_PHOTO} {int(round(level * 100))}"
+
+
+def layout_names() -> list:
+    """Every layout generated for a theme."""
+    return [LAYOUT_TITLE, LAYOUT_TOC, LAYOUT_DIAGRAM] + [photo_layout_name(level) for level in _scrim_levels()]
+
+
+def _theme_hash(style: str) -> str:
+    settings = config.PPTConfig.THEME_TEMPLATES
+    theme = get_theme(style)
+    key = {
+        'version': TEMPLATE_VERSION,
+        'theme': {name: str(value) for name, value in theme.items()},
+        'slide_size': config.PPTConfig.SLIDE_DIMENSIONS,
+        'scrim_levels': _scrim_levels(),
+    }
+    base = Path(settings['base'])
+    if base.exists():
+        key['base'] = hashlib.md5(base.read_bytes()).hexdigest()
+    return hashlib.md5(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _set_alpha(shape, alpha: float):
+    """python-pptx has no transparency API; add <a:alpha> to the solid fill colour."""
+    srgbClr = shape.element.spPr.find(f"{qn('a:solidFill')}/{qn('a:srgbClr')}")
+    if srgbClr is not None:
+        etree.SubElement(srgbClr, qn('a:alpha')).set('val', str(int(alpha * 100000)))
+
+
+def _draw_layout_shapes(slide, prs, theme: dict, kind: str):
+    """Draw the shapes that every slide of this kind shares onto a scratch slide."""
+    width, height = prs.slide_width, prs.slide_height
+
+    if kind == LAYOUT_TITLE:
+        overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, width, height)
+        fill = overlay.fill
+        fill.gradient()
+        fill.gradient_stops[0].position = 0
+        fill.gradient_stops[0].color.rgb = RGBColor(0, 0, 0)
+        fill.gradient_stops[0].color.brightness = 0.4
+        fill.gradient_stops[1].position = 1
+        fill.gradient_stops[1].color.rgb = RGBColor(0, 0, 0)
+        fill.gradient_stops[1].color.brightness = 0.2
+        overlay.line.fill.background()
+    elif kind == LAYOUT_TOC:
+        overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, width, height)
+        overlay.fill.solid()
+        overlay.fill.fore_color.rgb = theme['bg']
+        overlay.fill.fore_color.brightness = 0.8
+        overlay.line.fill.background()
+    elif kind.startswith(LAYOUT_PHOTO):
+        # The scrim sits above the slide's own background image and below its content
+        alpha = int(kind.rsplit(' ', 1)[1]) / 100
+        if alpha > 0:
+            scrim = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, width, height)
+            scrim.fill.solid()
+            scrim.fill.fore_color.rgb = RGBColor(0, 0, 0)
+            _set_alpha(scrim, alpha)
+            scrim.line.fill.background()
+    elif kind == LAYOUT_DIAGRAM:
+        header = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, width, Inches(1.5))
+        header.fill.solid()
+        header.fill.fore_color.rgb = theme['accent']
+        header.line.fill.background()
+
+
+def _apply_theme_fonts(prs, font: str):
+    """Point the theme's major/minor latin fonts at the theme font."""
+    theme_part = prs.slide_master.part.part_related_by(RT.THEME)
+    root = etree.fromstring(theme_part.blob)
+    for latin in root.iter(qn('a:latin')):
+        if latin.getparent().tag in (qn('a:majorFont'), qn('a:minorFont')):
+            latin.set('typeface', font)
+    theme_part._blob = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _remove_slides(prs):
+    sldIdLst = prs.slides._sldIdLst
+    for sldId in list(sldIdLst):
+        prs.part.drop_rel(sldId.rId)
+        sldIdLst.remove(sldId)
+
+
+def build_theme_template(style: str, output_path: Path) -> Path:
+    """Generate the slide master and layouts for a theme and save them as a .pptx."""
+    print(f"-> Building '{style}' theme template...")
+    theme = get_theme(style)
+    base = Path(config.PPTConfig.THEME_TEMPLATES['base'])
+    prs = Presentation(str(base)) if base.exists() else Presentation()
+    _remove_slides(prs)
+
+    width_in, height_in = config.PPTConfig.SLIDE_DIMENSIONS
+    prs.slide_width = Inches(width_in)
+    prs.slide_height = Inches(height_in)
+
+    master = prs.slide_master
+    master.background.fill.solid()
+    master.background.fill.fore_color.rgb = theme['bg']
+    _apply_theme_fonts(prs, theme['font'])
+
+    kinds = layout_names()
+    layouts = list(prs.slide_layouts)
+    if len(layouts) < len(kinds):
+        raise RuntimeError(f"Base template {base} needs at least {len(kinds)} layouts")
+
+    # Repurpose the first layouts and drop the rest
+    for layout in layouts[len(kinds):]:
+        prs.slide_layouts.remove(layout)
+
+    for layout, kind in zip(layouts, kinds):
+        cSld = layout._element.cSld
+        cSld.set('name', kind)
+        if cSld.bg is not None:
+            cSld.remove(cSld.bg)
+        spTree = cSld.spTree
+        for shape_elm in list(spTree.iterchildren())[2:]:  # keep nvGrpSpPr and grpSpPr
+            spTree.remove(shape_elm)
+
+        scratch = prs.slides.add_slide(layout)
+        _draw_layout_shapes(scratch, prs, theme, kind)
+        for shape_elm in list(scratch.shapes._spTree.iterchildren())[2:]:
+            spTree.append(copy.deepcopy(shape_elm))
+        _remove_slides(prs)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+    prs.save(str(tmp_path))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def theme_template_path(style: str) -> Path:
+    """Path of the cached template for a theme, building it on first use."""
+    path = config.PPTConfig.PATHS['themes'] / f"theme_{style}_{_theme_hash(style)}.pptx"
+    if not path.exists():
+        build_theme_template(style, path)
+    return path
+
+
+@lru_cache(maxsize=8)
+def _template_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def load_theme_presentation(style: str):
+    """A fresh Presentation built on the cached theme template."""
+    return Presentation(io.BytesIO(_template_bytes(str(theme_template_path(style)))))
+
+
+def set_background_image(slide, image_path: str) -> bool:
+    """
+    Use an image as the slide's own background fill, centre-cropped to the slide.
+    Layout shapes (e.g. the scrim) render above it, so no extra shapes are needed.
+    """
+    if not image_path or not os.path.exists(image_path):
+        print(f"Background image file not found: {image_path}")
+        return False
+
+    try:
+        image_part, rId = slide.part.get_or_add_image_part(image_path)
+        img_w, img_h = image_part.image.size
+        prs_part = slide.part.package.presentation_part
+        slide_ratio = prs_part.presentation.slide_width / prs_part.presentation.slide_height
+        img_ratio = img_w / img_h if img_h else slide_ratio
+
+        # srcRect offsets are in thousandths of a percent from each edge
+        crop_x = int(max(0.0, 1 - slide_ratio / img_ratio) * 50000)
+        crop_y = int(max(0.0, 1 - img_ratio / slide_ratio) * 50000)
+
+        cSld = slide._element.cSld
+        if cSld.bg is not None:
+            cSld.remove(cSld.bg)
+        cSld.insert(0, parse_xml(
+            f'<p:bg {nsdecls("p", "a", "r")}><p:bgPr>'
+            f'<a:blipFill dpi="0" rotWithShape="1"><a:blip r:embed="{rId}"/>'
+            f'<a:srcRect l="{crop_x}" t="{crop_y}" r="{crop_x}" b="{crop_y}"/>'
+            f'<a:stretch><a:fillRect/></a:stretch></a:blipFill>'
+            f'<a:effectLst/></p:bgPr></p:bg>'
+        ))
+        return True
+    except Exception as e:
+        print(f"Failed to set background image: {e}")
+        return False
@@ -11,69 +11,141 @@ import math
 import json
 import logging
 import hashlib
+import threading
 import base64
 import io
 from PIL import Image
 import requests
 from dotenv import load_dotenv
 #import openai  # For future use
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import matplotlib.pyplot as plt
+from .text_fit import fit_paragraphs, fit_sentences, fit_text
+from .text_analysis import analyze_slide
+from .chart_engine import add_chart, extract_chart
+from .theme_engine import (get_theme, layout_names, load_theme_presentation, photo_layout_name,
+                           set_background_image, LAYOUT_TITLE, LAYOUT_TOC, LAYOUT_DIAGRAM)
+from .image_engine import get_image_metadata
+from .package_optimizer import compress_media, media_bytes
+from .memory_budget import DeckMemory
+from .deadline import stage_allowed
+from .workspace import output_dir, touch
+from .metrics import cache_lookup, stage_timer
+
+# Text colours chosen by background legibility analysis
+LEGIBLE_TEXT_COLORS = {'light': RGBColor(255, 255, 255), 'dark': RGBColor(30, 30, 30)}
 
 log = logging.getLogger(__name__)
 
-def create_presentation(enriched_slides: list, topic: str, style: str = 'dark', slides: int = 6) -> str:
-    print("-> Drawing presentation from scratch...")
-    prs = Presentation()
-    prs.slide_width = Inches(16)
-    prs.slide_height = Inches(9)
-    blank_layout = prs.slide_layouts[slides]
+# Words that suggest ordered steps, so body points are numbered instead of bulleted
+SEQUENCE_KEYWORDS = {'step', 'steps', 'first', 'second', 'then', 'next', 'finally', 'process', 'method'}
+
+def new_deck(style: str, use_theme_template: bool) -> Tuple[Presentation, dict, dict]:
+    """An empty deck with its theme and the layout to use for each generated layout name."""
+    theme = get_theme(style)
+    theme['templated'] = use_theme_template
     
-    # Enhanced theme configuration
-    themes = {
-        'dark': {
-            'font': 'Calibri',
-            'text': RGBColor(255, 255, 255),
-            'subtext': RGBColor(200, 200, 200),
-            'bg': RGBColor(45, 52, 54),
-            'accent': RGBColor(52, 152, 219),
-            'secondary': RGBColor(44, 62, 80)
-        },
-        'light': {
-            'font': 'Calibri',
-            'text': RGBColor(30, 30, 30),
-            'subtext': RGBColor(80, 80, 80),
-            'bg': RGBColor(248, 249, 250),
-            'accent': RGBColor(41, 128, 185),
-            'secondary': RGBColor(52, 73, 94)
-        }
-    }
-    theme = themes.get(style, themes[style])
-
-    # Add title slide
-    slide = prs.slides.add_slide(blank_layout)
-    _draw_title_slide(slide, prs, {'slide_title': topic}, theme, topic)
-
-    # Add table of contents
-    slide = prs.slides.add_slide(blank_layout)
-    _draw_toc_slide(slide, prs, enriched_slides, theme)
-
-    # Add content slides
-    for i, slide_data in enumerate(enriched_slides):
-        slide = prs.slides.add_slide(blank_layout)
-        layout = slide_data.get('layout', 'Photo Layout')
-        
-        if "Diagram" in layout and slide_data.get('image_path'):
-            _draw_diagram_slide(slide, prs, slide_data, theme)
-        else:
-            _draw_photo_slide(slide, prs, slide_data, theme)
+    if use_theme_template:
+        # Backgrounds, header bars, scrims and fonts come from the cached theme master
+        prs = load_theme_presentation(style)
+        layouts = {name: prs.slide_layouts.get_by_name(name) for name in layout_names()}
+    else:
+        prs = Presentation()
+        prs.slide_width = Inches(16)
+        prs.slide_height = Inches(9)
+        blank_layout = prs.slide_layouts[6]  # 'Blank' in the default template
+        layouts = dict.fromkeys(layout_names(), blank_layout)
+    return prs, layouts, theme
 
+def add_content_slide(prs, layouts: dict, slide_data: dict, theme: dict):
+    """Add and draw one outline slide, picking its layout from the slide data."""
+    layout = slide_data.get('layout', 'Photo Layout')
+    
+    if "Diagram" in layout and (slide_data.get('image_path') or extract_chart(slide_data)):
+        slide = prs.slides.add_slide(layouts[LAYOUT_DIAGRAM])
+        _draw_diagram_slide(slide, prs, slide_data, theme)
+    else:
+        # Scrim opacity and text colour adapt to the background's brightness
+        legibility = _background_legibility(slide_data.get('image_path'))
+        slide_theme = dict(theme, overlay_alpha=legibility.get('overlay_alpha'))
+        if legibility.get('text_color') in LEGIBLE_TEXT_COLORS:
+            slide_theme['text'] = LEGIBLE_TEXT_COLORS[legibility['text_color']]
+        slide = prs.slides.add_slide(layouts[photo_layout_name(slide_theme['overlay_alpha'])])
+        _draw_photo_slide(slide, prs, slide_data, slide_theme)
+    return slide
+
+def create_presentation(enriched_slides: list, topic: str, style: str = 'dark', slides: int = 6,
+                        use_theme_template: Optional[bool] = None,
+                        on_slide: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Draw, compress and save the deck. on_slide(done, total) is called as content
+    slides are added (once at the end for a sharded deck).
+    """
+    on_slide = on_slide or (lambda done, total: None)
+    if use_theme_template is None:
+        use_theme_template = config.PPTConfig.THEME_TEMPLATES['enabled']
+    
+    if use_theme_template:
+        print("-> Drawing presentation on the theme template...")
+    else:
+        print("-> Drawing presentation from scratch...")
     safe_topic = re.sub(r'[\\/*?:"<>|]', "", topic).replace(" ", "_")
-    output_filename = config.PPTConfig.PATHS['output'] / f"{safe_topic}_{style}_presentation.pptx"
-    prs.save(output_filename)
+    output_filename = output_dir() / f"{safe_topic}_{style}_presentation.pptx"
+
+    # Media is spilled to disk as the deck grows if it goes over the memory budget
+    with DeckMemory() as memory:
+        prs, layouts, theme = new_deck(style, use_theme_template)
+
+        with stage_timer('draw_title_toc'):
+            # Add title slide
+            slide = prs.slides.add_slide(layouts[LAYOUT_TITLE])
+            _draw_title_slide(slide, prs, {'slide_title': topic}, theme, topic)
+
+            # Add table of contents
+            slide = prs.slides.add_slide(layouts[LAYOUT_TOC])
+            _draw_toc_slide(slide, prs, enriched_slides, theme)
+        memory.checkpoint(prs)
+
+        # Add content slides, in worker processes for very large decks
+        from .deck_assembly import add_slides_sharded, should_shard
+        total = len(enriched_slides)
+        on_slide(0, total)
+        sharded = should_shard(total)
+        if sharded:
+            with stage_timer('draw_slides_sharded'):
+                add_slides_sharded(prs, layouts, enriched_slides, style, use_theme_template, memory)
+        else:
+            for done, slide_data in enumerate(enriched_slides, 1):
+                with stage_timer('draw_slide'):
+                    add_content_slide(prs, layouts, slide_data, theme)
+                memory.checkpoint(prs)
+                on_slide(done, total)
+
+        budget = config.PPTConfig.OUTPUT_BUDGET
+        # Shards already sized their media to its placement; only step down further if over budget
+        if budget['enabled'] and (not sharded or media_bytes(prs) > budget['target_mb'] * 1024 * 1024):
+            # Size every picture to its placement before the single save
+            with stage_timer('compress_media'):
+                compress_media(prs)
+            memory.checkpoint(prs)
+        # Saved under a private name and swapped in whole, so a concurrent run of
+        # the same topic never leaves a half-written deck behind
+        tmp_filename = output_filename.with_name(f"{output_filename.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with stage_timer('save'):
+            prs.save(tmp_filename)
+        os.replace(tmp_filename, output_filename)
+        memory.checkpoint()
+    on_slide(total, total)
+    print(memory.report())
     print(f"-> Majestic presentation saved: {output_filename}")
     return str(output_filename)
 
+def _background_legibility(image_path: Optional[str]) -> dict:
+    """Overlay/text colour analysis stored with the cached background, if any."""
+    if not image_path:
+        return {}
+    return get_image_metadata(image_path).get('legibility') or {}
+
 def _add_image_as_background(slide, prs, image_path, overlay_alpha=0.2):
     """
     Adds an image as a slide background and places a semi-transparent
@@ -224,24 +296,27 @@ def _add_image_as_background(slide, prs, image_path, overlay_alpha=0.2):
 def _draw_title_slide(slide, prs, slide_data, theme, topic):
     #_add_image_as_background(slide, prs, slide_data.get('image_path'), overlay_alpha=0.3)
     
-    # Add a subtle gradient overlay
-    overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, prs.slide_height)
-    fill = overlay.fill
-    fill.gradient()
-    fill.gradient_stops[0].position = 0
-    fill.gradient_stops[0].color.rgb = RGBColor(0, 0, 0)
-    fill.gradient_stops[0].color.brightness = 0.4
-    fill.gradient_stops[1].position = 1
-    fill.gradient_stops[1].color.rgb = RGBColor(0, 0, 0)
-    fill.gradient_stops[1].color.brightness = 0.2
-    overlay.line.fill.background()
+    # Add a subtle gradient overlay (part of the layout in template mode)
+    if not theme.get('templated'):
+        overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, prs.slide_height)
+        fill = overlay.fill
+        fill.gradient()
+        fill.gradient_stops[0].position = 0
+        fill.gradient_stops[0].color.rgb = RGBColor(0, 0, 0)
+        fill.gradient_stops[0].color.brightness = 0.4
+        fill.gradient_stops[1].position = 1
+        fill.gradient_stops[1].color.rgb = RGBColor(0, 0, 0)
+        fill.gradient_stops[1].color.brightness = 0.2
+        overlay.line.fill.background()
     
     # Title text (larger, more prominent)
     tx_box = slide.shapes.add_textbox(Inches(1), Inches(3), Inches(14), Inches(3))
+    tx_box.text_frame.word_wrap = True
+    title_fit = fit_text(topic, theme['font'], tx_box.width, tx_box.height, 80, 40, bold=True)
     p = tx_box.text_frame.paragraphs[0]
     p.text = topic
     p.font.name = theme['font']
-    p.font.size = Pt(80)
+    p.font.size = title_fit.size
     p.font.bold = True
     p.font.color.rgb = theme['text']
     p.alignment = PP_ALIGN.CENTER
@@ -260,12 +335,13 @@ def _draw_toc_slide(slide, prs, slides, theme):
     #if slides and slides[0].get('image_path'):
         #_add_image_as_background(slide, prs, slides[0]['image_path'])
     
-    # Add semi-transparent overlay for better readability
-    overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, prs.slide_height)
-    overlay.fill.solid()
-    overlay.fill.fore_color.rgb = theme['bg']
-    overlay.fill.fore_color.brightness = 0.8
-    overlay.line.fill.background()
+    # Add semi-transparent overlay for better readability (part of the layout in template mode)
+    if not theme.get('templated'):
+        overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, prs.slide_height)
+        overlay.fill.solid()
+        overlay.fill.fore_color.rgb = theme['bg']
+        overlay.fill.fore_color.brightness = 0.8
+        overlay.line.fill.background()
     
     # Title
     title_box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(14), Inches(1))
@@ -280,17 +356,33 @@ def _draw_toc_slide(slide, prs, slides, theme):
     # Content
     content_box = slide.shapes.add_textbox(Inches(2), Inches(2.5), Inches(12), Inches(5))
     content_frame = content_box.text_frame
+    content_frame.word_wrap = True
     
-    for i, slide_data in enumerate(slides, 1):
+    entries = [f"{i}. {slide_data['slide_title']}" for i, slide_data in enumerate(slides, 1)]
+    toc_fit = fit_paragraphs([''] + entries, theme['font'], content_box.width, content_box.height,
+                             24, 12, space_after=12)
+    
+    for entry in entries:
         p = content_frame.add_paragraph()
-        p.text = f"{i}. {slide_data['slide_title']}"
+        p.text = entry
         p.font.name = theme['font']
-        p.font.size = Pt(24)
+        p.font.size = toc_fit.size
         p.font.color.rgb = theme['text']
         p.space_after = Pt(12)
 
 def _draw_photo_slide(slide, prs, slide_data, theme):
-    _add_image_as_background(slide, prs, slide_data.get('image_path'))
+    if theme.get('templated'):
+        # The layout already carries the scrim; only the image itself is per-slide
+        if slide_data.get('image_path'):
+            set_background_image(slide, slide_data['image_path'])
+    elif slide_data.get('image_path'):
+        overlay_alpha = theme.get('overlay_alpha')
+        _add_image_as_background(slide, prs, slide_data.get('image_path'),
+                                 overlay_alpha=0.2 if overlay_alpha is None else overlay_alpha)
+    else:
+        # No photo (e.g. skipped to meet the deadline): plain theme background
+        slide.background.fill.solid()
+        slide.background.fill.fore_color.rgb = theme['bg']
     
     # Add a subtle gradient overlay for better text readability
     # overlay = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, prs.slide_height)
@@ -337,19 +429,21 @@ def _draw_photo_slide(slide, prs, slide_data, theme):
     # Title text (larger, more prominent)
     tx_box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(14), Inches(2))
     tx_frame = tx_box.text_frame
+    tx_frame.word_wrap = True
     
     title_text = slide_data.get('slide_title', '')
-    add_formatted_text(tx_frame.paragraphs[0], title_text, Pt(54), is_title=True)
+    title_fit = fit_text(title_text.replace('*', ''), theme['font'], tx_box.width, tx_box.height, 54, 32, bold=True)
+    add_formatted_text(tx_frame.paragraphs[0], title_text, title_fit.size, is_title=True)
     
-    # Body text (single line, minimal)
+    # Body text (minimal: as many leading key points as fit the strip)
     body_box = slide.shapes.add_textbox(Inches(1), Inches(7), Inches(14), Inches(1))
     body_frame = body_box.text_frame
+    body_frame.word_wrap = True
     
-    # Take only the first key point and make it a one-liner
-    body_text = slide_data.get('slide_body', '')
-    key_points = [point.strip() for point in body_text.split('.') if point.strip()]
+    key_points = analyze_slide(slide_data).points
     if key_points:
-        add_formatted_text(body_frame.paragraphs[0], key_points[0], Pt(32))
+        placed_text, body_fit = fit_sentences(key_points, theme['font'], body_box.width, body_box.height, 32, 20)
+        add_formatted_text(body_frame.paragraphs[0], placed_text, body_fit.size)
     
     # Add supporting images if available
     supporting_images = slide_data.get('supporting_images', [])
@@ -391,6 +485,17 @@ def _draw_photo_slide(slide, prs, slide_data, theme):
                 left = Inches(0.75 + (img_width + img_gap) * col)
                 slide.shapes.add_picture(img_path, left, img_top, width=img_width, height=img_height)
 
+    # Statistics in the body are drawn as a native chart instead of a rendered diagram
+    diagram_width, diagram_height = (Inches(side) for side in config.PPTConfig.DIAGRAMS['size'])
+    diagram_left = Inches(10)
+    diagram_top = Inches(2.5)
+    chart = extract_chart(slide_data)
+    if chart:
+        slide_data['chart'] = chart.kind
+        with stage_timer('draw_chart'):
+            add_chart(slide, chart, diagram_left, diagram_top, diagram_width, diagram_height, theme)
+        return
+
     # Generate and add diagram
     diagram_type = _determine_diagram_type(slide_data)
     
@@ -400,41 +505,49 @@ def _draw_photo_slide(slide, prs, slide_data, theme):
         diagram_path = _generate_diagram(slide_data, diagram_type)
 
     if diagram_path and os.path.exists(diagram_path):
-        # Add diagram in the remaining space
-        diagram_width = Inches(4)
-        diagram_height = Inches(3)
-        diagram_left = Inches(10)
-        diagram_top = Inches(2.5)
+        slide_data['diagram_path'] = diagram_path
+        
+        # Add diagram in the remaining space, at the size it was rendered for
         slide.shapes.add_picture(diagram_path, diagram_left, diagram_top, width=diagram_width, height=diagram_height)
 
 def _draw_diagram_slide(slide, prs, slide_data, theme):
     # Add a relevant background image
-    if slide_data.get('background_image'):
-        _add_image_as_background(slide, prs, slide_data['background_image'])
+    if theme.get('templated'):
+        # Solid background and header bar come from the layout
+        if slide_data.get('background_image'):
+            set_background_image(slide, slide_data['background_image'])
     else:
-        slide.background.fill.solid()
-        slide.background.fill.fore_color.rgb = theme['bg']
-    
-    # Add decorative header
-    header = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, Inches(1.5))
-    header.fill.solid()
-    header.fill.fore_color.rgb = theme['accent']
-    header.line.fill.background()
+        if slide_data.get('background_image'):
+            _add_image_as_background(slide, prs, slide_data['background_image'])
+        else:
+            slide.background.fill.solid()
+            slide.background.fill.fore_color.rgb = theme['bg']
+        
+        # Add decorative header
+        header = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, prs.slide_width, Inches(1.5))
+        header.fill.solid()
+        header.fill.fore_color.rgb = theme['accent']
+        header.line.fill.background()
     
     # Title
     tx_box = slide.shapes.add_textbox(Inches(0.75), Inches(0.25), Inches(7), Inches(1))
     tx_frame = tx_box.text_frame
+    tx_frame.word_wrap = True
+    title_fit = fit_text(slide_data.get('slide_title', ''), theme['font'], tx_box.width, tx_box.height, 40, 24, bold=True)
     p = tx_frame.paragraphs[0]
     p.text = slide_data.get('slide_title', '')
     p.font.name = theme['font']
-    p.font.size = Pt(40)
+    p.font.size = title_fit.size
     p.font.bold = True
     p.font.color.rgb = theme['text']
     
     # Content with automatic formatting and markdown bold handling
     content_box = slide.shapes.add_textbox(Inches(0.75), Inches(2), Inches(7), Inches(6))
     content_frame = content_box.text_frame
+    content_frame.word_wrap = True
     content_text = slide_data.get('slide_body', '')
+    analysis = analyze_slide(slide_data)
+    body_size = Pt(22)
     
     # Function to add text with markdown bold formatting
     def add_formatted_text(paragraph, text):
@@ -452,7 +565,7 @@ def _draw_diagram_slide(slide, prs, slide_data, theme):
                 # First part goes to the main paragraph
                 paragraph.text = part
                 paragraph.font.name = theme['font']
-                paragraph.font.size = Pt(22)
+                paragraph.font.size = body_size
                 paragraph.font.color.rgb = theme['subtext']
                 paragraph.line_spacing = 1.3
             else:
@@ -460,47 +573,34 @@ def _draw_diagram_slide(slide, prs, slide_data, theme):
                 run = paragraph.add_run()
                 run.text = part
                 run.font.name = theme['font']
-                run.font.size = Pt(22)
+                run.font.size = body_size
                 run.font.color.rgb = theme['subtext']
                 
                 # Make bold if it's an odd index (text between asterisks)
                 if i % 2 == 1:
                     run.font.bold = True
     
-    # Check if content is already formatted with numbers or bullets
-    def is_already_formatted(text):
-        lines = text.strip().split('\n')
-        if len(lines) <= 1:
-            return False
-        
-        # Check for numbered format (1., 2., etc.)
-        numbered_pattern = re.compile(r'^\s*\d+\.\s+')
-        # Check for bullet format (•, -, *, etc.)
-        bullet_pattern = re.compile(r'^\s*[•\-\*]\s+')
-        
-        formatted_lines = 0
-        for line in lines:
-            if numbered_pattern.match(line) or bullet_pattern.match(line):
-                formatted_lines += 1
-        
-        # If more than half the lines are formatted, consider it already formatted
-        return formatted_lines > len(lines) / 2
-    
-    if is_already_formatted(content_text):
+    if analysis.is_list:
         # Content is already formatted, use as is but handle markdown bold
+        body_size = fit_paragraphs(content_text.replace('*', '').split('\n'), theme['font'],
+                                   content_box.width, content_box.height, 22, 14, line_spacing=1.3).size
         add_formatted_text(content_frame.paragraphs[0], content_text)
     else:
-        # Content needs formatting - split by periods and add numbering/bullets
-        sentences = [s.strip() for s in content_text.split('.') if s.strip()]
+        # Content needs formatting - one numbered/bulleted point per sentence
+        sentences = analysis.sentences
         
         # Determine if we should use numbers or bullets
         # Use numbers if there are sequential steps, bullets for general points
-        use_numbers = any(keyword in content_text.lower() for keyword in 
-                         ['step', 'first', 'second', 'then', 'next', 'finally', 'process', 'method'])
+        use_numbers = analysis.has_any(SEQUENCE_KEYWORDS)
         
         # Clear the default paragraph
         content_frame.clear()
         
+        formatted = [f"{i + 1}. {s}" if use_numbers else f"• {s}" for i, s in enumerate(sentences)]
+        body_size = fit_paragraphs([f.replace('*', '') for f in formatted], theme['font'],
+                                   content_box.width, content_box.height, 22, 14,
+                                   line_spacing=1.3, space_after=6).size
+        
         for i, sentence in enumerate(sentences):
             if i == 0:
                 p = content_frame.paragraphs[0]
@@ -511,8 +611,13 @@ def _draw_diagram_slide(slide, prs, slide_data, theme):
             add_formatted_text(p, formatted_sentence)
             p.space_after = Pt(6)  # Add some space between points
     
-    # Diagram
-    if slide_data.get('image_path'):
+    # Diagram: a native chart of the body's statistics, else the slide's image
+    chart = extract_chart(slide_data)
+    if chart:
+        slide_data['chart'] = chart.kind
+        with stage_timer('draw_chart'):
+            add_chart(slide, chart, Inches(8.25), Inches(2), Inches(7.25), Inches(6), theme)
+    elif slide_data.get('image_path'):
         img_height = Inches(6)
         img_top = Inches(2)
         if not os.path.exists(slide_data['image_path']):
@@ -520,26 +625,59 @@ def _draw_diagram_slide(slide, prs, slide_data, theme):
         else:
             slide.shapes.add_picture(slide_data['image_path'], Inches(8.25), img_top, height=img_height)
 
+def diagram_hash(slide_data: dict, diagram_type: str) -> str:
+    """Content hash of everything a generated diagram depends on."""
+    settings = config.PPTConfig.DIAGRAMS
+    key = [slide_data.get('slide_title', ''), slide_data.get('slide_body', ''), diagram_type,
+           list(settings['size']), settings['dpi']]
+    return hashlib.md5(json.dumps(key).encode()).hexdigest()
+
+def _new_diagram_figure():
+    """A figure exactly the size of the diagram's box on the slide, at the configured DPI."""
+    settings = config.PPTConfig.DIAGRAMS
+    fig, ax = plt.subplots(figsize=settings['size'], dpi=settings['dpi'])
+    ax.axis('off')
+    return fig, ax
+
+def _save_diagram(fig, output_path: str) -> str:
+    """
+    Render the figure once at its final size. No bbox_inches='tight', which would
+    change the aspect ratio and make add_picture stretch the diagram.
+    """
+    fig.subplots_adjust(left=0.02, right=0.98, bottom=0.02, top=0.98)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.png"
+    fig.savefig(tmp_path, dpi=config.PPTConfig.DIAGRAMS['dpi'], transparent=True)
+    plt.close(fig)
+    os.replace(tmp_path, output_path)
+    return output_path
+
 def _generate_diagram(slide_data: dict, diagram_type: str) -> Optional[str]:
-    """Generate a diagram based on slide content and type."""
+    """Generate a diagram based on slide content and type, reusing a cached render."""
     try:
-        # Ensure the output directory exists
-        diagrams_dir = "output/diagrams"
+        # Ensure the cache directory exists
+        diagrams_dir = config.PPTConfig.PATHS['diagrams']
         os.makedirs(diagrams_dir, exist_ok=True)
         
-        # Create a unique filename based on content
-        content_hash = hashlib.md5(json.dumps(slide_data).encode()).hexdigest()
-        diagram_path = os.path.join(diagrams_dir, f"{content_hash}.png")
+        # Create a unique filename based on the content the diagram is drawn from
+        diagram_path = os.path.join(diagrams_dir, f"{diagram_hash(slide_data, diagram_type)}.png")
+        if os.path.exists(diagram_path):
+            cache_lookup('diagrams', True)
+            touch(diagram_path)
+            return diagram_path
+        cache_lookup('diagrams', False)
+        if not stage_allowed('diagrams', slide_data):
+            return None
         
         # For now, use simple shapes to create diagrams
-        if diagram_type == "flow":
-            return _create_flow_diagram(slide_data, diagram_path)
-        elif diagram_type == "comparison":
-            return _create_comparison_diagram(slide_data, diagram_path)
-        elif diagram_type == "timeline":
-            return _create_timeline_diagram(slide_data, diagram_path)
-        else:
-            return _create_generic_diagram(slide_data, diagram_path)
+        with stage_timer('render_diagram'):
+            if diagram_type == "flow":
+                return _create_flow_diagram(slide_data, diagram_path)
+            elif diagram_type == "comparison":
+                return _create_comparison_diagram(slide_data, diagram_path)
+            elif diagram_type == "timeline":
+                return _create_timeline_diagram(slide_data, diagram_path)
+            else:
+                return _create_generic_diagram(slide_data, diagram_path)
     except Exception as e:
         logging.error(f"Error generating diagram: {str(e)}")
         return None
@@ -548,11 +686,10 @@ def _generate_diagram(slide_data: dict, diagram_type: str) -> Optional[str]:
 def _create_flow_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
     """Create a flow diagram using matplotlib and save as PNG."""
     try:
-        points = [p.strip() for p in slide_data.get('slide_body', '').split('.') if p.strip()]
+        points = list(analyze_slide(slide_data).plain_points)
         if not points:
             points = [slide_data.get('slide_title', 'Flow')]
-        fig, ax = plt.subplots(figsize=(6, 2))
-        ax.axis('off')
+        fig, ax = _new_diagram_figure()
         n = len(points)
         for i, point in enumerate(points[:5]):
             x = 1 + i * 2
@@ -564,10 +701,7 @@ def _create_flow_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
                 ax.arrow(x + 1.5, y + 0.3, 0.5, 0, head_width=0.15, head_length=0.2, fc='#0070C0', ec='#0070C0', zorder=1, length_includes_head=True)
         ax.set_xlim(0, 2 * max(3, n))
         ax.set_ylim(0, 2)
-        plt.tight_layout()
-        fig.savefig(output_path, bbox_inches='tight', transparent=True)
-        plt.close(fig)
-        return output_path
+        return _save_diagram(fig, output_path)
     except Exception as e:
         logging.error(f"Error creating flow diagram: {str(e)}")
         return None
@@ -575,11 +709,10 @@ def _create_flow_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
 def _create_comparison_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
     """Create a comparison diagram using matplotlib and save as PNG."""
     try:
-        points = [p.strip() for p in slide_data.get('slide_body', '').split('.') if p.strip()]
+        points = list(analyze_slide(slide_data).plain_points)
         if not points:
             points = [slide_data.get('slide_title', 'Comparison')]
-        fig, ax = plt.subplots(figsize=(6, 2))
-        ax.axis('off')
+        fig, ax = _new_diagram_figure()
         for i, point in enumerate(points[:4]):
             x = 1 + (i % 2) * 3
             y = 1.5 - (i // 2) * 1
@@ -588,10 +721,7 @@ def _create_comparison_diagram(slide_data: Dict, output_path: str) -> Optional[s
             ax.text(x + 1, y + 0.35, point[:40] + ('...' if len(point) > 40 else ''), color='white', ha='center', va='center', fontsize=10, zorder=3)
         ax.set_xlim(0, 6)
         ax.set_ylim(0, 2.5)
-        plt.tight_layout()
-        fig.savefig(output_path, bbox_inches='tight', transparent=True)
-        plt.close(fig)
-        return output_path
+        return _save_diagram(fig, output_path)
     except Exception as e:
         logging.error(f"Error creating comparison diagram: {str(e)}")
         return None
@@ -599,11 +729,10 @@ def _create_comparison_diagram(slide_data: Dict, output_path: str) -> Optional[s
 def _create_timeline_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
     """Create a timeline diagram using matplotlib and save as PNG."""
     try:
-        points = [p.strip() for p in slide_data.get('slide_body', '').split('.') if p.strip()]
+        points = list(analyze_slide(slide_data).plain_points)
         if not points:
             points = [slide_data.get('slide_title', 'Timeline')]
-        fig, ax = plt.subplots(figsize=(6, 2))
-        ax.axis('off')
+        fig, ax = _new_diagram_figure()
         n = len(points)
         ax.plot([1, 5], [1, 1], color='#0070C0', lw=3, zorder=1)
         for i, point in enumerate(points[:5]):
@@ -612,10 +741,7 @@ def _create_timeline_diagram(slide_data: Dict, output_path: str) -> Optional[str
             ax.text(x, 1.2, point[:30] + ('...' if len(point) > 30 else ''), ha='center', va='bottom', fontsize=9, zorder=3)
         ax.set_xlim(0, 6)
         ax.set_ylim(0.5, 2)
-        plt.tight_layout()
-        fig.savefig(output_path, bbox_inches='tight', transparent=True)
-        plt.close(fig)
-        return output_path
+        return _save_diagram(fig, output_path)
     except Exception as e:
         logging.error(f"Error creating timeline diagram: {str(e)}")
         return None
@@ -623,11 +749,10 @@ def _create_timeline_diagram(slide_data: Dict, output_path: str) -> Optional[str
 def _create_generic_diagram(slide_data: Dict, output_path: str) -> Optional[str]:
     """Create a generic diagram using matplotlib and save as PNG."""
     try:
-        points = [p.strip() for p in slide_data.get('slide_body', '').split('.') if p.strip()]
+        points = list(analyze_slide(slide_data).plain_points)
         if not points:
             points = [slide_data.get('slide_title', 'Concept')]
-        fig, ax = plt.subplots(figsize=(4, 4))
-        ax.axis('off')
+        fig, ax = _new_diagram_figure()
         # Central node
         ax.add_patch(plt.Circle((2, 2), 0.5, color='#0070C0', zorder=2))
         ax.text(2, 2, slide_data.get('slide_title', '')[:20] + ('...' if len(slide_data.get('slide_title', '')) > 20 else ''), color='white', ha='center', va='center', fontsize=11, zorder=3)
@@ -642,10 +767,8 @@ def _create_generic_diagram(slide_data: Dict, output_path: str) -> Optional[str]
             ax.plot([2, x], [2, y], color='#0070C0', lw=2, zorder=1)
         ax.set_xlim(0, 4)
         ax.set_ylim(0, 4)
-        plt.tight_layout()
-        fig.savefig(output_path, bbox_inches='tight', transparent=True)
-        plt.close(fig)
-        return output_path
+        ax.set_aspect('equal')  # Keep the hub a circle in the 4:3 box
+        return _save_diagram(fig, output_path)
     except Exception as e:
         logging.error(f"Error creating generic diagram: {str(e)}")
         return None
@@ -664,14 +787,13 @@ def _generate_diagram_with_openai(slide, slide_data: dict, diagram_type: str) ->
 
 def _determine_diagram_type(slide_data: dict) -> str:
     """Determine the most appropriate diagram type based on slide content."""
-    title = slide_data.get('slide_title', '').lower()
-    body = slide_data.get('slide_body', '').lower()
+    analysis = analyze_slide(slide_data)
     
-    if any(word in title or word in body for word in ['flow', 'process', 'steps', 'sequence']):
+    if analysis.has_any({'flow', 'process', 'steps', 'sequence'}):
         return 'flow'
-    elif any(word in title or word in body for word in ['compare', 'versus', 'vs', 'difference']):
+    elif analysis.has_any({'compare', 'versus', 'vs', 'difference'}):
         return 'comparison'
-    elif any(word in title or word in body for word in ['timeline', 'history', 'future', 'roadmap']):
+    elif analysis.has_any({'timeline', 'history', 'future', 'roadmap'}):
         return 'timeline'
     else:
         return 'generic'
\ No newline at end of file
@@ -0,0 +1,232 @@
+import atexit
+import contextvars
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+import config
+
+_current = contextvars.ContextVar('run_workspace', default=None)
+
+# Name of the marker that says which process owns a run directory
+_MARKER = 'run.json'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Workspace:
+    """
+    Private scratch space for one generation run, under WORKSPACE['root']/<run_id>.
+
+    Everything a run writes only for itself (raw downloads, intermediate files)
+    goes here, so concurrent runs never share or delete each other's files.
+    Shared caches (PATHS['images'], PATHS['diagrams'], ...) stay separate: they
+    are content-addressed, written atomically and only ever trimmed by the
+    garbage collector.
+
+    Entering the context makes it the current workspace for this thread (and
+    for threads started with a copy of its context); leaving it deletes the
+    directory. The finished deck goes to output_dir, by default its own
+    PATHS['output']/<run_id> directory, so runs for the same topic and style
+    never overwrite each other's deck or manifest.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, output_dir: Optional[Path] = None,
+                 keep: bool = False):
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.root = Path(config.PPTConfig.WORKSPACE['root']) / self.run_id
+        self.output_dir = Path(output_dir or Path(config.PPTConfig.PATHS['output']) / self.run_id)
+        self.keep = keep
+        self._token = None
+
+    def create(self) -> 'Workspace':
+        self.root.mkdir(parents=True, exist_ok=True)
+        marker = {'pid': os.getpid(), 'host': socket.gethostname(), 'started': time.time()}
+        (self.root / _MARKER).write_text(json.dumps(marker))
+        start_background_gc()
+        return self
+
+    def remove(self):
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        self.create()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        self.remove()
+        return False
+
+    def path(self, kind: str) -> Path:
+        """A subdirectory of the workspace for one kind of scratch file, e.g. 'images'."""
+        directory = self.root / kind
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+
+def current_workspace() -> Optional[Workspace]:
+    return _current.get()
+
+
+_default: Optional[Workspace] = None
+_default_lock = threading.Lock()
+
+
+def _default_workspace() -> Workspace:
+    """Workspace for code running outside any run (scripts, tests); removed at exit."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Workspace(run_id=f"process-{os.getpid()}-{uuid.uuid4().hex[:6]}").create()
+            atexit.register(_default.remove)
+        return _default
+
+
+def scratch_dir(kind: str) -> Path:
+    """This run's scratch directory for a kind of file."""
+    return (current_workspace() or _default_workspace()).path(kind)
+
+
+def output_dir() -> Path:
+    """Where this run's finished decks go; created on first use."""
+    workspace = current_workspace()
+    directory = workspace.output_dir if workspace else Path(config.PPTConfig.PATHS['output'])
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def touch(path: str):
+    """
+    Mark a cached file as in use, so the garbage collector leaves it alone for a
+    while. Only the access time is set, so the file still counts as unchanged.
+    """
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def _stale_runs(now: float) -> List[Path]:
+    """Run directories whose process is gone, or that are older than run_max_age_hours."""
+    settings = config.PPTConfig.WORKSPACE
+    root = Path(settings['root'])
+    if not root.is_dir():
+        return []
+    host = socket.gethostname()
+    stale = []
+    for run_dir in root.iterdir():
+        if not run_dir.is_dir():
+            continue
+        try:
+            marker = json.loads((run_dir / _MARKER).read_text())
+            started = marker['started']
+            owner_gone = marker['host'] == host and not _pid_alive(marker['pid'])
+        except (OSError, ValueError, KeyError):
+            # No marker yet: only a run being created this very moment, or debris
+            started, owner_gone = run_dir.stat().st_mtime, False
+            if now - started > 60:
+                owner_gone = True
+        if owner_gone or now - started > settings['run_max_age_hours'] * 3600:
+            stale.append(run_dir)
+    return stale
+
+
+def _cache_files(now: float) -> List[Tuple[float, int, Path]]:
+    """(last used, size, path) of evictable files in the shared caches, oldest first."""
+    settings = config.PPTConfig.WORKSPACE
+    grace = settings['cache_grace_minutes'] * 60
+    files = []
+    for name in settings['cache_dirs']:
+        directory = Path(config.PPTConfig.PATHS[name])
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            # Sidecars go with their image; temp files belong to a write in progress
+            if not path.is_file() or path.suffix == '.json' or path.name.endswith('.tmp'):
+                continue
+            stat = path.stat()
+            last_used = max(stat.st_atime, stat.st_mtime)
+            if now - last_used > grace:
+                files.append((last_used, stat.st_size, path))
+    return sorted(files)
+
+
+def collect_garbage(verbose: bool = True) -> dict:
+    """
+    Remove stale run workspaces, then trim the shared caches: files unused for
+    cache_max_age_days go first, then the least recently used until the caches
+    fit in cache_max_mb. Nothing used in the last cache_grace_minutes is removed.
+    """
+    settings = config.PPTConfig.WORKSPACE
+    now = time.time()
+
+    runs = _stale_runs(now)
+    for run_dir in runs:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    total = sum(_dir_size(Path(config.PPTConfig.PATHS[name])) for name in settings['cache_dirs']
+                if Path(config.PPTConfig.PATHS[name]).is_dir())
+    budget = settings['cache_max_mb'] * 1024 * 1024
+    max_age = settings['cache_max_age_days'] * 86400
+    evicted = freed = 0
+    for last_used, size, path in _cache_files(now):
+        if now - last_used <= max_age and total - freed <= budget:
+            break
+        for victim in (path, path.with_suffix('.json')):
+            try:
+                freed += victim.stat().st_size
+                victim.unlink()
+            except OSError:
+                pass
+        evicted += 1
+
+    if verbose and (runs or evicted):
+        print(f"-> Workspace GC: removed {len(runs)} stale run(s), evicted {evicted} cached file(s) "
+              f"({freed / 1024 / 1024:.1f} MB)")
+    return {'stale_runs': len(runs), 'evicted': evicted, 'freed_bytes': freed}
+
+
+_gc_thread: Optional[threading.Thread] = None
+_gc_lock = threading.Lock()
+
+
+def start_background_gc():
+    """Run collect_garbage now and every gc_interval_seconds in a daemon thread (once per process)."""
+    global _gc_thread
+    interval = config.PPTConfig.WORKSPACE['gc_interval_seconds']
+    if not interval:
+        return
+    with _gc_lock:
+        if _gc_thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    collect_garbage()
+                except Exception as e:
+                    print(f"Warning: Workspace GC failed: {e}")
+                time.sleep(interval)
+
+        _gc_thread = threading.Thread(target=loop, name='workspace-gc', daemon=True)
+        _gc_thread.start()
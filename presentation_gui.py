@@ -4,6 +4,9 @@ import sys
 from pathlib import Path
 import webbrowser
 import os
+import queue
+import threading
+import time
 
 # Add the project root to Python path
 project_root = Path.cwd()
@@ -11,83 +14,211 @@ if str(project_root) not in sys.path:
     sys.path.append(str(project_root))
 
 # Import the presentation generator
-from main import create_presentation
+from orchestration.pipeline import PROGRESS_STAGES, GenerationCancelled, generate_presentation
+
+# How often the Tk thread drains the worker's message queue
+POLL_MS = 100
+
+STAGE_LABELS = {
+    'outline': "Writing the outline",
+    'images': "Finding images",
+    'render': "Drawing slides",
+}
+
+
+class GenerationWorker(threading.Thread):
+    """
+    Runs the pipeline off the Tk thread, in its own run workspace (removed when
+    the run ends, even if cancelled). Everything it reports goes through a
+    queue of (kind, *payload) messages, since Tk may only be touched from the
+    thread running mainloop():
+
+        ('progress', stage, done, total)
+        ('done', output_path_or_None)
+        ('cancelled',)
+        ('error', message)
+    """
+
+    def __init__(self, topic: str, num_slides: int, style: str):
+        super().__init__(name='presentation-worker', daemon=True)
+        self.topic = topic
+        self.num_slides = num_slides
+        self.style = style
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            output_path = generate_presentation(
+                self.topic, self.num_slides, self.style,
+                progress=lambda stage, done, total: self.messages.put(('progress', stage, done, total)),
+                cancel_event=self.cancel_event,
+            )
+            self.messages.put(('done', output_path))
+        except GenerationCancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', str(e)))
+
+    def cancel(self):
+        self.cancel_event.set()
+
 
 class PresentationGeneratorGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Presentation Generator")
-        self.root.geometry("600x400")
-        
+        self.root.geometry("600x480")
+        self.worker = None
+        self.stage = None
+        self.stage_started = 0.0
+        self.stage_times = {}
+
         # Configure style
         style = ttk.Style()
         style.configure("TLabel", padding=5)
         style.configure("TButton", padding=5)
         style.configure("TEntry", padding=5)
-        
+
         # Create main frame
         main_frame = ttk.Frame(root, padding="20")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
+
         # Title
         title_label = ttk.Label(main_frame, text="Presentation Generator", font=("Helvetica", 16, "bold"))
         title_label.grid(row=0, column=0, columnspan=2, pady=20)
-        
+
         # Title input
         ttk.Label(main_frame, text="Presentation Title:").grid(row=1, column=0, sticky=tk.W, pady=5)
         self.title_var = tk.StringVar()
         title_entry = ttk.Entry(main_frame, textvariable=self.title_var, width=40)
         title_entry.grid(row=1, column=1, sticky=tk.W, pady=5)
-        
+
         # Number of slides
         ttk.Label(main_frame, text="Number of Slides:").grid(row=2, column=0, sticky=tk.W, pady=5)
         self.slides_var = tk.IntVar(value=6)
         slides_spinbox = ttk.Spinbox(main_frame, from_=3, to=10, textvariable=self.slides_var, width=5)
         slides_spinbox.grid(row=2, column=1, sticky=tk.W, pady=5)
-        
+
         # Style selection
         ttk.Label(main_frame, text="Style:").grid(row=3, column=0, sticky=tk.W, pady=5)
         self.style_var = tk.StringVar(value="dark")
         style_combo = ttk.Combobox(main_frame, textvariable=self.style_var, values=["dark", "light"], state="readonly", width=10)
         style_combo.grid(row=3, column=1, sticky=tk.W, pady=5)
-        
-        # Generate button
-        generate_button = ttk.Button(main_frame, text="Generate Presentation", command=self.generate_presentation)
-        generate_button.grid(row=4, column=0, columnspan=2, pady=20)
-        
+
+        # Generate and cancel buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=4, column=0, columnspan=2, pady=20)
+        self.generate_button = ttk.Button(button_frame, text="Generate Presentation", command=self.generate_presentation)
+        self.generate_button.grid(row=0, column=0, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_generation, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, padx=5)
+
+        # Per-stage progress
+        self.stage_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.stage_var).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+        self.progress = ttk.Progressbar(main_frame, mode='determinate', length=500)
+        self.progress.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+
         # Status label
         self.status_var = tk.StringVar()
         status_label = ttk.Label(main_frame, textvariable=self.status_var, wraplength=500)
-        status_label.grid(row=5, column=0, columnspan=2, pady=10)
-        
+        status_label.grid(row=7, column=0, columnspan=2, pady=10)
+
         # Configure grid weights
         main_frame.columnconfigure(1, weight=1)
-        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def generate_presentation(self):
         title = self.title_var.get().strip()
         if not title:
             messagebox.showerror("Error", "Please enter a presentation title")
             return
-        
+        if self.worker and self.worker.is_alive():
+            return
+
+        self.stage, self.stage_times = None, {}
+        self.progress.configure(value=0, maximum=1)
+        self.stage_var.set("")
+        self.status_var.set("Generating presentation...")
+        self.generate_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+
+        self.worker = GenerationWorker(title, self.slides_var.get(), self.style_var.get())
+        self.worker.start()
+        self.root.after(POLL_MS, self.poll_worker)
+
+    def cancel_generation(self):
+        if self.worker and self.worker.is_alive():
+            self.worker.cancel()
+            self.cancel_button.configure(state=tk.DISABLED)
+            # The worker stops at the next slide boundary; a request in flight finishes first
+            self.status_var.set("Cancelling after the current step...")
+
+    def poll_worker(self):
+        """Apply every message the worker has queued, then check again shortly."""
+        worker = self.worker
         try:
-            self.status_var.set("Generating presentation... Please wait.")
-            self.root.update()
-            
-            output_path = create_presentation(
-                title,
-                num_slides=self.slides_var.get(),
-                style=self.style_var.get()
-            )
-            
+            while True:
+                message = worker.messages.get_nowait()
+                if message[0] == 'progress':
+                    self.on_progress(*message[1:])
+                else:
+                    self.on_finished(message)
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(POLL_MS, self.poll_worker)
+
+    def on_progress(self, stage, done, total):
+        now = time.monotonic()
+        if stage != self.stage:
+            self.close_stage(now)
+            self.stage, self.stage_started = stage, now
+        elapsed = self.stage_times.get(stage, 0.0) + now - self.stage_started
+        step = PROGRESS_STAGES.index(stage) + 1
+        self.stage_var.set(f"Step {step}/{len(PROGRESS_STAGES)}: {STAGE_LABELS[stage]} "
+                           f"({done}/{total}, {elapsed:.0f}s)")
+        self.progress.configure(maximum=max(total, 1), value=done)
+
+    def close_stage(self, now):
+        if self.stage:
+            self.stage_times[self.stage] = self.stage_times.get(self.stage, 0.0) + now - self.stage_started
+
+    def timing_summary(self):
+        return ", ".join(f"{STAGE_LABELS[stage].lower()} {self.stage_times[stage]:.0f}s"
+                         for stage in PROGRESS_STAGES if stage in self.stage_times)
+
+    def on_finished(self, message):
+        self.close_stage(time.monotonic())
+        self.stage = None
+        self.generate_button.configure(state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.DISABLED)
+        kind = message[0]
+        timings = self.timing_summary()
+
+        if kind == 'done' and message[1]:
+            output_path = message[1]
+            self.stage_var.set(f"Time spent: {timings}")
             self.status_var.set(f"Presentation generated successfully!\nSaved to: {output_path}")
-            
             # Ask if user wants to open the presentation
             if messagebox.askyesno("Success", "Would you like to open the presentation?"):
-                webbrowser.open(f"file://{output_path}")
-                
-        except Exception as e:
-            self.status_var.set(f"Error generating presentation: {str(e)}")
-            messagebox.showerror("Error", f"Failed to generate presentation: {str(e)}")
+                webbrowser.open(Path(output_path).resolve().as_uri())
+        elif kind == 'cancelled':
+            self.progress.configure(value=0)
+            self.stage_var.set(f"Time spent before cancelling: {timings}" if timings else "")
+            self.status_var.set("Generation cancelled.")
+        else:
+            error = message[1] if kind == 'error' else "the outline could not be generated"
+            self.status_var.set(f"Error generating presentation: {error}")
+            messagebox.showerror("Error", f"Failed to generate presentation: {error}")
+
+    def on_close(self):
+        if self.worker and self.worker.is_alive():
+            if not messagebox.askyesno("Quit", "A presentation is still being generated. Cancel it and quit?"):
+                return
+            self.worker.cancel()
+        self.root.destroy()
 
 def main():
     root = tk.Tk()
@@ -95,4 +226,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,374 @@
+import argparse
+import hmac
+import json
+import os
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import config
+from orchestration.circuit_breaker import health_snapshot
+from orchestration.metrics import render_metrics
+from orchestration.pexels_quota import get_pexels_quota
+from orchestration.pipeline import GenerationCancelled, generate_presentation
+from orchestration.workspace import Workspace
+
+PPTX_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Bytes written per chunk when streaming a deck
+CHUNK_BYTES = 64 * 1024
+
+
+class Busy(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+class Job:
+    """One generation request and everything a client may ask about it."""
+
+    def __init__(self, topic: str, slides: int, style: str, use_outline_cache: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.topic = topic
+        self.slides = slides
+        self.style = style
+        self.use_outline_cache = use_outline_cache
+        self.status = 'queued'
+        self.progress = {'stage': None, 'done': 0, 'total': 0}
+        self.error = None
+        self.output_path: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    @property
+    def directory(self) -> Path:
+        return Path(config.PPTConfig.SERVER['jobs_dir']) / self.id
+
+    def to_dict(self) -> dict:
+        info = {'id': self.id, 'topic': self.topic, 'slides': self.slides, 'style': self.style,
+                'status': self.status, 'progress': self.progress, 'error': self.error,
+                'created': self.created, 'finished': self.finished}
+        if self.status == 'done':
+            info['download'] = f"/jobs/{self.id}/download"
+        return info
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed pool of workers (SERVER['max_concurrent']) with a
+    bounded queue (SERVER['max_queued']) behind it. Each job generates into its
+    own run workspace and output directory; finished decks are kept for
+    SERVER['result_ttl_seconds'] and then deleted.
+    """
+
+    def __init__(self):
+        settings = config.PPTConfig.SERVER
+        self.max_pending = settings['max_concurrent'] + settings['max_queued']
+        self.executor = ThreadPoolExecutor(max_workers=settings['max_concurrent'], thread_name_prefix='job')
+        self.jobs: Dict[str, Job] = {}
+        self.lock = threading.Lock()
+        self.draining = False
+        # Results of a previous process can no longer be asked for
+        shutil.rmtree(settings['jobs_dir'], ignore_errors=True)
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def submit(self, topic: str, slides: int, style: str, use_outline_cache: bool) -> Job:
+        job = Job(topic, slides, style, use_outline_cache)
+        with self.lock:
+            if self.draining:
+                raise Busy("the server is shutting down")
+            if self.pending() >= self.max_pending:
+                raise Busy(f"{self.max_pending} generations already running or queued")
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: Job):
+        if job.cancel_event.is_set():
+            self._finish(job, 'cancelled')
+            return
+        job.status = 'running'
+
+        def progress(stage, done, total):
+            job.progress = {'stage': stage, 'done': done, 'total': total}
+
+        try:
+            with Workspace(run_id=f"job-{job.id}", output_dir=job.directory):
+                job.output_path = generate_presentation(job.topic, job.slides, job.style,
+                                                        use_outline_cache=job.use_outline_cache,
+                                                        progress=progress, cancel_event=job.cancel_event)
+            if job.output_path:
+                self._finish(job, 'done')
+            else:
+                self._finish(job, 'failed', "the outline could not be generated")
+        except GenerationCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            print(f"Warning: Job {job.id} failed: {e}")
+            self._finish(job, 'failed', str(e))
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status, job.error, job.finished = status, error, time.time()
+        if status != 'done':
+            shutil.rmtree(job.directory, ignore_errors=True)
+        job.done_event.set()
+
+    def cancel(self, job: Job):
+        job.cancel_event.set()
+
+    def expire(self):
+        """Forget finished jobs older than result_ttl_seconds and delete their decks."""
+        cutoff = time.time() - config.PPTConfig.SERVER['result_ttl_seconds']
+        with self.lock:
+            expired = [job for job in self.jobs.values() if job.finished and job.finished < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def drain(self, timeout: float):
+        """Refuse new jobs, let running ones finish for up to timeout seconds, then cancel the rest."""
+        with self.lock:
+            self.draining = True
+            jobs = [job for job in self.jobs.values() if job.status in ('queued', 'running')]
+        deadline = time.monotonic() + timeout
+        for job in jobs:
+            if job.status == 'queued':
+                job.cancel_event.set()
+        for job in jobs:
+            if not job.done_event.wait(max(0.0, deadline - time.monotonic())):
+                print(f"   ... Cancelling job {job.id} ({job.topic}) for shutdown")
+                job.cancel_event.set()
+        self.executor.shutdown(wait=True)
+
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    """
+    POST   /generate              {"topic", "slides", "style", "use_outline_cache"}
+                                  202 with the job; ?wait=1 streams the .pptx instead
+    GET    /jobs/<id>             Job status and progress
+    GET    /jobs/<id>/download    The finished .pptx
+    DELETE /jobs/<id>             Cancel at the next slide boundary
+    GET    /health                Dependency breakers, Pexels quota and job counts
+    GET    /metrics               Prometheus metrics
+    """
+    server_version = 'PresentationGenerator/1.0'
+    manager: JobManager = None
+
+    # --- Responses ---
+
+    def _json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, headers: Optional[dict] = None):
+        self._json(status, {'error': message}, headers)
+
+    def _stream_deck(self, job: Job):
+        path = Path(job.output_path)
+        self.send_response(200)
+        self.send_header('Content-Type', PPTX_TYPE)
+        self.send_header('Content-Length', str(path.stat().st_size))
+        self.send_header('Content-Disposition', f'attachment; filename="{path.name}"')
+        self.send_header('X-Job-Id', job.id)
+        self.end_headers()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def _job_or_404(self, job_id: str) -> Optional[Job]:
+        job = self.manager.get(job_id)
+        if job is None:
+            self._error(404, f"no job {job_id}")
+        return job
+
+    # --- Requests ---
+
+    def _authorized(self) -> bool:
+        """With SERVER['token'] set, every request but /health needs 'Authorization: Bearer <token>'."""
+        token = config.PPTConfig.SERVER['token']
+        if not token or urlparse(self.path).path == '/health':
+            return True
+        if hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}"):
+            return True
+        self._error(401, "missing or wrong bearer token", {'WWW-Authenticate': 'Bearer'})
+        return False
+
+    def _read_request(self) -> Optional[dict]:
+        settings = config.PPTConfig.SERVER
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._error(400, "Content-Length must be a non-negative integer")
+            return None
+        if length > settings['max_body_bytes']:
+            self._error(413, f"request body over {settings['max_body_bytes']} bytes")
+            return None
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            self._error(400, "body must be a JSON object")
+            return None
+        topic = str(request.get('topic') or '').strip()
+        slides = request.get('slides', 6)
+        style = request.get('style', 'dark')
+        low, high = settings['slides_range']
+        if not topic or len(topic) > settings['max_topic_length']:
+            self._error(400, f"topic must be 1-{settings['max_topic_length']} characters")
+        elif not isinstance(slides, int) or not low <= slides <= high:
+            self._error(400, f"slides must be an integer from {low} to {high}")
+        elif style not in ('dark', 'light'):
+            self._error(400, "style must be 'dark' or 'light'")
+        else:
+            return {'topic': topic, 'slides': slides, 'style': style,
+                    'use_outline_cache': bool(request.get('use_outline_cache', True))}
+        return None
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        if url.path != '/generate':
+            self._error(404, "not found")
+            return
+        request = self._read_request()
+        if request is None:
+            return
+        try:
+            job = self.manager.submit(**request)
+        except Busy as e:
+            self._error(503 if self.manager.draining else 429, str(e), {'Retry-After': '30'})
+            return
+        if parse_qs(url.query).get('wait', ['0'])[0] in ('1', 'true'):
+            job.done_event.wait()
+            if job.status == 'done':
+                self._stream_deck(job)
+            else:
+                self._json(500 if job.status == 'failed' else 409, job.to_dict())
+            return
+        self._json(202, job.to_dict(), {'Location': f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if parts == ['health']:
+            jobs = [job.status for job in list(self.manager.jobs.values())]
+            payload = {'status': 'draining' if self.manager.draining else 'ok',
+                       'dependencies': health_snapshot(), 'pexels_quota': get_pexels_quota().snapshot(),
+                       'jobs': {status: jobs.count(status) for status in set(jobs)}}
+            self._json(503 if self.manager.draining else 200, payload)
+        elif parts == ['metrics']:
+            body = render_metrics().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job_or_404(parts[1])
+            if job:
+                self._json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'download':
+            job = self._job_or_404(parts[1])
+            if job and job.status == 'done':
+                self._stream_deck(job)
+            elif job:
+                self._error(409, f"job is {job.status}")
+        else:
+            self._error(404, "not found")
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job_or_404(parts[1])
+            if job:
+                self.manager.cancel(job)
+                self._json(202, job.to_dict())
+        else:
+            self._error(404, "not found")
+
+    def log_message(self, format, *args):
+        print(f"   ... {self.address_string()} {format % args}")
+
+
+def serve(host: str, port: int):
+    settings = config.PPTConfig.SERVER
+    manager = JobManager()
+    GenerationHandler.manager = manager
+    httpd = ThreadingHTTPServer((host, port), GenerationHandler)
+    httpd.daemon_threads = True
+    stopping = threading.Event()
+
+    def janitor():
+        while not stopping.wait(60):
+            manager.expire()
+
+    def shutdown(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        print(f"\n-> Shutting down: finishing running jobs (up to {settings['drain_seconds']}s)...")
+
+        def stop():
+            # Health turns 503 at once so load balancers stop sending traffic
+            manager.drain(settings['drain_seconds'])
+            httpd.shutdown()
+        threading.Thread(target=stop, name='shutdown').start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    threading.Thread(target=janitor, name='job-janitor', daemon=True).start()
+    if not settings['token'] and host not in ('127.0.0.1', 'localhost', '::1'):
+        print(f"Warning: Listening on {host} without SERVER['token']: anyone who can reach the port "
+              f"can spend the Gemini and Pexels quota")
+    print(f"-> Generation service listening on http://{host}:{port} "
+          f"({settings['max_concurrent']} workers, {settings['max_queued']} queued)")
+    httpd.serve_forever()
+    httpd.server_close()
+    shutil.rmtree(settings['jobs_dir'], ignore_errors=True)
+    print("-> Generation service stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve presentation generation over HTTP')
+    parser.add_argument('--host', default=config.PPTConfig.SERVER['host'])
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT') or config.PPTConfig.SERVER['port']))
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
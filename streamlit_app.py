@@ -1,38 +1,16 @@
 import streamlit as st
 import os
-import shutil
-from pathlib import Path
 from dotenv import load_dotenv
-from orchestration.content_engine import generate_slide_outline, decide_slide_layout, generate_visual_keyword
-from orchestration.visual_engine import create_presentation
-from orchestration.image_engine import search_and_download_photo, get_supporting_images
+from orchestration.pipeline import generate_presentation
+from orchestration.metrics import start_metrics_server
+import config
 
 # Load environment variables
 load_dotenv()
 
-def cleanup_output_directories():
-    """Clean up all generated images and diagrams from output directories."""
-    try:
-        # Clean up images directory
-        images_dir = Path("output/images")
-        if images_dir.exists():
-            shutil.rmtree(images_dir)
-            st.info("Cleaned up images directory")
-            
-        # Clean up diagrams directory
-        diagrams_dir = Path("output/diagrams")
-        if diagrams_dir.exists():
-            shutil.rmtree(diagrams_dir)
-            st.info("Cleaned up diagrams directory")
-            
-        # Clean up cache directory
-        cache_dir = Path("output/cache")
-        if cache_dir.exists():
-            shutil.rmtree(cache_dir)
-            st.info("Cleaned up cache directory")
-            
-    except Exception as e:
-        st.warning(f"Warning: Error during cleanup: {str(e)}")
+# Scraped by Prometheus when METRICS['port'] is set (started once per process)
+if config.PPTConfig.METRICS['port']:
+    start_metrics_server()
 
 # Page configuration
 st.set_page_config(
@@ -77,66 +55,42 @@ if submitted:
     else:
         with st.spinner("🔄 Generating your presentation... This may take a few minutes."):
             try:
-                # Generate slide outline
-                st.info("🧠 Generating content outline...")
-                slides = generate_slide_outline(topic, num_slides)
-                
-                if not slides:
+                # The pipeline gives the run its own workspace, deadline and Pexels budget
+                messages = {
+                    'outline': "🧠 Generating content outline...",
+                    'images': "🎨 Processing slides and adding images...",
+                    'render': "📊 Creating PowerPoint presentation...",
+                }
+                status = st.empty()
+                bar = st.progress(0)
+                shown = []
+
+                def on_progress(stage, done, total):
+                    if stage not in shown:
+                        shown.append(stage)
+                        status.info(messages[stage])
+                    bar.progress(min(done / total, 1.0) if total else 0.0)
+
+                output_file = generate_presentation(topic, num_slides, style, progress=on_progress)
+                if not output_file:
                     st.error("❌ Failed to generate slide outline")
-                    st.stop()
-                
-                # Process slides
-                st.info("🎨 Processing slides and adding images...")
-                enriched_slides = []
-                
-                for i, slide_data in enumerate(slides):
-                    # Set layout
-                    if i == 0:
-                        slide_data['layout'] = "Title Layout"
-                    else:
-                        slide_data['layout'] = decide_slide_layout(slide_data)
-                    
-                    # Generate and download background image
-                    visual_keyword = generate_visual_keyword(slide_data['slide_title'], slide_data['slide_body'])
-                    if visual_keyword:
-                        image_path = search_and_download_photo(visual_keyword, is_background=True)
-                        if image_path:
-                            slide_data['image_path'] = image_path
-                    
-                    # Get supporting images for non-title slides
-                    if i > 0:
-                        supporting_images = get_supporting_images(slide_data)
-                        if supporting_images:
-                            slide_data['supporting_images'] = supporting_images
-                    
-                    enriched_slides.append(slide_data)
-                
-                # Create presentation
-                st.info("📊 Creating PowerPoint presentation...")
-                output_file = create_presentation(enriched_slides, topic, style, num_slides)
-                
-                # Success message
-                st.success("🎉 Presentation generated successfully!")
-                st.success(f"📁 File saved as: {output_file}")
-                
-                # Download button
-                if os.path.exists(output_file):
-                    with open(output_file, "rb") as file:
-                        st.download_button(
-                            label="⬇️ Download Presentation",
-                            data=file.read(),
-                            file_name=os.path.basename(output_file),
-                            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
-                        )
-                
-                # Clean up temporary files
-                st.info("🧹 Cleaning up temporary files...")
-                cleanup_output_directories()
-                
+                else:
+                    # Success message
+                    st.success("🎉 Presentation generated successfully!")
+                    st.success(f"📁 File saved as: {output_file}")
+
+                    # Download button
+                    if os.path.exists(output_file):
+                        with open(output_file, "rb") as file:
+                            st.download_button(
+                                label="⬇️ Download Presentation",
+                                data=file.read(),
+                                file_name=os.path.basename(output_file),
+                                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+                            )
+
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
-                # Clean up even if there's an error
-                cleanup_output_directories()
 
 # Footer
 st.markdown("---")
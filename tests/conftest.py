@@ -0,0 +1,27 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# config refuses to load without keys; nothing here calls the real services
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+os.environ.setdefault('PEXELS_API_KEY', 'test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+
+# The ad-hoc scripts in this directory need local images and run on import
+collect_ignore = ['pptx_image_test.py', 'test_background.py']
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    """Point every shared cache and the run workspaces at an empty temporary directory."""
+    for name in ('images', 'diagrams', 'outlines', 'plans', 'themes', 'output'):
+        monkeypatch.setitem(config.PPTConfig.PATHS, name, tmp_path / name)
+        (tmp_path / name).mkdir()
+    monkeypatch.setitem(config.PPTConfig.IMAGE_LIBRARY, 'dirs', [])
+    monkeypatch.setitem(config.PPTConfig.IMAGE_LIBRARY, 'index_path', tmp_path / "image_library.json")
+    monkeypatch.setitem(config.PPTConfig.WORKSPACE, 'root', tmp_path / "runs")
+    monkeypatch.setitem(config.PPTConfig.WARMING, 'request_log', tmp_path / "requests.jsonl")
+    return tmp_path
@@ -0,0 +1,63 @@
+import pytest
+from orchestration.chart_engine import BAR, LINE, PIE, extract_chart
+
+
+def chart(body: str):
+    return extract_chart({'slide_title': 'Results', 'slide_body': body})
+
+
+@pytest.mark.parametrize('body', [
+    "Step 1: plan. Step 2: build. Step 3: ship.",
+    "Version 2 and version 3 of Python are covered. Python 3.12 is current.",
+    "We have 3 pillars and 5 principles that guide 2 teams.",
+    "Call us at 555 1234 between 9 and 5.",
+    "5G and 4G networks cover 80% of cities.",
+    "Adoption grew 35% last year. Spending reached $2 billion in 2015.",
+    "No numbers on this slide at all.",
+])
+def test_no_chart_without_a_real_series(body):
+    assert chart(body) is None
+
+
+def test_missing_or_repeated_labels_give_no_chart():
+    assert chart("Costs rose 12%, 15% and 20%.") is None
+    assert chart("Sales grew 10% and sales grew 20%.") is None
+
+
+def test_counts_of_one_measured_thing_are_a_bar_chart():
+    spec = chart("Europe has 1,200 employees while Asia has 800 employees.")
+    assert spec.kind == BAR
+    assert spec.categories == ('Europe', 'Asia')
+    assert spec.values == (1200.0, 800.0)
+    assert spec.number_format == '#,##0'
+
+
+def test_values_tied_to_years_are_a_line_chart():
+    spec = chart("Revenue was $40 million in 2019 and $75 million in 2023.")
+    assert spec.kind == LINE
+    assert spec.categories == ('2019', '2023')
+    assert spec.values == (40.0, 75.0)
+    assert spec.number_format == '"$"#,##0"M"'
+
+
+def test_shares_adding_up_to_100_are_a_pie():
+    spec = chart("Cloud holds 60%, on-premise 30% and hybrid 10%.")
+    assert spec.kind == PIE
+    assert spec.categories == ('Cloud', 'On-premise', 'Hybrid')
+
+
+def test_labels_before_a_colon():
+    spec = chart("Retail: $40 million, Online: $55 million and Wholesale: $12 million.")
+    assert spec.categories == ('Retail', 'Online', 'Wholesale')
+
+
+def test_small_values_are_not_scaled():
+    spec = chart("Europe has 9 offices while Asia has 1,234 offices.")
+    assert spec.values == (9.0, 1234.0)
+    assert spec.number_format == '#,##0'
+
+
+def test_charts_can_be_disabled(monkeypatch):
+    import config
+    monkeypatch.setitem(config.PPTConfig.CHARTS, 'enabled', False)
+    assert chart("Cloud holds 60%, on-premise 30% and hybrid 10%.") is None
@@ -0,0 +1,138 @@
+import types
+import pytest
+import requests
+from orchestration import circuit_breaker
+from orchestration.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def make_breaker(**settings):
+    return CircuitBreaker('test', **{'window_seconds': 60, 'min_calls': 4, 'failure_rate': 0.5,
+                                     'slow_call_seconds': 10, 'slow_call_rate': 0.8,
+                                     'open_seconds': 30, 'half_open_probes': 1, **settings})
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def http_error(status):
+    def call():
+        response = requests.Response()
+        response.status_code = status
+        raise requests.HTTPError(response=response)
+    return call
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.allow()
+        breaker.record(False, 0.1)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate_and_fails_fast(clock):
+    breaker = make_breaker()
+    breaker.call(lambda: 'ok')
+    breaker.call(lambda: 'ok')
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+    called = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(called.append, 1)
+    assert not called
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.allow()
+        breaker.record(True, 12.0)
+    assert breaker.state == OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.allow()
+        breaker.record(False, 0.1)
+    clock.now += 61
+    breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['calls'] == 1
+
+
+def test_client_errors_do_not_count_but_429_does(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        with pytest.raises(requests.HTTPError):
+            breaker.call(http_error(404))
+    assert breaker.state == CLOSED
+    for _ in range(4):
+        with pytest.raises(requests.HTTPError):
+            breaker.call(http_error(429))
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through_then_closes(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 29
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # Only half_open_probes calls at a time while probing
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['calls'] == 0
+
+
+def test_failed_or_slow_probe_opens_again(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()
+    breaker.record(True, 11.0)
+    assert breaker.state == OPEN
+
+
+def test_breakers_are_configured_per_dependency(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    gemini = circuit_breaker.get_breaker('gemini')
+    assert gemini is circuit_breaker.get_breaker('gemini')
+    assert gemini.slow_call_seconds == 30
+    assert circuit_breaker.get_breaker('pexels_cdn').min_calls == 8
+    assert set(circuit_breaker.health_snapshot()) == {'gemini', 'pexels_cdn'}
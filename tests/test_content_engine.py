@@ -0,0 +1,59 @@
+import json
+import pytest
+from orchestration import content_engine
+
+
+def outline_slide(i):
+    return {'slide_title': f"Slide {i}", 'slide_body': f"Body {i}.", 'visual_focus': f"focus {i}",
+            'supporting_visuals': []}
+
+
+def broken_stream(slides):
+    """A stream that delivers these slides and then fails."""
+    def stream(prompt, timeout=None):
+        yield '[' + ','.join(json.dumps(slide) for slide in slides) + ','
+        raise ConnectionError("stream reset")
+    return stream
+
+
+def test_streamed_slides_are_handed_out_as_they_complete(monkeypatch):
+    text = json.dumps([outline_slide(1), outline_slide(2)])
+    monkeypatch.setattr(content_engine, 'gemini_chat_stream', lambda prompt, timeout=None: iter([text[:40], text[40:]]))
+    handed = []
+    slides = content_engine.generate_slide_outline("Remote Work", 2, on_slide=handed.append, use_cache=False)
+    assert handed == slides == [outline_slide(1), outline_slide(2)]
+
+
+def test_broken_stream_keeps_received_slides_and_asks_for_the_rest(monkeypatch):
+    prompts = []
+
+    def chat(prompt, timeout=None):
+        prompts.append(prompt)
+        return json.dumps([outline_slide(3), outline_slide(4), outline_slide(5)])
+
+    monkeypatch.setattr(content_engine, 'gemini_chat_stream', broken_stream([outline_slide(1), outline_slide(2)]))
+    monkeypatch.setattr(content_engine, 'gemini_chat', chat)
+    handed = []
+    slides = content_engine.generate_slide_outline("Remote Work", 4, on_slide=handed.append, use_cache=False)
+
+    assert slides == [outline_slide(i) for i in (1, 2, 3, 4)]
+    # Every slide is handed out once, so nothing is prefetched for slides that are dropped
+    assert handed == slides
+    assert "Return only the remaining 2 slides" in prompts[0] and '"Slide 2"' in prompts[0]
+
+
+def test_stream_failing_before_any_slide_asks_for_the_whole_outline(monkeypatch):
+    monkeypatch.setattr(content_engine, 'gemini_chat_stream', broken_stream([]))
+    monkeypatch.setattr(content_engine, 'gemini_chat',
+                        lambda prompt, timeout=None: json.dumps([outline_slide(1), outline_slide(2)]))
+    handed = []
+    slides = content_engine.generate_slide_outline("Remote Work", 2, on_slide=handed.append, use_cache=False)
+    assert slides == [outline_slide(1), outline_slide(2)]
+    assert handed == []
+
+
+def test_stream_failing_after_the_last_slide_needs_no_request(monkeypatch):
+    monkeypatch.setattr(content_engine, 'gemini_chat_stream', broken_stream([outline_slide(1), outline_slide(2)]))
+    monkeypatch.setattr(content_engine, 'gemini_chat', lambda prompt, timeout=None: pytest.fail("asked again"))
+    assert content_engine.generate_slide_outline("Remote Work", 2, on_slide=lambda slide: None,
+                                                 use_cache=False) == [outline_slide(1), outline_slide(2)]
@@ -0,0 +1,23 @@
+import config
+from pptx import Presentation
+from orchestration.deck_assembly import _worker_context
+from orchestration.fakes import FakeServices, offline_services
+from orchestration.pipeline import generate_presentation
+
+
+def test_workers_are_not_forked():
+    assert _worker_context().get_start_method() in ('forkserver', 'spawn')
+
+
+def test_sharded_deck_is_drawn_in_worker_processes(caches, monkeypatch, capsys):
+    monkeypatch.setitem(config.PPTConfig.DEADLINE, 'seconds', None)
+    for key, value in {'shard_threshold': 2, 'slides_per_shard': 2, 'max_workers': 2}.items():
+        monkeypatch.setitem(config.PPTConfig.ASSEMBLY, key, value)
+    with offline_services(FakeServices(time_scale=0, seed=1), pexels_keys=2):
+        deck = generate_presentation("Remote Work", 5, 'dark')
+
+    log = capsys.readouterr().out
+    assert "in 2 worker processes" in log and "Merged shard 2/2" in log
+    assert "failed" not in log
+    # Title, contents and five content slides
+    assert len(Presentation(deck).slides) == 7
@@ -0,0 +1,17 @@
+import json
+from orchestration.deck_manifest import build_manifest, load_manifest, save_manifest
+from orchestration.layout_engine import SlideLayout
+
+
+def slide(title, **resolved):
+    return {'slide_title': title, 'slide_body': 'Body.', 'visual_focus': 'office', 'supporting_visuals': [], **resolved}
+
+
+def test_layouts_are_stored_as_their_names_and_missing_ones_as_null(tmp_path):
+    slides = [slide('Intro', layout=SlideLayout.TITLE), slide('Plain', layout='Custom Layout'), slide('Unset')]
+    path = save_manifest(build_manifest('Remote Work', 'dark', slides, 'deck.pptx'), tmp_path / "deck.manifest.json")
+
+    layouts = [entry['layout'] for entry in load_manifest(path)['slides']]
+    assert layouts == [SlideLayout.TITLE.value, 'Custom Layout', None]
+    assert '"layout": null' in path.read_text()
+    assert json.loads(path.read_text())['slides'][2]['image_id'] is None
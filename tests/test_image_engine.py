@@ -0,0 +1,47 @@
+import time
+import pytest
+import config
+from orchestration import image_engine
+from orchestration.deadline import Deadline, current_deadline
+from orchestration.image_engine import DOT_DEFAULTS, _sized_dot_source, render_diagram_local
+
+
+def test_sizing_goes_inside_the_graph_after_its_statements():
+    source = _sized_dot_source('digraph G { a -> b }', (4, 3), 200)
+    assert source.startswith('digraph G {\n' + DOT_DEFAULTS)
+    assert source.endswith('a -> b \ngraph [size="4,3!", dpi="200"];\n}')
+
+
+@pytest.mark.parametrize('dot_code', ['', 'a -> b', 'not a graph'])
+def test_source_without_a_graph_body_is_not_rendered(caches, dot_code):
+    assert render_diagram_local(dot_code, 'Broken') is None
+
+
+PHOTOS = [{'id': i, 'width': 1920, 'height': 1080, 'src': {'small': f"https://images.example/{i}.jpg"}}
+          for i in range(4)]
+
+
+def test_previews_are_fetched_under_the_decks_deadline(monkeypatch):
+    seen = []
+    monkeypatch.setattr(image_engine, '_fetch_preview', lambda photo: seen.append(current_deadline()))
+    with Deadline(seconds=600) as deadline:
+        photo, score = image_engine._select_best_photo(PHOTOS, True, 'office')
+    assert seen == [deadline] * len(PHOTOS)
+    assert photo is PHOTOS[0] and score is None
+
+
+def test_out_of_time_takes_the_first_result_without_previews(monkeypatch):
+    monkeypatch.setattr(image_engine, '_fetch_preview', lambda photo: pytest.fail("preview fetched"))
+    with Deadline(seconds=600, expires_at=time.time() + 100) as deadline:
+        assert image_engine._select_best_photo(PHOTOS, True, 'office') == (PHOTOS[0], None)
+    assert deadline.degraded == [('image_scoring', 'office')]
+
+
+@pytest.mark.parametrize('is_background, per_page', [(True, 8), (False, 3)])
+def test_supporting_searches_score_fewer_candidates(caches, monkeypatch, is_background, per_page):
+    monkeypatch.setitem(config.PPTConfig.IMAGE_SCORING, 'candidates', 8)
+    monkeypatch.setitem(config.PPTConfig.IMAGE_SCORING, 'supporting_candidates', 3)
+    searches = []
+    monkeypatch.setattr(image_engine, '_pexels_search', lambda _, params: searches.append(params) or {'photos': []})
+    image_engine._search_and_download('office', is_background, caches / "images" / "office.jpg")
+    assert searches[0]['per_page'] == per_page
@@ -0,0 +1,128 @@
+import json
+from pathlib import Path
+import numpy as np
+import pytest
+from PIL import Image
+from orchestration.image_library import DUPLICATE_DISTANCE, ImageLibrary, dhash, hash_distance, keyword_tokens
+
+
+def picture(seed: int, size=(1920, 1080)) -> Image.Image:
+    """A smooth random picture, so resizing it keeps its hash."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize(size, Image.Resampling.BICUBIC)
+
+
+def save(directory, name, img, **sidecar):
+    path = directory / name
+    img.save(path, compress_level=1)  # Ignored for JPEG
+    if sidecar:
+        path.with_suffix('.json').write_text(json.dumps(sidecar))
+    return path
+
+
+@pytest.fixture
+def library_dir(tmp_path):
+    directory = tmp_path / "library"
+    directory.mkdir()
+    return directory
+
+
+def make_library(library_dir, tmp_path):
+    library = ImageLibrary(dirs=[library_dir], index_path=tmp_path / "index.json")
+    library.refresh(verbose=False)
+    return library
+
+
+def entries(library):
+    return {Path(path).name: entry for path, entry in library._entries.items()}
+
+
+def test_keyword_tokens_are_singular():
+    assert keyword_tokens('Modern Offices & Cities') == ['modern', 'office', 'city']
+
+
+def test_dhash_survives_resizing_and_recompression(tmp_path):
+    original = picture(1)
+    save(tmp_path, 'small.jpg', original.resize((800, 450)))
+    with Image.open(tmp_path / 'small.jpg') as recompressed:
+        assert hash_distance(dhash(original), dhash(recompressed)) <= DUPLICATE_DISTANCE
+    assert hash_distance(dhash(original), dhash(picture(2))) > DUPLICATE_DISTANCE
+
+
+def test_near_duplicates_link_to_the_first_picture(library_dir, tmp_path):
+    save(library_dir, 'a_office.png', picture(1))
+    save(library_dir, 'b_office_copy.jpg', picture(1).resize((1280, 720)))
+    save(library_dir, 'c_beach.png', picture(2))
+    library = make_library(library_dir, tmp_path)
+
+    indexed = entries(library)
+    assert indexed['b_office_copy.jpg']['duplicate_of'].endswith('a_office.png')
+    assert 'duplicate_of' not in indexed['a_office.png']
+    assert 'duplicate_of' not in indexed['c_beach.png']
+
+    # Removing the kept picture makes its copy the first of the group
+    (library_dir / 'a_office.png').unlink()
+    library.refresh(verbose=False)
+    assert 'duplicate_of' not in entries(library)['b_office_copy.jpg']
+
+
+def test_query_scores_keywords_from_sidecars_and_file_names(library_dir, tmp_path):
+    save(library_dir, 'img1.png', picture(1), keywords=['modern office'], tags=['desk'])
+    save(library_dir, 'sunny_beach.png', picture(2))
+    library = make_library(library_dir, tmp_path)
+
+    path, score = library.query('modern offices', is_background=True)
+    assert path.endswith('img1.png') and score == 1.0
+    assert library.query('sunny beach', is_background=True)[0].endswith('sunny_beach.png')
+    assert library.query('mountain lake', is_background=True) is None
+    # Half of the keyword is not enough by default, but is for a fallback
+    assert library.query('modern kitchen', is_background=True) is None
+    assert library.query('modern kitchen', is_background=True, min_score=0.34)[0].endswith('img1.png')
+
+
+def test_backgrounds_need_a_large_landscape_picture(library_dir, tmp_path):
+    save(library_dir, 'tall_tree.png', picture(1, (1080, 1920)))
+    save(library_dir, 'small_tree.png', picture(2, (900, 500)))
+    library = make_library(library_dir, tmp_path)
+    assert library.query('tree', is_background=True) is None
+    assert library.query('tree', is_background=False) is not None
+
+
+def test_refresh_only_reads_new_or_changed_images(library_dir, tmp_path):
+    save(library_dir, 'office.png', picture(1))
+    assert make_library(library_dir, tmp_path).refresh(verbose=False) == (0, 0)
+
+    save(library_dir, 'beach.png', picture(2))
+    library = ImageLibrary(dirs=[library_dir], index_path=tmp_path / "index.json")
+    assert library.refresh(verbose=False) == (1, 0)
+    (library_dir / 'office.png').unlink()
+    assert library.refresh(verbose=False) == (0, 1)
+    assert len(library) == 1
+
+
+def test_added_images_are_journaled_without_rewriting_the_index(library_dir, tmp_path):
+    save(library_dir, 'office.png', picture(1))
+    library = make_library(library_dir, tmp_path)
+    index_before = library.index_path.read_text()
+
+    library.add(str(save(library_dir, 'beach.png', picture(2))))
+    assert library.index_path.read_text() == index_before
+    assert len(library.journal_path.read_text().splitlines()) == 1
+    assert library.query('beach', is_background=True)[0].endswith('beach.png')
+    # Another process loading the library sees the journaled image
+    other = ImageLibrary(dirs=[library_dir], index_path=tmp_path / "index.json")
+    assert other.query('beach', is_background=True)[0].endswith('beach.png')
+
+
+def test_refresh_keeps_images_other_processes_added(library_dir, tmp_path):
+    first = make_library(library_dir, tmp_path)
+    second = ImageLibrary(dirs=[library_dir], index_path=tmp_path / "index.json")
+    len(second)  # Loaded before either adds anything
+    first.add(str(save(library_dir, 'office.png', picture(1))))
+    second.add(str(save(library_dir, 'beach.png', picture(2))))
+
+    assert second.refresh(verbose=False) == (0, 0)
+    assert not second.journal_path.exists()
+    saved = json.loads(second.index_path.read_text())['entries']
+    assert sorted(Path(entry['path']).name for entry in saved) == ['beach.png', 'office.png']
@@ -0,0 +1,87 @@
+import io
+import mmap
+import numpy as np
+import pytest
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+import config
+from orchestration import memory_budget
+from orchestration.memory_budget import DeckMemory
+
+MB = 1024 * 1024
+
+
+def deck_with_images(count: int) -> Presentation:
+    """A deck with `count` distinct, incompressible ~190 KB images."""
+    prs = Presentation()
+    rng = np.random.default_rng(count)
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)).save(buffer, 'PNG')
+        buffer.seek(0)
+        prs.slides.add_slide(prs.slide_layouts[6]).shapes.add_picture(buffer, Inches(1), Inches(1))
+    return prs
+
+
+def spilled(prs) -> bool:
+    return all(isinstance(part._blob, mmap.mmap) for part in memory_budget._image_parts(prs))
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Pretend process RSS, in MB."""
+    value = {'mb': 100}
+    monkeypatch.setattr(memory_budget, 'private_rss', lambda: value['mb'] * MB)
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'rss_budget_mb', 1024)
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'low_memory', None)
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'spill_dir', None)
+    return value
+
+
+def test_deck_spills_only_past_its_own_media_budget(rss, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'media_budget_mb', 0.5)
+    small, large = deck_with_images(1), deck_with_images(4)
+    with DeckMemory() as first, DeckMemory() as second:
+        first.checkpoint(small)
+        second.checkpoint(large)
+        assert not spilled(small) and spilled(large)
+        # The spilled media is still readable
+        assert len(large.slides) == 4 and large.save(io.BytesIO()) is None
+        assert "spilled to disk" in second.report()
+
+
+def test_over_the_process_guard_the_largest_deck_spills_first(rss, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'media_budget_mb', 64)
+    small, large = deck_with_images(1), deck_with_images(3)
+    with DeckMemory() as first, DeckMemory() as second:
+        first.checkpoint(small)
+        second.checkpoint(large)
+        rss['mb'] = 2048
+        first.checkpoint(small)
+        assert not spilled(small)
+        second.checkpoint(large)
+        assert spilled(large)
+        # Still over the guard: now the small deck holds the most
+        first.checkpoint(small)
+        assert spilled(small)
+        assert "over the guard" in first.report()
+
+
+def test_spill_files_are_removed_on_exit(rss, monkeypatch, tmp_path):
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'spill_dir', str(tmp_path))
+    prs = deck_with_images(1)
+    with DeckMemory(low_memory=True) as memory:
+        memory.checkpoint(prs)
+        assert spilled(prs) and any(tmp_path.iterdir())
+    assert not any(tmp_path.iterdir())
+    assert not memory_budget._active
+
+
+def test_never_spills_when_low_memory_is_off(rss, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.MEMORY, 'media_budget_mb', 0)
+    rss['mb'] = 4096
+    prs = deck_with_images(1)
+    with DeckMemory(low_memory=False) as memory:
+        memory.checkpoint(prs)
+    assert not spilled(prs) and memory.peak_media > 0
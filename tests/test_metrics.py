@@ -0,0 +1,100 @@
+from contextlib import nullcontext
+import pytest
+from orchestration.circuit_breaker import CircuitOpenError
+from orchestration.metrics import (DECKS, DECKS_IN_PROGRESS, EXTERNAL_CALLS, EXTERNAL_LATENCY, Counter, Histogram,
+                                   Registry, deck_run, external_call)
+from orchestration.pexels_quota import QuotaExceeded
+
+
+class Stop(BaseException):
+    """Stands in for GenerationCancelled."""
+
+
+def lines(metric):
+    return metric.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    histogram = Histogram('test_seconds', 'Test latency', ('op',), buckets=(1, 0.1, 10))
+    for value in (0.05, 0.5, 0.7, 20):
+        histogram.observe(value, op='a')
+    assert lines(histogram) == [
+        '# HELP test_seconds Test latency',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{op="a",le="0.1"} 1',
+        'test_seconds_bucket{op="a",le="1"} 3',
+        'test_seconds_bucket{op="a",le="10"} 3',
+        'test_seconds_bucket{op="a",le="+Inf"} 4',
+        'test_seconds_sum{op="a"} 21.25',
+        'test_seconds_count{op="a"} 4',
+    ]
+
+
+def test_labels_must_match_the_metric():
+    counter = Counter('test_total', 'Test', ('kind',))
+    with pytest.raises(ValueError, match="takes labels"):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(kind='a', extra='b')
+    counter.inc(kind=3)
+    assert counter.value(kind='3') == 1
+
+
+def test_label_values_are_escaped():
+    counter = Counter('test_total', 'Test', ('path',))
+    counter.inc(path='C:\\decks\n"final"')
+    assert lines(counter)[-1] == r'test_total{path="C:\\decks\n\"final\""} 1'
+
+
+def test_registry_renders_each_metric_once():
+    registry = Registry()
+    assert registry.counter('test_total', 'Test') is registry.counter('test_total', 'Test')
+    registry.gauge('test_gauge', 'Gauge').set(2.5)
+    text = registry.render()
+    assert text.count('# TYPE test_total counter') == 1
+    assert 'test_gauge 2.5\n' in text and text.endswith('\n')
+
+
+@pytest.mark.parametrize('error, outcome, timed', [
+    (None, 'ok', True),
+    (ConnectionError("down"), 'error', True),
+    (CircuitOpenError("open"), 'rejected', False),
+    (QuotaExceeded("no quota"), 'rejected', False),
+])
+def test_external_calls_are_counted_by_outcome(error, outcome, timed):
+    labels = {'dependency': 'test_service', 'operation': outcome}
+    calls_before = EXTERNAL_CALLS.value(outcome=outcome, **labels)
+    timed_before = _latency_count(labels)
+    with pytest.raises(type(error)) if error else nullcontext():
+        with external_call(**labels):
+            if error:
+                raise error
+    assert EXTERNAL_CALLS.value(outcome=outcome, **labels) == calls_before + 1
+    # Calls refused locally were never sent, so they have no latency
+    assert _latency_count(labels) == timed_before + timed
+
+
+def test_deck_run_outcomes():
+    before = {outcome: DECKS.value(outcome=outcome) for outcome in ('ok', 'failed', 'cancelled')}
+    in_progress = DECKS_IN_PROGRESS.value()
+
+    with deck_run() as run:
+        assert DECKS_IN_PROGRESS.value() == in_progress + 1
+        run.finished(5)
+    with deck_run():
+        pass  # Returned without finishing, e.g. no outline
+    with pytest.raises(RuntimeError):
+        with deck_run():
+            raise RuntimeError("boom")
+    with pytest.raises(Stop):
+        with deck_run():
+            raise Stop()
+
+    assert {outcome: DECKS.value(outcome=outcome) - count for outcome, count in before.items()} == \
+        {'ok': 1, 'failed': 2, 'cancelled': 1}
+    assert DECKS_IN_PROGRESS.value() == in_progress
+
+
+def _latency_count(labels: dict) -> int:
+    return sum(value for suffix, key, _, value in EXTERNAL_LATENCY._samples()
+               if suffix == '_count' and key == (labels['dependency'], labels['operation']))
@@ -0,0 +1,141 @@
+import copy
+import time
+import types
+import config
+from orchestration import outline_cache
+from orchestration.outline_cache import OutlineCache, normalize_topic
+
+OUTLINE = [
+    {'slide_title': 'Remote Work', 'slide_body': 'Why teams went remote.', 'visual_focus': 'home office',
+     'supporting_visuals': ['laptop']},
+    {'slide_title': 'Tools', 'slide_body': 'Chat, video and docs.', 'visual_focus': 'video call',
+     'supporting_visuals': ['headset']},
+    {'slide_title': 'Outlook', 'slide_body': 'Hybrid is here to stay.', 'visual_focus': 'city office',
+     'supporting_visuals': []},
+]
+
+
+def test_normalize_topic_expands_abbreviations():
+    assert normalize_topic('Intro to ML') == ['introduction', 'machine', 'learning']
+
+
+def test_similar_topic_is_served(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    outline, topic, score = cache.lookup('remote work', 3)
+    assert topic == 'Remote Work' and score >= cache.threshold
+    assert outline == OUTLINE
+
+
+def test_different_topic_misses(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('Ocean Plastics', 3) is None
+
+
+def test_longer_outline_is_shortened_keeping_the_closing_slide(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    outline, _, _ = cache.lookup('Remote Work', 2)
+    assert [slide['slide_title'] for slide in outline] == ['Remote Work', 'Outlook']
+    assert cache.lookup('Remote Work', 4) is None
+
+
+def test_enriching_stored_slides_does_not_change_the_cache(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    slides = copy.deepcopy(OUTLINE)
+    cache.store('Remote Work', 3, slides)
+    # What enrich_slide does to the outline it was handed
+    slides[1].update(layout='Photo Layout', image_path='/tmp/run/bg.jpg', degraded=['supporting_images'])
+    slides[1]['supporting_visuals'].append('webcam')
+
+    served, _, _ = cache.lookup('Remote Work', 3)
+    assert served == OUTLINE
+    assert OutlineCache(tmp_path / "outlines.json").lookup('Remote Work', 3)[0] == OUTLINE
+
+
+def test_served_outline_is_a_copy(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    served, _, _ = cache.lookup('Remote Work', 3)
+    served[0]['layout'] = 'Title Layout'
+    served[0]['supporting_visuals'].append('webcam')
+    assert cache.lookup('Remote Work', 3)[0] == OUTLINE
+
+
+def test_resolved_fields_already_on_disk_are_not_served(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    cache._entries[0]['outline'][0]['image_path'] = '/tmp/gone.jpg'
+    assert 'image_path' not in cache.lookup('Remote Work', 3)[0][0]
+
+
+def test_topics_differing_only_in_a_version_do_not_match(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Python 3 migration guide', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('Python 2 migration guide', 3) is None
+    assert cache.lookup('Python migration guide', 3) is None
+    assert cache.lookup('python 3 migration guide', 3) is not None
+
+
+def test_topics_differing_only_in_a_number_do_not_match(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Top 10 AI trends for 2030', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('Top 5 AI trends for 2030', 3) is None
+    assert cache.lookup('Top 10 AI trends for 2025', 3) is None
+    assert cache.lookup('Top 10 artificial intelligence trends for 2030', 3) is not None
+
+
+def test_similarity_threshold_decides_near_matches(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.OUTLINE_CACHE, 'similarity_threshold', 0.99)
+    strict = OutlineCache(tmp_path / "outlines.json")
+    strict.store('Remote Work Productivity', 3, copy.deepcopy(OUTLINE))
+    assert strict.lookup('Remote Work Productivity Tips', 3) is None
+    # Word order and abbreviations do not change the topic
+    assert strict.lookup('productivity of remote work', 3) is not None
+
+    monkeypatch.setitem(config.PPTConfig.OUTLINE_CACHE, 'similarity_threshold', 0.5)
+    loose = OutlineCache(tmp_path / "outlines.json")
+    _, topic, score = loose.lookup('Remote Work Productivity Tips', 3)
+    assert topic == 'Remote Work Productivity' and 0.5 <= score < 0.99
+
+
+def test_abbreviated_topic_matches_the_spelled_out_one(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Introduction to Machine Learning', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('Intro to ML', 3)[1] == 'Introduction to Machine Learning'
+
+
+def test_closest_topic_wins(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.OUTLINE_CACHE, 'similarity_threshold', 0.3)
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work Tools', 3, copy.deepcopy(OUTLINE))
+    cache.store('Remote Work Culture', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('culture of remote work', 3)[1] == 'Remote Work Culture'
+
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    later = time.time() + cache.ttl_seconds + 1
+    monkeypatch.setattr(outline_cache, 'time', types.SimpleNamespace(time=lambda: later))
+    assert cache.lookup('Remote Work', 3) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.OUTLINE_CACHE, 'max_entries', 2)
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    cache.store('Ocean Plastics', 3, copy.deepcopy(OUTLINE))
+    cache.lookup('Remote Work', 3)
+    cache.store('Solar Power', 3, copy.deepcopy(OUTLINE))
+    assert cache.lookup('Ocean Plastics', 3) is None
+    assert cache.lookup('Remote Work', 3) is not None
+    assert cache.lookup('Solar Power', 3) is not None
+
+
+def test_the_longest_outline_of_a_topic_is_kept(tmp_path):
+    cache = OutlineCache(tmp_path / "outlines.json")
+    cache.store('Remote Work', 3, copy.deepcopy(OUTLINE))
+    cache.store('remote work', 2, copy.deepcopy(OUTLINE[:2]))
+    assert cache.lookup('Remote Work', 3)[0] == OUTLINE
@@ -0,0 +1,120 @@
+import contextvars
+import time
+import pytest
+import config
+from orchestration.pexels_quota import BACKGROUND, SUPPORTING, DeckQuota, PexelsQuota, QuotaExceeded
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.PEXELS_QUOTA, 'supporting_share', 0.7)
+    monkeypatch.setitem(config.PPTConfig.PEXELS_QUOTA, 'low_quota_fraction', 0.25)
+
+
+def remaining(pool):
+    return [key['remaining'] for key in pool.snapshot()['keys']]
+
+
+def start_deck(pool, searches):
+    """A deck entered in its own context, as concurrent runs are; returns (deck, context)."""
+    context = contextvars.Context()
+    deck = DeckQuota(searches, pool)
+    context.run(deck.__enter__)
+    return deck, context
+
+
+def test_searches_rotate_over_the_key_pool():
+    pool = PexelsQuota(['key-aaaa', 'key-bbbb', 'key-cccc'], hourly_limit=10)
+    keys = [pool.acquire(BACKGROUND) for _ in range(6)]
+    assert sorted(keys) == ['key-aaaa'] * 2 + ['key-bbbb'] * 2 + ['key-cccc'] * 2
+    assert remaining(pool) == [8, 8, 8]
+
+
+def test_no_keys_refuses():
+    with pytest.raises(QuotaExceeded):
+        PexelsQuota([], hourly_limit=10).acquire(BACKGROUND)
+
+
+def test_deck_budget_caps_supporting_images_first():
+    pool = PexelsQuota(['key-aaaa'], hourly_limit=100)
+    with DeckQuota(4, pool) as deck:
+        pool.acquire(SUPPORTING)
+        pool.acquire(SUPPORTING)
+        # int(0.7 * 4) supporting searches, backgrounds take the rest
+        with pytest.raises(QuotaExceeded):
+            pool.acquire(SUPPORTING)
+        pool.acquire(BACKGROUND)
+        pool.acquire(BACKGROUND)
+        with pytest.raises(QuotaExceeded):
+            pool.acquire(BACKGROUND)
+    assert deck.used == {BACKGROUND: 2, SUPPORTING: 2}
+    assert deck.denied == {BACKGROUND: 1, SUPPORTING: 1}
+    assert "2 skipped for quota" in deck.report()
+
+
+def test_concurrent_decks_get_a_fair_share():
+    pool = PexelsQuota(['key-aaaa'], hourly_limit=10)
+    first, first_context = start_deck(pool, 60)
+    second, second_context = start_deck(pool, 60)
+
+    for _ in range(5):
+        first_context.run(pool.acquire, BACKGROUND)
+    with pytest.raises(QuotaExceeded):
+        first_context.run(pool.acquire, BACKGROUND)
+    # The heavy deck did not eat into the other deck's half
+    for _ in range(5):
+        second_context.run(pool.acquire, BACKGROUND)
+    assert (first.used[BACKGROUND], second.used[BACKGROUND]) == (5, 5)
+
+    first_context.run(first.__exit__, None, None, None)
+    second_context.run(second.__exit__, None, None, None)
+    assert pool.snapshot()['active_decks'] == 0
+
+
+def test_low_quota_is_kept_for_backgrounds():
+    pool = PexelsQuota(['key-aaaa'], hourly_limit=8)
+    for _ in range(6):
+        pool.acquire(SUPPORTING)
+    # 2 left is still a quarter of the pool
+    pool.acquire(SUPPORTING)
+    with pytest.raises(QuotaExceeded, match="keeping it for backgrounds"):
+        pool.acquire(SUPPORTING)
+    pool.acquire(BACKGROUND)
+    with pytest.raises(QuotaExceeded, match="used up"):
+        pool.acquire(BACKGROUND)
+
+
+def test_release_gives_the_search_back():
+    pool = PexelsQuota(['key-aaaa'], hourly_limit=10)
+    pool.update('key-aaaa', {'X-Ratelimit-Remaining': '50', 'X-Ratelimit-Reset': str(time.time() + 3600)})
+    with DeckQuota(10, pool) as deck:
+        key = pool.acquire(SUPPORTING)
+        assert pool.snapshot()['keys'][0]['monthly_remaining'] == 49
+        pool.release(key, SUPPORTING)
+    assert deck.used[SUPPORTING] == 0
+    assert remaining(pool) == [10]
+    assert pool.snapshot()['keys'][0]['monthly_remaining'] == 50
+
+
+def test_monthly_quota_reported_by_pexels_limits_the_key():
+    pool = PexelsQuota(['key-aaaa', 'key-bbbb'], hourly_limit=10)
+    pool.update('key-aaaa', {'X-Ratelimit-Remaining': '3', 'X-Ratelimit-Reset': str(time.time() + 3600)})
+    pool.update('key-bbbb', {'X-Ratelimit-Remaining': 'n/a'})
+    assert remaining(pool) == [3, 10]
+
+
+def test_hourly_429_takes_the_key_out_of_rotation():
+    pool = PexelsQuota(['key-aaaa', 'key-bbbb'], hourly_limit=10)
+    key = pool.acquire(BACKGROUND)
+    pool.exhausted(key)
+    assert sorted(remaining(pool)) == [0, 10]
+    other = 'key-bbbb' if key == 'key-aaaa' else 'key-aaaa'
+    assert {pool.acquire(BACKGROUND) for _ in range(3)} == {other}
+
+
+def test_monthly_429_waits_for_the_reset():
+    pool = PexelsQuota(['key-aaaa'], hourly_limit=10)
+    pool.exhausted('key-aaaa', {'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': str(time.time() + 7200)})
+    assert pool.snapshot()['keys'][0]['monthly_remaining'] == 0
+    with pytest.raises(QuotaExceeded, match="next 120 min"):
+        pool.acquire(BACKGROUND)
@@ -0,0 +1,41 @@
+import config
+import warm_cache
+from orchestration.fakes import FakeServices, offline_services
+from orchestration.pipeline import generate_presentation
+from orchestration.request_log import log_request, read_requests, rotated_path
+
+
+def test_requests_ranked_by_count_with_latest_spelling_and_usual_style(caches):
+    log_request("remote work", 'dark', 6)
+    log_request("Cloud Costs", 'light', 6)
+    log_request("Remote Work", 'light', 8)
+    log_request("REMOTE WORK!", 'light', 6)
+
+    assert warm_cache.read_request_log() == [("REMOTE WORK!", 'light'), ("Cloud Costs", 'light')]
+    assert warm_cache.read_request_log(min_requests=2) == [("REMOTE WORK!", 'light')]
+
+
+def test_log_rotates_and_reads_both_files(caches, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.WARMING, 'request_log_max_mb', 0)
+    log_request("first", 'dark', 6)
+    log_request("second", 'dark', 6)
+    log_request("third", 'dark', 6)
+
+    path = config.PPTConfig.WARMING['request_log']
+    assert rotated_path(path).exists()
+    assert [request['topic'] for request in read_requests()] == ["second", "third"]
+
+
+def test_unreadable_lines_are_skipped(caches):
+    log_request("kept", 'dark', 6)
+    with open(config.PPTConfig.WARMING['request_log'], 'a') as f:
+        f.write('not json\n[1, 2]\n{"topic": ""}\n')
+    assert [request['topic'] for request in read_requests()] == ["kept"]
+
+
+def test_pipeline_logs_requests_but_not_warming(caches, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.DEADLINE, 'seconds', None)
+    with offline_services(FakeServices(time_scale=0, seed=1), pexels_keys=2):
+        assert generate_presentation("Logged Topic", 3, 'dark')
+        assert generate_presentation("Warming Topic", 3, 'dark', log=False)
+    assert [(r['topic'], r['style'], r['slides']) for r in read_requests()] == [("Logged Topic", 'dark', 3)]
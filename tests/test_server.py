@@ -0,0 +1,111 @@
+import http.client
+import json
+import threading
+import types
+import pytest
+import config
+import server
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """The service on a free port; its stub generator finishes a deck once `release` is set."""
+    settings = {'jobs_dir': tmp_path / "jobs", 'max_concurrent': 1, 'max_queued': 1,
+                'max_body_bytes': 1024, 'token': None}
+    for key, value in settings.items():
+        monkeypatch.setitem(config.PPTConfig.SERVER, key, value)
+    release = threading.Event()
+
+    def generate(topic, slides, style, **kwargs):
+        release.wait(10)
+        path = tmp_path / f"{topic}.pptx"
+        path.write_bytes(b'deck')
+        return str(path)
+
+    monkeypatch.setattr(server, 'generate_presentation', generate)
+    manager = server.JobManager()
+    monkeypatch.setattr(server.GenerationHandler, 'manager', manager)
+    monkeypatch.setattr(server.GenerationHandler, 'log_message', lambda *args: None)
+    httpd = server.ThreadingHTTPServer(('127.0.0.1', 0), server.GenerationHandler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def request(method, path, body=None, headers=None):
+        """(status, JSON payload or raw bytes); headers are sent exactly as given."""
+        connection = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+        connection.putrequest(method, path)
+        headers = dict(headers or {})
+        if body is not None:
+            headers.setdefault('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            connection.putheader(name, value)
+        connection.endheaders(body)
+        response = connection.getresponse()
+        payload = response.read()
+        connection.close()
+        try:
+            return response.status, json.loads(payload)
+        except ValueError:
+            return response.status, payload
+
+    yield types.SimpleNamespace(request=request, release=release, manager=manager)
+    release.set()
+    httpd.shutdown()
+    httpd.server_close()
+    manager.executor.shutdown(wait=True)
+
+
+def test_deck_is_queued_then_downloaded(service):
+    status, job = service.request('POST', '/generate', b'{"topic": "Remote Work", "slides": 4}')
+    assert status == 202 and job['status'] in ('queued', 'running')
+    service.release.set()
+    service.manager.get(job['id']).done_event.wait(10)
+    assert service.request('GET', f"/jobs/{job['id']}")[1]['status'] == 'done'
+    assert service.request('GET', f"/jobs/{job['id']}/download") == (200, b'deck')
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'[1, 2]', "body must be a JSON object"),
+    (b'not json', "body must be a JSON object"),
+    (b'{"topic": ""}', "topic must be"),
+    (b'{"topic": "Remote Work", "slides": 99}', "slides must be"),
+    (b'{"topic": "Remote Work", "slides": "6"}', "slides must be"),
+    (b'{"topic": "Remote Work", "style": "neon"}', "style must be"),
+])
+def test_bad_requests_get_400(service, body, message):
+    status, payload = service.request('POST', '/generate', body)
+    assert status == 400 and payload['error'].startswith(message)
+
+
+@pytest.mark.parametrize('length', ['abc', '-1', '1.5'])
+def test_bad_content_length_gets_400(service, length):
+    status, payload = service.request('POST', '/generate', b'{"topic": "Remote Work"}',
+                                      {'Content-Length': length})
+    assert status == 400 and 'Content-Length' in payload['error']
+
+
+def test_oversized_body_gets_413(service):
+    body = json.dumps({'topic': 'x' * 2000}).encode()
+    assert service.request('POST', '/generate', body)[0] == 413
+
+
+def test_full_queue_gets_429(service):
+    # One running and one queued fill the service
+    for topic in ('One', 'Two'):
+        assert service.request('POST', '/generate', json.dumps({'topic': topic}).encode())[0] == 202
+    status, payload = service.request('POST', '/generate', b'{"topic": "Three"}')
+    assert status == 429 and '2 generations' in payload['error']
+
+
+def test_unknown_job_gets_404(service):
+    assert service.request('GET', '/jobs/nope')[0] == 404
+    assert service.request('DELETE', '/jobs/nope')[0] == 404
+
+
+def test_token_is_required_except_for_health(service, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.SERVER, 'token', 's3cret')
+    body = b'{"topic": "Remote Work"}'
+    assert service.request('POST', '/generate', body)[0] == 401
+    assert service.request('POST', '/generate', body, {'Authorization': 'Bearer wrong'})[0] == 401
+    assert service.request('GET', '/metrics')[0] == 401
+    assert service.request('GET', '/health')[0] == 200
+    assert service.request('POST', '/generate', body, {'Authorization': 'Bearer s3cret'})[0] == 202
@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pytest
+import config
+from orchestration.fakes import FakeServices, offline_services
+from orchestration.pipeline import generate_presentation
+from orchestration.workspace import Workspace, collect_garbage, output_dir, touch
+
+
+def test_each_run_writes_to_its_own_output_directory(caches):
+    first, second = Workspace(), Workspace()
+    assert first.output_dir.parent == second.output_dir.parent == config.PPTConfig.PATHS['output']
+    assert first.output_dir != second.output_dir
+    with Workspace(output_dir=caches / "job") as workspace:
+        assert output_dir() == workspace.output_dir and workspace.output_dir.is_dir()
+
+
+def test_runs_of_the_same_topic_do_not_overwrite_each_other(caches, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.DEADLINE, 'seconds', None)
+    with offline_services(FakeServices(time_scale=0, seed=1), pexels_keys=2):
+        decks = [generate_presentation("Remote Work", 3, 'dark') for _ in range(2)]
+    assert decks[0] != decks[1]
+    assert Path(decks[0]).name == Path(decks[1]).name == "Remote_Work_dark_presentation.pptx"
+    assert all(os.path.exists(deck) and Path(deck).parent.parent == caches / "output" for deck in decks)
+
+
+DAY = 86400
+
+
+def cached(directory, name, size=1000, age_days=0.0, sidecar=False):
+    path = directory / name
+    path.write_bytes(b'x' * size)
+    when = time.time() - age_days * DAY
+    os.utime(path, (when, when))
+    if sidecar:
+        path.with_suffix('.json').write_text('{}')
+    return path
+
+
+def run_dir(name, pid, started):
+    directory = config.PPTConfig.WORKSPACE['root'] / name
+    directory.mkdir(parents=True)
+    (directory / 'run.json').write_text(json.dumps({'pid': pid, 'host': socket.gethostname(), 'started': started}))
+    return directory
+
+
+@pytest.fixture
+def gc_settings(caches, monkeypatch):
+    for key, value in {'gc_interval_seconds': None, 'cache_max_mb': 1, 'cache_max_age_days': 30,
+                       'cache_grace_minutes': 60, 'run_max_age_hours': 6}.items():
+        monkeypatch.setitem(config.PPTConfig.WORKSPACE, key, value)
+    return caches
+
+
+def test_files_unused_past_the_max_age_are_evicted(gc_settings):
+    images = gc_settings / "images"
+    old = cached(images, 'old.jpg', age_days=31, sidecar=True)
+    recent = cached(images, 'recent.jpg', age_days=2)
+    assert collect_garbage(verbose=False)['evicted'] == 1
+    assert not old.exists() and not old.with_suffix('.json').exists()
+    assert recent.exists()
+
+
+def test_least_recently_used_files_go_until_the_caches_fit(gc_settings):
+    images, diagrams = gc_settings / "images", gc_settings / "diagrams"
+    oldest = cached(images, 'a.jpg', 400 * 1024, age_days=3)
+    middle = cached(diagrams, 'b.png', 400 * 1024, age_days=2)
+    newest = cached(images, 'c.jpg', 400 * 1024, age_days=1)
+    stats = collect_garbage(verbose=False)
+    assert (stats['evicted'], stats['freed_bytes']) == (1, 400 * 1024)
+    assert not oldest.exists() and middle.exists() and newest.exists()
+
+
+def test_recently_used_files_are_never_evicted(gc_settings, monkeypatch):
+    monkeypatch.setitem(config.PPTConfig.WORKSPACE, 'cache_max_mb', 0)
+    images = gc_settings / "images"
+    in_use = cached(images, 'in_use.jpg', age_days=31)
+    touch(str(in_use))
+    writing = cached(images, 'photo.jpg.123.tmp', age_days=31)
+    stale = cached(images, 'stale.jpg', age_days=0.1)
+    assert collect_garbage(verbose=False)['evicted'] == 1
+    assert in_use.exists() and writing.exists() and not stale.exists()
+
+
+def test_run_directories_of_live_processes_are_kept(gc_settings):
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True)
+    live = run_dir('live', os.getpid(), time.time())
+    dead = run_dir('dead', int(finished.stdout), time.time())
+    too_old = run_dir('too-old', os.getpid(), time.time() - 7 * 3600)
+    assert collect_garbage(verbose=False)['stale_runs'] == 2
+    assert live.exists() and not dead.exists() and not too_old.exists()
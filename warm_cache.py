@@ -0,0 +1,267 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import config
+from orchestration.deck_manifest import is_reusable, load_manifest, manifest_path_for
+from orchestration.image_engine import get_image_metadata
+from orchestration.metrics import EXTERNAL_CALLS
+from orchestration.outline_cache import normalize_topic
+from orchestration.pexels_quota import get_pexels_quota
+from orchestration.pipeline import generate_presentation
+from orchestration.plan_cache import get_plan_cache
+from orchestration.request_log import read_requests
+from orchestration.theme_engine import THEMES, theme_template_path
+from orchestration.workspace import Workspace
+
+
+def log(message: str):
+    """Progress goes to the real stdout; the pipeline's own log is hidden unless --verbose."""
+    print(message, file=sys.__stdout__, flush=True)
+
+
+def read_topic_list(path: str) -> List[Tuple[str, Optional[str]]]:
+    """One topic per line; blank lines and # comments are skipped."""
+    topics = []
+    for line in Path(path).read_text().splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line:
+            topics.append((line, None))
+    return topics
+
+
+def read_request_log(paths: Optional[List[Path]] = None, min_requests: int = 1) -> List[Tuple[str, Optional[str]]]:
+    """
+    Topics from the request log that generate_presentation appends to (from the
+    CLI, Streamlit and the HTTP service alike), most requested first. Spellings
+    of the same topic count together; the most recent spelling and the most used
+    style are kept. Warming leaves its own decks out of the log.
+    """
+    counts, styles, latest = Counter(), {}, {}
+    for request in read_requests(paths):
+        key = ' '.join(normalize_topic(request['topic']))
+        if not key:
+            continue
+        counts[key] += 1
+        styles.setdefault(key, Counter())[request.get('style')] += 1
+        if request.get('time', 0) >= latest.get(key, (0, ''))[0]:
+            latest[key] = (request.get('time', 0), request['topic'])
+    ranked = sorted(counts, key=lambda key: (-counts[key], -latest[key][0]))
+    return [(latest[key][1], styles[key].most_common(1)[0][0]) for key in ranked if counts[key] >= min_requests]
+
+
+def external_calls() -> Dict[str, int]:
+    """Calls this process has made so far, per dependency. Calls a breaker rejected never left it."""
+    totals = {}
+    for _, (dependency, _, outcome), _, value in EXTERNAL_CALLS._samples():
+        if outcome != 'rejected':
+            totals[dependency] = totals.get(dependency, 0) + int(value)
+    return totals
+
+
+def _service_busy(url: str) -> Optional[str]:
+    """Why the generation service at url needs the quota now, or None if it is idle or unreachable."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            health = json.load(response)
+    except urllib.error.HTTPError as e:
+        return "the generation service is shutting down" if e.code == 503 else None
+    except (OSError, ValueError):
+        return None
+    jobs = health.get('jobs', {})
+    live = jobs.get('queued', 0) + jobs.get('running', 0)
+    return f"the generation service has {live} decks in progress" if live else None
+
+
+class Scheduler:
+    """
+    Decides when the next topic may start, so warming only spends quota live
+    traffic can spare: inside WARMING['hours'], within the hourly call budgets,
+    and while the generation service at WARMING['busy_url'] is idle. A topic
+    starts only while the budgets have room, so they are overshot by at most
+    one topic's calls. Warming stops for good once the Pexels key pool is down
+    to WARMING['pexels_reserve'] searches for the month.
+    """
+
+    def __init__(self, stop: threading.Event):
+        self.settings = config.PPTConfig.WARMING
+        self.stop = stop
+        self.history: List[Tuple[float, Dict[str, int]]] = []
+
+    def record(self, calls: Dict[str, int]):
+        self.history.append((time.time(), calls))
+
+    def _reason_to_wait(self, now: float) -> Optional[str]:
+        hours = self.settings['hours']
+        if hours:
+            start, end = hours
+            hour = datetime.now().hour
+            inside = start <= hour < end if start <= end else (hour >= start or hour < end)
+            if not inside:
+                return f"outside warming hours {start}:00-{end}:00"
+        recent = [calls for started, calls in self.history if now - started < 3600]
+        for dependency, limit in self.settings['max_calls_per_hour'].items():
+            used = sum(calls.get(dependency, 0) for calls in recent)
+            if used >= limit:
+                return f"{used} {dependency} calls in the last hour (budget {limit})"
+        if self.settings['busy_url']:
+            return _service_busy(self.settings['busy_url'])
+        return None
+
+    def out_of_quota(self) -> bool:
+        """True once the searches Pexels reports left on the key pool fall below the reserve."""
+        reported = [key['monthly_remaining'] for key in get_pexels_quota().snapshot()['keys']
+                    if key['monthly_remaining'] is not None]
+        return bool(reported) and sum(reported) < self.settings['pexels_reserve']
+
+    def wait_for_turn(self) -> bool:
+        """Block until the next topic may start. False if warming should stop instead."""
+        waiting_for = None
+        while not self.stop.is_set():
+            if self.out_of_quota():
+                log(f"Warning: Pexels quota is down to the reserve of {self.settings['pexels_reserve']} searches, stopping")
+                return False
+            reason = self._reason_to_wait(time.time())
+            if reason is None:
+                return True
+            if reason != waiting_for:
+                log(f"   ... Waiting: {reason}")
+                waiting_for = reason
+            self.stop.wait(60)
+        return False
+
+
+def store_plans(manifest: dict) -> Tuple[int, int]:
+    """
+    Store the layout and image keywords each slide of a generated deck resolved
+    to. Slides missing an image or degraded by the deadline are left out, so a
+    later run tries them again. Returns (plans stored, slides).
+    """
+    cache = get_plan_cache()
+    stored = 0
+    for entry in manifest['slides']:
+        supporting = [get_image_metadata(path).get('keyword') for path in entry.get('supporting_images') or []]
+        # The title slide never gets supporting images
+        complete = entry.get('image_path') and (entry['index'] == 0 or (supporting and all(supporting)))
+        if not complete or not is_reusable(entry):
+            continue
+        cache.store(entry, {'layout': entry['layout'], 'visual_keyword': entry['visual_keyword'],
+                            'supporting_keywords': supporting if entry['index'] else None})
+        stored += 1
+    return stored, len(manifest['slides'])
+
+
+def warm_topic(topic: str, style: str, slides: int, scratch: Path, refresh: bool = False) -> Tuple[int, int]:
+    """
+    Generate a throwaway deck for a topic, which fills the outline, image and
+    diagram caches on the way, then store its slide plans. A topic that is
+    already warm costs only local rendering, and its cached files count as used
+    again, so the garbage collector keeps them.
+    """
+    output_dir = scratch / "decks"
+    try:
+        with Workspace(output_dir=output_dir):
+            output_file = generate_presentation(topic, slides, style, use_outline_cache=not refresh, log=False)
+        if not output_file:
+            raise RuntimeError("no outline")
+        return store_plans(load_manifest(manifest_path_for(output_file)))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    settings = config.PPTConfig.WARMING
+    parser = argparse.ArgumentParser(description='Precompute outlines, slide plans, images, diagrams and theme '
+                                                 'masters for recurring topics')
+    parser.add_argument('--topics', metavar='FILE', help='Topic list, one per line')
+    parser.add_argument('--from-logs', metavar='FILE', nargs='*',
+                        help="Topics of past requests, from request logs (default: WARMING['request_log'])")
+    parser.add_argument('--min-requests', type=int, default=1, help='Logged topics requested fewer times are skipped')
+    parser.add_argument('--top', type=int, help='Warm at most this many topics')
+    parser.add_argument('--slides', type=int, default=settings['slides'],
+                        help=f"Outline length to warm (default: {settings['slides']})")
+    parser.add_argument('--style', choices=['dark', 'light'], help=f"Style for listed topics (default: {settings['style']})")
+    parser.add_argument('--refresh', action='store_true', help='Ask Gemini for new outlines even for cached topics')
+    parser.add_argument('--list', action='store_true', help='Only print the topics that would be warmed')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline log of every topic')
+    args = parser.parse_args()
+
+    topics = read_topic_list(args.topics) if args.topics else []
+    if args.from_logs is not None:
+        topics += read_request_log(args.from_logs or None, args.min_requests)
+    if not topics:
+        parser.error("no topics: pass --topics FILE and/or --from-logs")
+    seen, unique = set(), []
+    for topic, style in topics:
+        key = ' '.join(normalize_topic(topic))
+        if key and key not in seen:
+            seen.add(key)
+            unique.append((topic, args.style or style or settings['style']))
+    topics = unique[:args.top] if args.top else unique
+
+    if args.list:
+        for topic, style in topics:
+            print(f"{topic} ({style})")
+        return
+
+    # Warming has no deadline: a slow search should finish rather than leave a slide cold
+    config.PPTConfig.DEADLINE['seconds'] = None
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        log("\n-> Stopping after the current topic...")
+        stop.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    for style in THEMES:
+        theme_template_path(style)
+    log(f"-> Warming {len(topics)} topics ({args.slides} slides each)")
+
+    scheduler = Scheduler(stop)
+    scratch = Path(tempfile.mkdtemp(prefix='pptgen-warm-'))
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    warmed = failed = 0
+    try:
+        with quiet:
+            for i, (topic, style) in enumerate(topics):
+                if not scheduler.wait_for_turn():
+                    break
+                before, started = external_calls(), time.monotonic()
+                try:
+                    stored, total = warm_topic(topic, style, args.slides, scratch, args.refresh)
+                    status = f"{stored}/{total} slide plans"
+                    warmed += 1
+                except Exception as e:
+                    status = f"FAILED ({e})"
+                    failed += 1
+                after = external_calls()
+                calls = {dependency: after[dependency] - before.get(dependency, 0) for dependency in after}
+                scheduler.record(calls)
+                spent = ', '.join(f"{dependency} {count}" for dependency, count in sorted(calls.items()) if count)
+                log(f"   ... [{i + 1}/{len(topics)}] {topic}: {status} in {time.monotonic() - started:.1f}s "
+                    f"(external calls: {spent or 'none'})")
+                stop.wait(settings['pause_seconds'])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    log(f"-> Warmed {warmed} topics, {failed} failed, {len(topics) - warmed - failed} left for the next run")
+
+
+if __name__ == "__main__":
+    main()